@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:56
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_userprofile_doc_history'),
+        # History is copied to documents.DocumentHistoryEntry first
+        ('documents', '0010_documenthistoryentry'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='doc_history',
+        ),
+    ]
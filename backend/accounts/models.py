@@ -67,7 +67,6 @@ class UserProfile(models.Model):
     
     # Document Information
     doc_hash = models.CharField(max_length=64, blank=True, null=True)  # Original valid hash
-    doc_history = models.JSONField(default=list, blank=True)  # Array of all document hashes
     storage_path = models.CharField(max_length=500, blank=True, null=True)
     is_profile_complete = models.BooleanField(default=False)
     
@@ -85,6 +84,11 @@ class UserProfile(models.Model):
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+    @property
+    def doc_history(self):
+        """Array of all document hashes, oldest first."""
+        return list(self.user.document_history.values_list('doc_hash', flat=True))
+
 
 class JWTToken(models.Model):
     """
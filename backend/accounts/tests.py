@@ -1,3 +1,85 @@
-from django.test import TestCase
+"""
+Tests for the accounts app.
+"""
+from unittest.mock import patch
+from django.core.cache.backends.redis import RedisCache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from .throttling import _local_buckets, take_token
 
-# Create your tests here.
+
+class TokenBucketTests(SimpleTestCase):
+    """Per-process buckets: bursts up to capacity, then the refill rate."""
+
+    def setUp(self):
+        _local_buckets.clear()
+        self.addCleanup(_local_buckets.clear)
+        patcher = patch('accounts.throttling.time.monotonic', return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_refill(self):
+        results = [take_token('bucket', 3, 1.0)[0] for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+        self.assertEqual(take_token('bucket', 3, 1.0), (False, 1.0))
+        self.clock.return_value += 1.5
+        self.assertEqual(take_token('bucket', 3, 1.0), (True, 0))
+        self.assertFalse(take_token('bucket', 3, 1.0)[0])
+
+    def test_refill_is_capped_at_capacity(self):
+        take_token('bucket', 3, 1.0, cost=3)
+        self.clock.return_value += 60
+        self.assertTrue(take_token('bucket', 3, 1.0, cost=3)[0])
+        self.assertFalse(take_token('bucket', 3, 1.0)[0])
+
+    def test_cost_is_charged_whole_or_not_at_all(self):
+        take_token('bucket', 5, 0.5, cost=3)
+        self.assertEqual(take_token('bucket', 5, 0.5, cost=3), (False, 2.0))
+        self.assertTrue(take_token('bucket', 5, 0.5, cost=2)[0])
+
+    def test_buckets_are_independent(self):
+        take_token('first', 1, 1.0)
+        self.assertFalse(take_token('first', 1, 1.0)[0])
+        self.assertTrue(take_token('second', 1, 1.0)[0])
+
+    def test_falls_back_to_local_buckets_while_redis_is_down(self):
+        redis_cache = RedisCache('redis://localhost:6379/0', {})
+        with patch('accounts.throttling.caches', {'default': redis_cache}), \
+                patch('accounts.throttling._redis_retry_at', 0.0), \
+                patch('accounts.throttling._take_redis', side_effect=ConnectionError('refused')) as take_redis:
+            self.assertTrue(take_token('bucket', 1, 1.0)[0])
+            # Not retried until REDIS_RETRY_INTERVAL has passed
+            self.assertFalse(take_token('bucket', 1, 1.0)[0])
+            self.assertEqual(take_redis.call_count, 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, RATE_LIMIT_ENABLE=True, RATE_LIMIT_AUTH_PER_MINUTE=3)
+class AuthThrottleTests(TestCase):
+    """Login is limited per client IP before any credential check."""
+
+    def setUp(self):
+        _local_buckets.clear()
+        self.addCleanup(_local_buckets.clear)
+        self.client = APIClient()
+
+    def login(self, ip='10.0.0.1'):
+        credentials = {'email': 'nobody@example.com', 'password': 'wrong-password'}
+        return self.client.post('/api/auth/login/', credentials, format='json', REMOTE_ADDR=ip)
+
+    def test_rejects_with_retry_after_once_the_bucket_is_empty(self):
+        for _ in range(3):
+            self.assertNotEqual(self.login().status_code, 429)
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        # One token refills in 60 / 3 seconds
+        self.assertEqual(int(response['Retry-After']), 20)
+
+    def test_clients_have_separate_buckets(self):
+        for _ in range(4):
+            self.login()
+        self.assertNotEqual(self.login(ip='10.0.0.2').status_code, 429)
+
+    @override_settings(RATE_LIMIT_ENABLE=False)
+    def test_disabled(self):
+        for _ in range(5):
+            self.assertNotEqual(self.login().status_code, 429)
@@ -0,0 +1,158 @@
+"""
+Token-bucket rate limiting for public endpoints.
+
+Each client gets one bucket per endpoint class (``scope``). The client is
+the authenticated user, or the client IP for anonymous requests. A bucket
+holds up to the scope's per-minute rate in tokens and refills continuously
+at that rate, so short bursts are allowed and sustained traffic is held to
+the rate. A request with no token left is rejected with 429 and a
+``Retry-After`` header before the view touches the database. Views can
+charge more than one token per request through ``take`` (bulk verification
+charges one per pair against its own bucket).
+
+With a Redis cache (``CACHE_REDIS_URL``) buckets live in Redis and are updated
+by a Lua script, so every worker process shares one atomic bucket per
+client. With any other cache backend, or while Redis is unreachable,
+buckets are kept per process (each worker then enforces the rate on its
+own).
+"""
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.throttling import BaseThrottle
+from documents.lru import LRUCache
+
+# Refill, take ARGV[3] tokens if available, and return {allowed, seconds to wait}.
+# Time comes from the Redis server so worker clocks never disagree.
+TOKEN_BUCKET_SCRIPT = """
+redis.replicate_commands()
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill_rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / refill_rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill_rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+# After a Redis error, use local buckets for this long before retrying
+REDIS_RETRY_INTERVAL = 5.0
+
+_local_buckets = LRUCache(maxsize=settings.RATE_LIMIT_LOCAL_BUCKETS)
+_local_lock = threading.Lock()
+_script = None
+_redis_retry_at = 0.0
+
+
+def _take_local(key, capacity, refill_rate, cost):
+    now = time.monotonic()
+    with _local_lock:
+        tokens, ts = _local_buckets.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - ts) * refill_rate)
+        if tokens >= cost:
+            _local_buckets.set(key, (tokens - cost, now))
+            return True, 0
+        _local_buckets.set(key, (tokens, now))
+        return False, (cost - tokens) / refill_rate
+
+
+def _take_redis(redis_cache, key, capacity, refill_rate, cost):
+    global _script
+    key = redis_cache.make_key(key)
+    client = redis_cache._cache.get_client(key, write=True)
+    if _script is None:
+        _script = client.register_script(TOKEN_BUCKET_SCRIPT)
+    allowed, wait = _script(keys=[key], args=[capacity, refill_rate, cost], client=client)
+    return bool(int(allowed)), float(wait)
+
+
+def take_token(key, capacity, refill_rate, cost=1):
+    """
+    Take ``cost`` tokens (at most ``capacity``) from the bucket ``key``.
+
+    Returns ``(allowed, wait)`` where ``wait`` is the number of seconds
+    until enough tokens are available when not allowed.
+    """
+    global _redis_retry_at
+    shared = caches['default']
+    if isinstance(shared, RedisCache) and time.monotonic() >= _redis_retry_at:
+        try:
+            return _take_redis(shared, key, capacity, refill_rate, cost)
+        except Exception as e:
+            _redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+            print(f"Rate limit store unavailable, using local buckets: {e}")
+    return _take_local(key, capacity, refill_rate, cost)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle clients of one endpoint class with a token bucket.
+
+    Subclasses set ``scope`` and ``rate_setting``, the name of the setting
+    holding the scope's requests per minute.
+    """
+    scope = None
+    rate_setting = 'RATE_LIMIT_PER_MINUTE'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            # Honors REST_FRAMEWORK['NUM_PROXIES'] behind a reverse proxy
+            ident = f"ip:{self.get_ident(request)}"
+        return f"ratelimit:{self.scope}:{ident}"
+
+    def get_rate(self):
+        """Requests per minute for this scope, or 0 when not limited."""
+        if not settings.RATE_LIMIT_ENABLE:
+            return 0
+        return max(0, getattr(settings, self.rate_setting))
+
+    def take(self, request, view, cost=1):
+        """Charge ``cost`` tokens (at most ``get_rate()``) to the client's bucket."""
+        self.retry_after = None
+        per_minute = self.get_rate()
+        if per_minute <= 0 or cost <= 0:
+            return True
+        allowed, wait = take_token(self.get_cache_key(request, view), per_minute, per_minute / 60, cost)
+        if not allowed:
+            self.retry_after = wait
+        return allowed
+
+    def allow_request(self, request, view):
+        return self.take(request, view)
+
+    def wait(self):
+        return self.retry_after
+
+
+class VerificationThrottle(TokenBucketThrottle):
+    """Public document verification (by hash or by file)."""
+    scope = 'verify'
+    rate_setting = 'RATE_LIMIT_PER_MINUTE'
+
+
+class BulkVerificationThrottle(TokenBucketThrottle):
+    """Bulk verification, charged per pair against its own budget."""
+    scope = 'verify_bulk'
+    rate_setting = 'RATE_LIMIT_BULK_PAIRS_PER_MINUTE'
+
+
+class AuthThrottle(TokenBucketThrottle):
+    """Login and registration; kept low to slow password guessing."""
+    scope = 'auth'
+    rate_setting = 'RATE_LIMIT_AUTH_PER_MINUTE'
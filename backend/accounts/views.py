@@ -2,7 +2,7 @@
 Account-related API views.
 """
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from .permissions import AllowAnyPermission
 from rest_framework.response import Response
@@ -17,6 +17,7 @@ from .serializers import (
     RefreshTokenSerializer
 )
 from .authentication import generate_tokens, revoke_all_user_tokens
+from .throttling import AuthThrottle
 
 
 @api_view(['GET', 'POST'])
@@ -37,6 +38,7 @@ def test_endpoint(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAnyPermission])
+@throttle_classes([AuthThrottle])
 def register(request):
     """
     Register a new user.
@@ -81,6 +83,7 @@ def register(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAnyPermission])
+@throttle_classes([AuthThrottle])
 def login(request):
     """
     Authenticate user and return tokens.
@@ -42,6 +42,7 @@ LOCAL_APPS = [
     'profiles',
     'documents',
     'verification',
+    'ledger',
     'issuer',
 ]
 
@@ -57,7 +58,6 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    # 'django_ratelimit.middleware.RatelimitMiddleware',  # Commented out for now
 ]
 
 ROOT_URLCONF = 'blockhire.urls'
@@ -243,6 +243,82 @@ JWT_REFRESH_TOKEN_LIFETIME = config('JWT_REFRESH_TOKEN_LIFETIME', default=604800
 MAX_FILE_SIZE = config('MAX_FILE_SIZE', default=10485760, cast=int)  # 10MB
 ALLOWED_FILE_TYPES = config('ALLOWED_FILE_TYPES', default='pdf,jpg,jpeg,png,doc,docx').split(',')
 
+# Uploads larger than this are spooled to a temp file instead of held in memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = config('FILE_UPLOAD_MAX_MEMORY_SIZE', default=1048576, cast=int)  # 1MB
+FILE_UPLOAD_TEMP_DIR = config('FILE_UPLOAD_TEMP_DIR', default=None)
+
+# Local spool directory for uploads that are still being received or processed
+UPLOAD_SPOOL_DIR = config('UPLOAD_SPOOL_DIR', default=os.path.join(BASE_DIR, 'spool'))
+
+# Document serving: 'auto' streams local files with FileResponse (os.sendfile
+# under gunicorn) and redirects for remote storage. Behind nginx or Apache use
+# 'x-accel-redirect' / 'x-sendfile' so the proxy serves local files itself.
+DOCUMENT_SERVE_MODE = config('DOCUMENT_SERVE_MODE', default='auto')
+DOCUMENT_ACCEL_REDIRECT_PREFIX = config('DOCUMENT_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+
+# Cloudinary upload metadata (version, size, URL) cached per process so
+# exists/size/url are answered without API calls
+CLOUDINARY_ASSET_CACHE_SIZE = config('CLOUDINARY_ASSET_CACHE_SIZE', default=4096, cast=int)
+CLOUDINARY_ASSET_CACHE_TTL = config('CLOUDINARY_ASSET_CACHE_TTL', default=300, cast=int)
+# Files the Admin API reported missing are not looked up again for this long
+CLOUDINARY_ASSET_MISS_TTL = config('CLOUDINARY_ASSET_MISS_TTL', default=30, cast=int)
+
+# Batch uploads
+BATCH_UPLOAD_MAX_FILES = config('BATCH_UPLOAD_MAX_FILES', default=20, cast=int)
+BATCH_UPLOAD_HASH_WORKERS = config('BATCH_UPLOAD_HASH_WORKERS', default=4, cast=int)
+
+# Resumable chunked uploads
+CHUNKED_UPLOAD_MAX_SIZE = config('CHUNKED_UPLOAD_MAX_SIZE', default=MAX_FILE_SIZE, cast=int)
+CHUNKED_UPLOAD_CHUNK_SIZE = config('CHUNKED_UPLOAD_CHUNK_SIZE', default=5242880, cast=int)  # 5MB per request
+CHUNKED_UPLOAD_EXPIRY = config('CHUNKED_UPLOAD_EXPIRY', default=86400, cast=int)  # 24 hours
+
+# Asynchronous storage offload: spool uploads locally, return 202 and push
+# them to the storage backend from a background worker pool
+ASYNC_STORAGE_OFFLOAD = config('ASYNC_STORAGE_OFFLOAD', default=False, cast=bool)
+OFFLOAD_WORKERS = config('OFFLOAD_WORKERS', default=4, cast=int)
+OFFLOAD_MAX_RETRIES = config('OFFLOAD_MAX_RETRIES', default=5, cast=int)
+OFFLOAD_RETRY_BACKOFF = config('OFFLOAD_RETRY_BACKOFF', default=1.0, cast=float)  # seconds, doubled per retry
+
+# Preview thumbnails and page metadata, rendered after upload on a process pool
+DOCUMENT_PREVIEWS_ENABLED = config('DOCUMENT_PREVIEWS_ENABLED', default=True, cast=bool)
+PREVIEW_WORKERS = config('PREVIEW_WORKERS', default=2, cast=int)
+PREVIEW_MAX_DIMENSION = config('PREVIEW_MAX_DIMENSION', default=512, cast=int)  # pixels, longest side
+PREVIEW_MAX_SOURCE_SIZE = config('PREVIEW_MAX_SOURCE_SIZE', default=52428800, cast=int)  # 50MB
+
+# Document versions are stored as content-defined chunks shared between
+# revisions; the average chunk size must be a power of two. Chunking runs on
+# the offload pool after the upload responds unless VERSION_CHUNKING_ASYNC is off
+VERSION_CHUNK_AVG_SIZE = config('VERSION_CHUNK_AVG_SIZE', default=32768, cast=int)  # 32KB
+VERSION_CHUNKING_ASYNC = config('VERSION_CHUNKING_ASYNC', default=True, cast=bool)
+
+# Transparent compression of stored documents (opt-in): files of these content
+# types are stored compressed (zstd if `zstandard` is installed, else zlib)
+# when that saves at least DOCUMENT_COMPRESSION_MIN_SAVING of their size.
+# Compressed files are decompressed in Python on every download, so nothing
+# is compressed when the proxy or the storage backend serves files directly
+# (DOCUMENT_SERVE_MODE x-accel-redirect/x-sendfile, or remote storage).
+# PDF and PNG are compressed formats already and are left out by default
+DOCUMENT_COMPRESSION_ENABLED = config('DOCUMENT_COMPRESSION_ENABLED', default=False, cast=bool)
+DOCUMENT_COMPRESSION_CODEC = config('DOCUMENT_COMPRESSION_CODEC', default='auto')  # auto, zstd or zlib
+DOCUMENT_COMPRESSION_TYPES = config(
+    'DOCUMENT_COMPRESSION_TYPES',
+    default='image/bmp,image/tiff,application/msword,text/plain'
+).split(',')
+DOCUMENT_COMPRESSION_MIN_SAVING = config('DOCUMENT_COMPRESSION_MIN_SAVING', default=0.1, cast=float)
+DOCUMENT_COMPRESSION_MIN_SIZE = config('DOCUMENT_COMPRESSION_MIN_SIZE', default=4096, cast=int)  # bytes
+
+# Merkle anchoring: `manage.py seal_documents --loop` seals new document hashes
+# into one tree every interval and publishes its root
+MERKLE_SEAL_INTERVAL = config('MERKLE_SEAL_INTERVAL', default=300, cast=int)  # seconds
+MERKLE_BATCH_MAX_LEAVES = config('MERKLE_BATCH_MAX_LEAVES', default=100000, cast=int)
+
+# Append-only event ledger: `manage.py seal_ledger --loop` chains waiting
+# entries into blocks; a partial block is sealed once its oldest entry waits
+# longer than LEDGER_BLOCK_MAX_WAIT
+LEDGER_BLOCK_SIZE = config('LEDGER_BLOCK_SIZE', default=1000, cast=int)
+LEDGER_BLOCK_MAX_WAIT = config('LEDGER_BLOCK_MAX_WAIT', default=300, cast=int)  # seconds
+LEDGER_SEAL_INTERVAL = config('LEDGER_SEAL_INTERVAL', default=30, cast=int)  # seconds
+
 # AWS S3 Settings (Optional)
 USE_S3 = config('USE_S3', default=False, cast=bool)
 
@@ -255,7 +331,22 @@ if USE_S3:
     AWS_DEFAULT_ACL = 'private'
     AWS_S3_FILE_OVERWRITE = False
     AWS_S3_VERIFY = True
-    DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+    AWS_S3_ENDPOINT_URL = config('AWS_S3_ENDPOINT_URL', default=None)  # S3-compatible stand-ins (MinIO, moto)
+    # Parallel multipart uploads for large documents
+    AWS_S3_MULTIPART_THRESHOLD = config('AWS_S3_MULTIPART_THRESHOLD', default=8388608, cast=int)  # 8MB
+    AWS_S3_MULTIPART_PART_SIZE = config('AWS_S3_MULTIPART_PART_SIZE', default=8388608, cast=int)  # 8MB, min 5MB
+    AWS_S3_MULTIPART_CONCURRENCY = config('AWS_S3_MULTIPART_CONCURRENCY', default=4, cast=int)
+    AWS_S3_MULTIPART_MAX_RETRIES = config('AWS_S3_MULTIPART_MAX_RETRIES', default=3, cast=int)
+    DEFAULT_FILE_STORAGE = 'documents.s3_storage.MultipartS3Storage'
+
+# Read-through local disk cache in front of remote document storage (Cloudinary
+# or S3): hot documents are served from local disk. 0 disables the cache.
+DOCUMENT_CACHE_MAX_BYTES = config('DOCUMENT_CACHE_MAX_BYTES', default=0, cast=int)
+DOCUMENT_CACHE_MAX_OBJECT_SIZE = config('DOCUMENT_CACHE_MAX_OBJECT_SIZE', default=52428800, cast=int)  # 50MB
+DOCUMENT_CACHE_DIR = config('DOCUMENT_CACHE_DIR', default=os.path.join(BASE_DIR, 'document_cache'))
+if DOCUMENT_CACHE_MAX_BYTES and DEFAULT_FILE_STORAGE != 'django.core.files.storage.FileSystemStorage':
+    DOCUMENT_CACHE_BACKEND = DEFAULT_FILE_STORAGE
+    DEFAULT_FILE_STORAGE = 'documents.disk_cache.CachedStorage'
 
 # Redis Configuration
 REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
@@ -268,9 +359,56 @@ CACHES = {
     }
 }
 
+# Opt-in Redis cache shared across workers (e.g. redis://localhost:6379/0,
+# needs `redis`); unset keeps the local memory cache
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+if CACHE_REDIS_URL:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+    }
+
+# Public verification: employee data cached per emp_id in a short-lived
+# process-local tier in front of the shared cache
+VERIFICATION_CACHE_TIMEOUT = config('VERIFICATION_CACHE_TIMEOUT', default=300, cast=int)  # seconds
+VERIFICATION_LOCAL_CACHE_TTL = config('VERIFICATION_LOCAL_CACHE_TTL', default=5, cast=int)  # seconds
+VERIFICATION_LOCAL_CACHE_SIZE = config('VERIFICATION_LOCAL_CACHE_SIZE', default=10000, cast=int)
+
+# Verification audit records are queued in process and bulk-inserted every
+# FLUSH_INTERVAL or BATCH_SIZE records; set the spool dir to also append them
+# to a local file replayed after a crash. A record failing MAX_ATTEMPTS
+# writes is set aside in a dead-letter file there
+VERIFICATION_AUDIT_BATCH_SIZE = config('VERIFICATION_AUDIT_BATCH_SIZE', default=500, cast=int)
+VERIFICATION_AUDIT_FLUSH_INTERVAL = config('VERIFICATION_AUDIT_FLUSH_INTERVAL', default=200, cast=int)  # ms
+VERIFICATION_AUDIT_MAX_PENDING = config('VERIFICATION_AUDIT_MAX_PENDING', default=10000, cast=int)
+VERIFICATION_AUDIT_BLOCK_TIMEOUT = config('VERIFICATION_AUDIT_BLOCK_TIMEOUT', default=1.0, cast=float)  # seconds
+VERIFICATION_AUDIT_SPOOL_DIR = config('VERIFICATION_AUDIT_SPOOL_DIR', default='')
+VERIFICATION_AUDIT_MAX_ATTEMPTS = config('VERIFICATION_AUDIT_MAX_ATTEMPTS', default=3, cast=int)
+
+# Negative cache: a Bloom filter of known emp_ids and doc hashes answers
+# unknown ones without a query. Workers share it through the cache, so it is
+# off by default unless the cache is shared (CACHE_REDIS_URL)
+VERIFICATION_FILTER_ENABLED = config('VERIFICATION_FILTER_ENABLED', default=bool(CACHE_REDIS_URL), cast=bool)
+VERIFICATION_FILTER_CAPACITY = config('VERIFICATION_FILTER_CAPACITY', default=1000000, cast=int)
+VERIFICATION_FILTER_FP_RATE = config('VERIFICATION_FILTER_FP_RATE', default=0.001, cast=float)
+VERIFICATION_FILTER_SNAPSHOT_EVERY = config('VERIFICATION_FILTER_SNAPSHOT_EVERY', default=1000, cast=int)  # additions
+
+# Bulk verification: pairs are resolved and audited CHUNK_SIZE at a time
+VERIFICATION_BULK_CHUNK_SIZE = config('VERIFICATION_BULK_CHUNK_SIZE', default=2000, cast=int)
+VERIFICATION_BULK_MAX_ITEMS = config('VERIFICATION_BULK_MAX_ITEMS', default=100000, cast=int)
+
 # Rate Limiting
+# Token buckets per client and endpoint class (accounts.throttling), shared
+# through Redis when CACHE_REDIS_URL is set. Set NUM_PROXIES to the number of
+# reverse proxies in front of the app so X-Forwarded-For gives the client IP
 RATE_LIMIT_ENABLE = config('RATE_LIMIT_ENABLE', default=True, cast=bool)
 RATE_LIMIT_PER_MINUTE = config('RATE_LIMIT_PER_MINUTE', default=60, cast=int)
+RATE_LIMIT_AUTH_PER_MINUTE = config('RATE_LIMIT_AUTH_PER_MINUTE', default=10, cast=int)
+# Bulk verification has its own bucket, counted in pairs rather than requests
+RATE_LIMIT_BULK_PAIRS_PER_MINUTE = config('RATE_LIMIT_BULK_PAIRS_PER_MINUTE', default=100000, cast=int)
+RATE_LIMIT_NUM_PROXIES = config('RATE_LIMIT_NUM_PROXIES', default=0, cast=int)
+RATE_LIMIT_LOCAL_BUCKETS = config('RATE_LIMIT_LOCAL_BUCKETS', default=100000, cast=int)
+REST_FRAMEWORK['NUM_PROXIES'] = RATE_LIMIT_NUM_PROXIES
 
 # Logging
 LOGGING = {
@@ -14,6 +14,7 @@ urlpatterns = [
     path('api/documents/', include('documents.urls')),
     path('api/verify/', include('verification.urls')),
     path('api/issuer/', include('issuer.urls')),
+    path('api/ledger/', include('ledger.urls')),
 ]
 
 # Serve media files in development
@@ -2,7 +2,10 @@
 Admin configuration for documents app.
 """
 from django.contrib import admin
-from .models import DocumentRecord, DocumentVersion, DocumentAccessLog
+from .models import (
+    CloudinaryAsset, DocumentBlob, DocumentChunk, DocumentRecord, DocumentHistoryEntry, DocumentVersion,
+    DocumentAccessLog, UploadSession
+)
 
 
 @admin.register(DocumentRecord)
@@ -12,33 +15,94 @@ class DocumentRecordAdmin(admin.ModelAdmin):
     """
     list_display = ('file_name', 'user', 'doc_hash_short', 'file_size_mb', 'is_original', 'upload_date')
     list_filter = ('is_original', 'file_type', 'upload_date')
-    search_fields = ('file_name', 'user__email', 'user__emp_id', 'doc_hash')
+    search_fields = ('file_name', 'user__email', 'user__emp_id', 'doc_hash', 'content_digest')
     ordering = ('-upload_date',)
     
     fieldsets = (
-        ('Document Information', {'fields': ('user', 'file_name', 'doc_hash', 'file_size', 'file_type')}),
-        ('Storage', {'fields': ('storage_path', 'is_original')}),
+        ('Document Information', {'fields': ('user', 'file_name', 'doc_hash', 'content_digest', 'file_size', 'file_type')}),
+        ('Storage', {'fields': ('storage_path', 'stored_size', 'compression', 'blob', 'is_original')}),
         ('Metadata', {'fields': ('upload_ip', 'user_agent', 'upload_date')}),
     )
     
-    readonly_fields = ('doc_hash', 'upload_date', 'upload_ip', 'user_agent')
+    readonly_fields = (
+        'doc_hash', 'content_digest', 'stored_size', 'compression', 'blob', 'upload_date', 'upload_ip', 'user_agent'
+    )
     
     def doc_hash_short(self, obj):
         return f"{obj.doc_hash[:16]}..." if obj.doc_hash else "N/A"
     doc_hash_short.short_description = "Document Hash"
 
 
+@admin.register(DocumentBlob)
+class DocumentBlobAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for DocumentBlob model.
+    """
+    list_display = (
+        'content_digest', 'size', 'stored_size', 'compression', 'ref_count', 'storage_state',
+        'storage_path', 'created_at'
+    )
+    list_filter = ('storage_state', 'compression')
+    search_fields = ('content_digest', 'storage_path')
+    ordering = ('-created_at',)
+
+    readonly_fields = (
+        'content_digest', 'storage_path', 'size', 'stored_size', 'compression', 'ref_count',
+        'storage_state', 'spool_path', 'storage_attempts', 'storage_error', 'created_at'
+    )
+
+
+@admin.register(CloudinaryAsset)
+class CloudinaryAssetAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for CloudinaryAsset model.
+    """
+    list_display = ('storage_path', 'resource_type', 'version', 'bytes', 'updated_at')
+    list_filter = ('resource_type',)
+    search_fields = ('storage_path', 'public_id')
+    ordering = ('-updated_at',)
+
+    readonly_fields = (
+        'storage_path', 'public_id', 'resource_type', 'version', 'bytes',
+        'format', 'secure_url', 'created_at', 'updated_at'
+    )
+
+
+@admin.register(DocumentHistoryEntry)
+class DocumentHistoryEntryAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for DocumentHistoryEntry model.
+    """
+    list_display = ('user', 'doc_hash', 'created_at')
+    search_fields = ('user__email', 'user__emp_id', 'doc_hash')
+    ordering = ('-id',)
+
+    readonly_fields = ('user', 'doc_hash', 'created_at')
+
+
 @admin.register(DocumentVersion)
 class DocumentVersionAdmin(admin.ModelAdmin):
     """
     Admin configuration for DocumentVersion model.
     """
-    list_display = ('document', 'version_number', 'file_name', 'file_size', 'upload_date')
+    list_display = ('document', 'version_number', 'file_name', 'file_size', 'stored_bytes', 'upload_date')
     list_filter = ('version_number', 'upload_date')
     search_fields = ('document__file_name', 'document__user__email')
     ordering = ('-upload_date',)
     
-    readonly_fields = ('upload_date',)
+    readonly_fields = ('content_digest', 'manifest', 'stored_bytes', 'upload_date')
+
+
+@admin.register(DocumentChunk)
+class DocumentChunkAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for DocumentChunk model.
+    """
+    list_display = ('digest', 'size', 'ref_count', 'storage_path', 'created_at')
+    search_fields = ('digest',)
+    ordering = ('-created_at',)
+
+    readonly_fields = ('digest', 'size', 'ref_count', 'storage_path', 'created_at')
 
 
 @admin.register(DocumentAccessLog)
@@ -51,4 +115,16 @@ class DocumentAccessLogAdmin(admin.ModelAdmin):
     search_fields = ('document__file_name', 'accessed_by__email', 'ip_address')
     ordering = ('-access_date',)
     
-    readonly_fields = ('access_date',)
\ No newline at end of file
+    readonly_fields = ('access_date',)
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for UploadSession model.
+    """
+    list_display = ('file_name', 'user', 'offset', 'file_size', 'status', 'expires_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('file_name', 'user__email', 'upload_id')
+    ordering = ('-created_at',)
+
+    readonly_fields = ('upload_id', 'created_at', 'updated_at')
@@ -0,0 +1,114 @@
+"""
+Content-addressed blob store for document files.
+
+Byte-identical uploads share one stored file. Each DocumentRecord holds a
+reference to its DocumentBlob; the stored file is deleted only when the last
+reference goes away.
+"""
+import os
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .compression import save_file
+from .models import DocumentBlob
+from .offload import discard_spool, schedule_offload, spool_upload
+from .previews import schedule_preview
+
+MAX_ACQUIRE_ATTEMPTS = 3
+
+
+def blob_storage_path(content_digest, file_extension=''):
+    """Storage name for a blob, fanned out by the first digest byte."""
+    return f"blobs/{content_digest[:2]}/{content_digest}{file_extension.lower()}"
+
+
+def _add_reference(content_digest):
+    """Increment the reference count of an existing blob, if any."""
+    blob = DocumentBlob.objects.filter(content_digest=content_digest).first()
+    if blob is None:
+        return None
+    updated = DocumentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+    if not updated:
+        # Released and deleted between the lookup and the update
+        return None
+    blob.ref_count += 1
+    return blob
+
+
+def acquire_blob(uploaded_file, content_digest, defer=False):
+    """
+    Return ``(blob, created)`` holding one new reference for this upload.
+
+    A duplicate upload skips the storage write entirely. A new blob is stored
+    compressed when its content type compresses well. With ``defer`` it is
+    only spooled to local disk and left ``pending`` for the background
+    offload workers, which compress it on the way to storage.
+    """
+    for _ in range(MAX_ACQUIRE_ATTEMPTS):
+        blob = _add_reference(content_digest)
+        if blob is not None:
+            return blob, False
+
+        file_extension = os.path.splitext(uploaded_file.name)[1]
+        storage_path = blob_storage_path(content_digest, file_extension)
+        if defer:
+            spool_path = spool_upload(uploaded_file, content_digest, file_extension)
+            saved_path, compression, stored_size = storage_path, '', None
+        else:
+            spool_path = ''
+            saved_path, compression, stored_size = save_file(
+                default_storage, storage_path, uploaded_file, uploaded_file.size
+            )
+        try:
+            with transaction.atomic():
+                blob = DocumentBlob.objects.create(
+                    content_digest=content_digest,
+                    storage_path=saved_path,
+                    size=uploaded_file.size,
+                    stored_size=stored_size,
+                    compression=compression,
+                    ref_count=1,
+                    storage_state='pending' if defer else 'stored',
+                    spool_path=spool_path,
+                )
+                if defer:
+                    schedule_offload(blob.pk)
+                schedule_preview(blob.pk)
+            return blob, True
+        except IntegrityError:
+            # A concurrent upload of the same bytes won the race; keep theirs
+            existing = DocumentBlob.objects.filter(content_digest=content_digest).first()
+            if defer:
+                if existing is None or existing.spool_path != spool_path:
+                    discard_spool(spool_path)
+            elif existing is None or existing.storage_path != saved_path:
+                default_storage.delete(saved_path)
+            uploaded_file.seek(0)
+
+    raise RuntimeError(f"Could not acquire blob {content_digest}")
+
+
+def release_blob(blob_id):
+    """
+    Drop one reference to a blob, deleting it when none remain.
+
+    The stored file is removed after the surrounding transaction commits.
+    """
+    with transaction.atomic():
+        DocumentBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        orphan = DocumentBlob.objects.filter(pk=blob_id, ref_count=0).first()
+        if orphan is None:
+            return False
+        # The delete re-checks the count so a concurrent acquire keeps the blob
+        deleted, _ = DocumentBlob.objects.filter(pk=blob_id, ref_count=0).delete()
+        if deleted:
+            storage_path = orphan.storage_path
+            if orphan.preview_path:
+                preview_path = orphan.preview_path
+                transaction.on_commit(lambda: default_storage.delete(preview_path))
+            if orphan.storage_state == 'stored':
+                transaction.on_commit(lambda: default_storage.delete(storage_path))
+            else:
+                spool_path = orphan.spool_path
+                transaction.on_commit(lambda: discard_spool(spool_path))
+        return bool(deleted)
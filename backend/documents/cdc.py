@@ -0,0 +1,74 @@
+"""
+Content-defined chunking (FastCDC-style gear hash).
+
+Chunk boundaries depend only on nearby content, so an edit in one place of
+a document changes the chunks around it while every other chunk keeps its
+bytes and digest. Versions of the same document therefore share most of
+their chunks.
+"""
+import random
+
+READ_SIZE = 256 * 1024
+
+# Fixed seed: boundaries must be identical across processes and releases
+_rng = random.Random(0x6765_6172)
+GEAR = [_rng.getrandbits(32) for _ in range(256)]
+del _rng
+
+
+def _masks(avg_size):
+    """Harder mask before the average size, easier one after (normalized chunking)."""
+    bits = avg_size.bit_length() - 1
+    return (1 << (bits + 1)) - 1, (1 << (bits - 1)) - 1
+
+
+def _cut_point(buf, min_size, avg_size, max_size, mask_small, mask_large):
+    """
+    Length of the next chunk at the start of ``buf``.
+
+    The gear hash shifts right, so it stays below 2**33 without masking and
+    its low bits mix the last 32 bytes.
+    """
+    n = len(buf)
+    if n <= min_size:
+        return n
+    normal = min(avg_size, n)
+    limit = min(max_size, n)
+    gear = GEAR
+    h = 0
+    # Released on return so the caller can resize ``buf`` again
+    with memoryview(buf) as view:
+        for i, byte in enumerate(view[min_size:normal], min_size):
+            h = (h >> 1) + gear[byte]
+            if not h & mask_small:
+                return i + 1
+        for i, byte in enumerate(view[normal:limit], normal):
+            h = (h >> 1) + gear[byte]
+            if not h & mask_large:
+                return i + 1
+    return limit
+
+
+def iter_chunks(fileobj, avg_size=32 * 1024):
+    """
+    Yield the content-defined chunks of a binary file object as bytes.
+
+    ``avg_size`` must be a power of two; chunks are between a quarter and
+    four times that size (the last chunk may be smaller).
+    """
+    min_size, max_size = avg_size // 4, avg_size * 4
+    mask_small, mask_large = _masks(avg_size)
+    buf = bytearray()
+    eof = False
+    while True:
+        while not eof and len(buf) < max_size:
+            data = fileobj.read(READ_SIZE)
+            if data:
+                buf += data
+            else:
+                eof = True
+        if not buf:
+            return
+        cut = _cut_point(buf, min_size, avg_size, max_size, mask_small, mask_large)
+        yield bytes(buf[:cut])
+        del buf[:cut]
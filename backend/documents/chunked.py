@@ -0,0 +1,220 @@
+"""
+Resumable chunked upload sessions.
+
+A session spools chunks to a local file and keeps the running SHA-256 state
+in process memory. If a chunk lands on a different worker (or the state was
+evicted), the state is rebuilt once from the spool file and then advanced
+chunk by chunk again. A spool file shorter than the session's offset (lost
+or truncated on disk) rewinds the session to the bytes that are left, and
+the client resends from there.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .hashing import DocumentHasher
+from .models import UploadSession
+
+READ_SIZE = 64 * 1024
+MAX_CACHED_HASHERS = 1024
+
+_hashers = OrderedDict()  # upload_id -> (offset, DocumentHasher)
+_hashers_lock = threading.Lock()
+
+
+class ChunkOffsetMismatch(Exception):
+    """The client sent a chunk for an offset the session is not at."""
+
+    def __init__(self, expected):
+        super().__init__(f"Expected chunk at offset {expected}")
+        self.expected = expected
+
+
+class ChunkTooLarge(Exception):
+    """The chunk would take the upload past its declared size."""
+
+
+class SessionNotActive(Exception):
+    """The session is being completed or already is; no more chunks are accepted."""
+
+
+class SpoolTruncated(Exception):
+    """The spool file holds fewer bytes than the session has acknowledged."""
+
+    def __init__(self, size):
+        super().__init__(f"Upload spool holds only {size} bytes")
+        self.size = size
+
+
+def spool_dir():
+    return os.path.join(settings.UPLOAD_SPOOL_DIR, 'chunked')
+
+
+def create_session(user, file_name, content_type, file_size):
+    """Start a new upload session with an empty spool file."""
+    os.makedirs(spool_dir(), exist_ok=True)
+    session = UploadSession(
+        user=user,
+        file_name=file_name,
+        content_type=content_type,
+        file_size=file_size,
+        expires_at=timezone.now() + timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY),
+    )
+    session.spool_path = os.path.join(spool_dir(), f"{session.upload_id}.part")
+    open(session.spool_path, 'wb').close()
+    session.save()
+    _remember_hasher(session, DocumentHasher())
+    return session
+
+
+def _remember_hasher(session, hasher):
+    with _hashers_lock:
+        _hashers[session.upload_id] = (hasher.size, hasher)
+        _hashers.move_to_end(session.upload_id)
+        while len(_hashers) > MAX_CACHED_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def _forget_hasher(session):
+    with _hashers_lock:
+        _hashers.pop(session.upload_id, None)
+
+
+def _hasher_at(session, offset):
+    """Return a hasher that has consumed exactly ``offset`` spooled bytes."""
+    with _hashers_lock:
+        cached = _hashers.get(session.upload_id)
+    if cached and cached[0] == offset:
+        return cached[1].copy()
+
+    # Catch up from the spool file (different worker or evicted state)
+    hasher = DocumentHasher()
+    try:
+        spool = open(session.spool_path, 'rb')
+    except FileNotFoundError:
+        raise SpoolTruncated(0)
+    with spool:
+        remaining = offset
+        while remaining:
+            block = spool.read(min(READ_SIZE, remaining))
+            if not block:
+                # A hash over fewer bytes would be silently wrong
+                raise SpoolTruncated(hasher.size)
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def rewind_session(session, size):
+    """Move an active or completing session back to ``size`` bytes received."""
+    _forget_hasher(session)
+    UploadSession.objects.filter(pk=session.pk, status__in=['active', 'completing']).update(
+        offset=size, status='active', updated_at=timezone.now()
+    )
+    session.offset = size
+    session.status = 'active'
+    print(f"Upload {session.upload_id} rewound to {size} bytes after its spool came up short")
+
+
+def append_chunk(session, offset, stream, length):
+    """
+    Append ``length`` bytes read from ``stream`` at ``offset``.
+
+    The session row is locked for the duration so concurrent PATCHes for the
+    same upload cannot interleave. Returns the new offset. Raises
+    ChunkOffsetMismatch after rewinding a session whose spool came up short.
+    """
+    try:
+        return _append_chunk(session, offset, stream, length)
+    except SpoolTruncated as e:
+        rewind_session(session, e.size)
+        raise ChunkOffsetMismatch(e.size)
+
+
+def _append_chunk(session, offset, stream, length):
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status != 'active':
+            raise SessionNotActive()
+        if offset != session.offset:
+            raise ChunkOffsetMismatch(session.offset)
+        if offset + length > session.file_size:
+            raise ChunkTooLarge(
+                f"Chunk would exceed declared file size of {session.file_size} bytes"
+            )
+
+        hasher = _hasher_at(session, offset)
+        written = 0
+        with open(session.spool_path, 'r+b') as spool:
+            spool.seek(offset)
+            spool.truncate()
+            while written < length:
+                block = stream.read(min(READ_SIZE, length - written))
+                if not block:
+                    break
+                spool.write(block)
+                hasher.update(block)
+                written += len(block)
+
+        session.offset = offset + written
+        session.save(update_fields=['offset', 'updated_at'])
+
+    _remember_hasher(session, hasher)
+    return session.offset
+
+
+def claim_session(session):
+    """
+    Move a fully received session from active to completing.
+
+    Exactly one of several concurrent callers gets True; the others must
+    not finalize it.
+    """
+    claimed = UploadSession.objects.filter(
+        pk=session.pk, status='active', offset=session.file_size
+    ).update(status='completing', updated_at=timezone.now())
+    if claimed:
+        session.status = 'completing'
+    return bool(claimed)
+
+
+def release_session(session):
+    """Return a claimed session to active after finalizing failed, so it can be retried."""
+    UploadSession.objects.filter(pk=session.pk, status='completing').update(
+        status='active', updated_at=timezone.now()
+    )
+    session.status = 'active'
+
+
+def finalize_hash(session):
+    """
+    Return ``(doc_hash, hasher)`` for a fully received session.
+
+    Raises SpoolTruncated if the spool no longer holds every acknowledged byte.
+    """
+    hasher = _hasher_at(session, session.offset)
+    return hasher.finalize(session.file_name), hasher
+
+
+def discard_session(session, delete=False):
+    """Remove a session's spool file and cached hash state."""
+    _forget_hasher(session)
+    try:
+        os.remove(session.spool_path)
+    except FileNotFoundError:
+        pass
+    if delete:
+        session.delete()
+
+
+def cleanup_expired_sessions():
+    """Delete expired sessions and any spool files they left behind."""
+    expired = UploadSession.objects.filter(expires_at__lt=timezone.now())
+    count = 0
+    for session in expired.iterator():
+        discard_session(session, delete=True)
+        count += 1
+    return count
@@ -1,38 +1,92 @@
 """
 Custom Cloudinary storage for document files.
+
+The metadata Cloudinary returns on upload (version, bytes, resource type,
+secure URL) is persisted as a CloudinaryAsset keyed by storage path and kept
+in a per-process LRU/TTL cache, so ``exists``, ``size`` and ``url`` do not
+call the Cloudinary API. Files uploaded before the index existed are looked
+up once through the Admin API and indexed; a file the API reports missing is
+remembered as missing for ``CLOUDINARY_ASSET_MISS_TTL`` seconds.
 """
 from cloudinary_storage.storage import MediaCloudinaryStorage
 from cloudinary import uploader
 import cloudinary
+import cloudinary.api
+from cloudinary.exceptions import NotFound
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from .lru import LRUCache
+
+IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp', 'svg']
+VIDEO_EXTENSIONS = ['mp4', 'webm', 'ogv', 'avi', 'mov']
+RESOURCE_TYPES = ['image', 'raw', 'video']
+LIST_PAGE_SIZE = 500  # Admin API maximum
+# Cached in place of an asset for files Cloudinary does not have
+MISSING_ASSET = object()
 
 
 class DocumentCloudinaryStorage(MediaCloudinaryStorage):
     """
     Custom Cloudinary storage that handles document files properly.
     """
-    
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Set location attribute for Django compatibility
         self.location = 'documents'
-    
+        self._assets = LRUCache(
+            maxsize=settings.CLOUDINARY_ASSET_CACHE_SIZE,
+            ttl=settings.CLOUDINARY_ASSET_CACHE_TTL
+        )
+
+    def _resource_type_for(self, name):
+        """
+        Cloudinary resource type for a file name.
+        """
+        file_extension = name.split('.')[-1].lower()
+        if file_extension in IMAGE_EXTENSIONS:
+            return 'image'
+        if file_extension in VIDEO_EXTENSIONS:
+            return 'video'
+        # For documents (PDF, DOC, TXT, etc.), use 'raw'
+        return 'raw'
+
+    def _split_name(self, name):
+        """
+        Split a storage name into (folder, public_id filename).
+        """
+        # name format: "documents/EMP774329/hash.pdf"
+        parts = name.split('/')
+        if len(parts) >= 3:
+            folder = f"{parts[0]}/{parts[1]}"  # "documents/EMP774329"
+            filename = parts[2].split('.')[0]  # "hash" (without extension)
+        else:
+            folder = 'documents'
+            filename = name.split('/')[-1].split('.')[0]
+        return folder, filename
+
+    def _public_id(self, name):
+        folder, filename = self._split_name(name)
+        return f"{folder}/{filename}"
+
+    def reference_key(self, name):
+        """
+        Key a storage path is held under remotely (its public ID).
+
+        Listed names of unindexed files are rebuilt from the public ID and the
+        format Cloudinary reports, which can differ from the stored path
+        (``jpg`` for ``.jpeg`` uploads, no format for raw files), so the
+        garbage collector matches on this key instead of the name.
+        """
+        return self._public_id(name)
+
     def _upload(self, file, folder=None, public_id=None, resource_type='raw'):
         """
         Upload file to Cloudinary with proper resource type for documents.
         """
         try:
-            # Determine resource type based on file extension
-            file_extension = file.name.split('.')[-1].lower()
-            
-            # Set resource type based on file type
-            if file_extension in ['jpg', 'jpeg', 'png', 'gif', 'webp', 'svg']:
-                resource_type = 'image'
-            elif file_extension in ['mp4', 'webm', 'ogv', 'avi', 'mov']:
-                resource_type = 'video'
-            else:
-                # For documents (PDF, DOC, TXT, etc.), use 'raw'
-                resource_type = 'raw'
-            
+            resource_type = self._resource_type_for(file.name)
+
             # Upload to Cloudinary
             result = uploader.upload(
                 file,
@@ -42,89 +96,183 @@ class DocumentCloudinaryStorage(MediaCloudinaryStorage):
                 use_filename=True,
                 unique_filename=True
             )
-            
+
             return result
-            
+
         except Exception as e:
             print(f"❌ Cloudinary upload error: {e}")
             raise e
-    
+
+    def _remember(self, name, result):
+        """
+        Persist and cache the metadata of an uploaded Cloudinary resource.
+        """
+        from .models import CloudinaryAsset
+
+        fields = {
+            'public_id': result['public_id'],
+            'resource_type': result.get('resource_type', self._resource_type_for(name)),
+            'version': int(result['version']),
+            'bytes': result.get('bytes') or 0,
+            'format': result.get('format') or '',
+            'secure_url': result['secure_url'],
+        }
+        try:
+            asset, _ = CloudinaryAsset.objects.update_or_create(storage_path=name, defaults=fields)
+        except Exception as e:
+            # Still answer from what Cloudinary returned; indexing is retried on the next lookup
+            print(f"⚠️  Could not index Cloudinary metadata for {name}: {e}")
+            asset = CloudinaryAsset(storage_path=name, **fields)
+            self._assets.set(name, asset, ttl=settings.CLOUDINARY_ASSET_MISS_TTL)
+            return asset
+        self._assets.set(name, asset)
+        return asset
+
+    def _asset(self, name):
+        """
+        Metadata for a stored file: cache, then local index, then (once) the
+        Cloudinary Admin API for files uploaded before the index existed,
+        whose answer is indexed. Returns None for a missing file.
+        """
+        from .models import CloudinaryAsset
+
+        asset = self._assets.get(name)
+        if asset is MISSING_ASSET:
+            return None
+        if asset is not None:
+            return asset
+
+        asset = CloudinaryAsset.objects.filter(storage_path=name).first()
+        if asset is not None:
+            self._assets.set(name, asset)
+            return asset
+
+        try:
+            result = cloudinary.api.resource(
+                self._public_id(name), resource_type=self._resource_type_for(name)
+            )
+        except NotFound:
+            self._assets.set(name, MISSING_ASSET, ttl=settings.CLOUDINARY_ASSET_MISS_TTL)
+            return None
+        return self._remember(name, result)
+
     def save(self, name, content, max_length=None):
         """
         Save file to Cloudinary with proper handling for documents.
         """
         try:
             # Extract the folder and filename from the name
-            # name format: "documents/EMP774329/hash.pdf"
-            parts = name.split('/')
-            if len(parts) >= 3:
-                folder = f"{parts[0]}/{parts[1]}"  # "documents/EMP774329"
-                filename = parts[2].split('.')[0]  # "hash" (without extension)
-            else:
-                folder = 'documents'
-                filename = name.split('/')[-1].split('.')[0]
-            
+            folder, filename = self._split_name(name)
+
             print(f"📁 Uploading to folder: {folder}")
             print(f"📄 Filename: {filename}")
-            
+
             # Upload the file
             result = self._upload(content, folder=folder, public_id=filename)
-            
+
+            # Keep the upload metadata so exists/size/url stay local
+            try:
+                self._remember(name, result)
+            except Exception as e:
+                print(f"⚠️  Could not index Cloudinary metadata for {name}: {e}")
+
             # Return the original name to maintain consistency
             return name
-            
+
         except Exception as e:
             print(f"❌ Error saving to Cloudinary: {e}")
             raise e
-    
+
+    def delete(self, name):
+        """
+        Delete file from Cloudinary and drop its metadata.
+        """
+        from .models import CloudinaryAsset
+
+        asset = self._assets.pop(name)
+        if asset is None or asset is MISSING_ASSET:
+            asset = CloudinaryAsset.objects.filter(storage_path=name).first()
+        if asset is not None:
+            public_id, resource_type = asset.public_id, asset.resource_type
+        else:
+            public_id, resource_type = self._public_id(name), self._resource_type_for(name)
+
+        response = uploader.destroy(public_id, invalidate=True, resource_type=resource_type)
+        CloudinaryAsset.objects.filter(storage_path=name).delete()
+        return response.get('result') == 'ok'
+
     def exists(self, name):
         """
         Check if file exists in Cloudinary.
         """
         try:
-            # For Cloudinary, we'll assume the file exists if we can get its URL
-            # This is a simplified check - in production you might want to use Cloudinary API
-            return True  # Assume file exists if it was uploaded successfully
+            return self._asset(name) is not None
         except Exception as e:
             print(f"❌ Error checking file existence: {e}")
             return False
-    
+
     def size(self, name):
         """
         Get the size of the file.
         """
         try:
-            # For Cloudinary, we can't easily get file size without API call
-            # Return a default size or implement API call to get actual size
-            return 0  # Default size
+            asset = self._asset(name)
+            return asset.bytes if asset else 0
         except Exception as e:
             print(f"❌ Error getting file size: {e}")
             return 0
-    
+
     def url(self, name):
         """
         Get the URL for the file.
         """
         try:
-            # For raw files, we need to construct the URL manually
-            if name.endswith(('.pdf', '.doc', '.docx', '.txt', '.zip', '.rar')):
-                # Extract the public_id from the name
-                # name format: "documents/EMP774329/hash.pdf"
-                parts = name.split('/')
-                if len(parts) >= 3:
-                    # Construct public_id: "documents/EMP774329/hash"
-                    public_id = f"{parts[0]}/{parts[1]}/{parts[2].split('.')[0]}"
-                else:
-                    public_id = name.split('.')[0]
-                
-                # Construct URL for raw files
+            asset = self._asset(name)
+            if asset is not None:
+                # Includes the real version, so replaced files are not served stale
+                return asset.secure_url
+
+            # Not indexed: build the URL as before
+            if self._resource_type_for(name) == 'raw':
                 cloud_name = cloudinary.config().cloud_name
-                url = f"https://res.cloudinary.com/{cloud_name}/raw/upload/v1/{public_id}"
-                print(f"🔗 Generated URL: {url}")
-                return url
-            else:
-                # Use default URL generation for images/videos
-                return super().url(name)
+                return f"https://res.cloudinary.com/{cloud_name}/raw/upload/v1/{self._public_id(name)}"
+            return super().url(name)
         except Exception as e:
             print(f"❌ Error getting URL: {e}")
             return f"/media/{name}"  # Fallback to local URL
+
+    def iter_files(self, prefix=''):
+        """
+        Yield ``(name, modified, size)`` for every uploaded resource under
+        ``prefix``, one Admin API page at a time.
+
+        Resources are named by their indexed storage path, or rebuilt from
+        public ID and format for files uploaded before the index existed.
+        """
+        from .models import CloudinaryAsset
+
+        for resource_type in RESOURCE_TYPES:
+            cursor = None
+            while True:
+                params = {'type': 'upload', 'resource_type': resource_type, 'max_results': LIST_PAGE_SIZE}
+                if prefix:
+                    params['prefix'] = prefix
+                if cursor:
+                    params['next_cursor'] = cursor
+                page = cloudinary.api.resources(**params)
+                resources = page.get('resources', [])
+                indexed = dict(
+                    CloudinaryAsset.objects.filter(
+                        public_id__in=[resource['public_id'] for resource in resources]
+                    ).values_list('public_id', 'storage_path')
+                )
+                for resource in resources:
+                    public_id = resource['public_id']
+                    name = indexed.get(public_id)
+                    if name is None:
+                        file_format = resource.get('format')
+                        name = f"{public_id}.{file_format}" if file_format else public_id
+                    yield name, parse_datetime(resource['created_at']), resource.get('bytes') or 0
+                cursor = page.get('next_cursor')
+                if not cursor:
+                    break
@@ -0,0 +1,267 @@
+"""
+Transparent compression of stored document files.
+
+Compression is opt-in (``DOCUMENT_COMPRESSION_ENABLED``) and depends on the
+content type (``DOCUMENT_COMPRESSION_TYPES``). Files are never compressed
+when downloads bypass Python (proxy sendfile or a redirect to remote
+storage), since those would hand out the compressed bytes. The first frame
+is compressed as a sample, and the compressed copy is kept only if it saves
+at least ``DOCUMENT_COMPRESSION_MIN_SAVING``. Compressed files are stored
+with a ``.zz`` suffix in a framed container:
+
+    header   b'BHZ1' | codec id (u8) | frame size (u32)
+    frames   each ``frame size`` logical bytes, compressed independently
+    index    compressed length of every frame (u32 each)
+    trailer  logical size (u64) | frame count (u32) | b'BHZ1'
+
+Frames are compressed one at a time on write, so memory use does not depend
+on the file size. Reads decompress only the frames a ``read``/``seek``
+touches, so Range requests do not inflate the whole file. zstd is used when
+the optional ``zstandard`` package is installed; zlib otherwise.
+"""
+import mimetypes
+import os
+import struct
+import tempfile
+import zlib
+from collections import namedtuple
+from django.conf import settings
+from django.core.files import File
+
+try:
+    import zstandard
+except ImportError:  # Optional: fall back to zlib
+    zstandard = None
+
+MAGIC = b'BHZ1'
+HEADER = struct.Struct('<4sBI')
+TRAILER = struct.Struct('<QI4s')
+INDEX_ENTRY = struct.Struct('<I')
+FRAME_SIZE = 256 * 1024
+COMPRESSED_SUFFIX = '.zz'
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+Codec = namedtuple('Codec', ['name', 'codec_id', 'compress', 'decompress'])
+
+
+CODECS = {'zlib': Codec('zlib', 1, lambda data: zlib.compress(data, ZLIB_LEVEL), zlib.decompress)}
+if zstandard is not None:
+    # Contexts are not thread-safe, so each frame gets its own
+    CODECS['zstd'] = Codec(
+        'zstd', 2,
+        lambda data: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+CODECS_BY_ID = {codec.codec_id: codec for codec in CODECS.values()}
+
+
+class CompressedFileError(IOError):
+    """A stored file is not a valid compressed container."""
+
+
+def get_codec(name=None):
+    """Codec configured by ``DOCUMENT_COMPRESSION_CODEC`` (or ``name``)."""
+    name = name or settings.DOCUMENT_COMPRESSION_CODEC
+    if name == 'auto':
+        return CODECS.get('zstd') or CODECS['zlib']
+    if name not in CODECS:
+        raise ValueError(f"Compression codec {name!r} is not available")
+    return CODECS[name]
+
+
+def is_compressed(storage_path):
+    return storage_path.endswith(COMPRESSED_SUFFIX)
+
+
+def logical_name(storage_path):
+    """Storage path without the compression suffix (keeps the real extension)."""
+    if is_compressed(storage_path):
+        return storage_path[:-len(COMPRESSED_SUFFIX)]
+    return storage_path
+
+
+def served_directly(storage):
+    """True when downloads from ``storage`` skip Python: proxy sendfile or a redirect."""
+    if settings.DOCUMENT_SERVE_MODE in ('x-accel-redirect', 'x-sendfile'):
+        return True
+    try:
+        storage.path('')
+    except NotImplementedError:
+        return True
+    return False
+
+
+def choose_codec(name, size, storage):
+    """Codec to try for a file, or None when it is not worth (or safe) compressing."""
+    if not settings.DOCUMENT_COMPRESSION_ENABLED or size < settings.DOCUMENT_COMPRESSION_MIN_SIZE:
+        return None
+    if served_directly(storage):
+        return None
+    content_type = mimetypes.guess_type(name)[0]
+    if content_type not in settings.DOCUMENT_COMPRESSION_TYPES:
+        return None
+    return get_codec()
+
+
+def _read_frame(source, frame_size):
+    """Read up to ``frame_size`` bytes, tolerating short reads."""
+    parts = []
+    remaining = frame_size
+    while remaining:
+        data = source.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b''.join(parts)
+
+
+def compress_to(source, destination, codec, frame_size=FRAME_SIZE, max_ratio=None):
+    """
+    Write ``source`` to ``destination`` as a framed container.
+
+    With ``max_ratio`` the first frame is a sample: if it does not compress
+    below that ratio nothing more is written and None is returned.
+    Returns ``(logical_size, stored_size)``.
+    """
+    lengths = []
+    logical_size = 0
+    destination.write(HEADER.pack(MAGIC, codec.codec_id, frame_size))
+    stored_size = HEADER.size
+    while True:
+        frame = _read_frame(source, frame_size)
+        if not frame:
+            break
+        compressed = codec.compress(frame)
+        if max_ratio is not None and not lengths and len(compressed) > len(frame) * max_ratio:
+            return None
+        destination.write(compressed)
+        lengths.append(len(compressed))
+        logical_size += len(frame)
+        stored_size += len(compressed)
+
+    destination.write(struct.pack(f'<{len(lengths)}I', *lengths))
+    destination.write(TRAILER.pack(logical_size, len(lengths), MAGIC))
+    stored_size += INDEX_ENTRY.size * len(lengths) + TRAILER.size
+    return logical_size, stored_size
+
+
+def save_file(storage, name, fileobj, size):
+    """
+    Save ``fileobj`` under ``name``, compressed when that pays off.
+
+    Returns ``(saved_name, compression, stored_size)`` where ``compression``
+    is the codec name or '' for a file stored as is.
+    """
+    codec = choose_codec(name, size, storage)
+    if codec is not None:
+        max_ratio = 1 - settings.DOCUMENT_COMPRESSION_MIN_SAVING
+        os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=settings.UPLOAD_SPOOL_DIR, suffix=COMPRESSED_SUFFIX) as tmp:
+            fileobj.seek(0)
+            result = compress_to(fileobj, tmp, codec, max_ratio=max_ratio)
+            if result is not None and result[1] <= size * max_ratio:
+                tmp.flush()
+                tmp.seek(0)
+                compressed_name = name + COMPRESSED_SUFFIX
+                saved = storage.save(compressed_name, File(tmp, name=compressed_name))
+                return saved, codec.name, result[1]
+        fileobj.seek(0)
+    return storage.save(name, fileobj), '', size
+
+
+class FramedReader:
+    """
+    Read-only, seekable file over the logical bytes of a framed container.
+
+    Deliberately has no ``fileno()``: the bytes on disk are compressed, so
+    servers must not ``sendfile`` them.
+    """
+
+    def __init__(self, file):
+        self._file = file
+        try:
+            magic, codec_id, self.frame_size = HEADER.unpack(file.read(HEADER.size))
+            file.seek(-TRAILER.size, os.SEEK_END)
+            self.size, count, end_magic = TRAILER.unpack(file.read(TRAILER.size))
+            if magic != MAGIC or end_magic != MAGIC:
+                raise CompressedFileError("Not a compressed document container")
+            if codec_id not in CODECS_BY_ID:
+                raise CompressedFileError(f"Compression codec {codec_id} is not available")
+            file.seek(-(TRAILER.size + INDEX_ENTRY.size * count), os.SEEK_END)
+            lengths = struct.unpack(f'<{count}I', file.read(INDEX_ENTRY.size * count))
+        except struct.error:
+            raise CompressedFileError("Truncated compressed document container")
+        self._codec = CODECS_BY_ID[codec_id]
+        self._offsets = []
+        offset = HEADER.size
+        for length in lengths:
+            self._offsets.append((offset, length))
+            offset += length
+        self._position = 0
+        self._frame_index = None
+        self._frame = b''
+        self.closed = False
+
+    def _load(self, index):
+        if index != self._frame_index:
+            offset, length = self._offsets[index]
+            self._file.seek(offset)
+            self._frame = self._codec.decompress(self._file.read(length))
+            self._frame_index = index
+        return self._frame
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self._position
+        size = min(size, self.size - self._position)
+        parts = []
+        while size > 0:
+            index, start = divmod(self._position, self.frame_size)
+            data = self._load(index)[start:start + size]
+            if not data:
+                raise CompressedFileError(f"Frame {index} is shorter than expected")
+            parts.append(data)
+            self._position += len(data)
+            size -= len(data)
+        return b''.join(parts)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("Negative seek position")
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return iter(lambda: self.read(self.frame_size), b'')
+
+
+def open_stored(storage, storage_path, compression=''):
+    """Open a stored file for reading its logical (uncompressed) bytes."""
+    file = storage.open(storage_path, 'rb')
+    return FramedReader(file) if compression else file
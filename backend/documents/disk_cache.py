@@ -0,0 +1,395 @@
+"""
+Read-through local disk cache in front of remote document storage.
+
+``CachedStorage`` wraps the configured remote backend (Cloudinary or S3).
+Reads copy the stored file to ``DOCUMENT_CACHE_DIR`` on first access and
+answer ``path()`` / ``open()`` from the local copy afterwards, so
+``serve_document`` streams hot documents from disk instead of redirecting
+to the backend. Writes and deletes go to the backend and evict the copy.
+
+- Fills are written to a temporary file, checked against the backend size
+  and renamed into place, so readers never see a partial file.
+- Concurrent misses for the same file are collapsed into one download
+  (a per-key thread lock plus ``flock`` across worker processes).
+- A SHA-256 recorded at fill time is checked the first time each process
+  reads a copy; corrupted copies are dropped and fetched again.
+- When the cache grows past ``DOCUMENT_CACHE_MAX_BYTES`` the least recently
+  read files are evicted down to 90% of the budget.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.utils.module_loading import import_string
+from .lru import LRUCache
+
+try:
+    import fcntl
+except ImportError:  # Optional: without it only threads of one process are collapsed
+    fcntl = None
+
+COPY_BUFFER_SIZE = 1024 * 1024
+EVICT_TO_RATIO = 0.9
+DIGEST_SUFFIX = '.sha256'
+LOCK_SUFFIX = '.lock'
+
+
+class CacheMetrics:
+    """Per-process counters for the disk cache."""
+
+    FIELDS = (
+        'hits', 'misses', 'fills', 'fill_errors', 'bypassed', 'corrupt',
+        'evictions', 'bytes_saved', 'bytes_filled', 'bytes_evicted'
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, field, amount=1):
+        with self._lock:
+            self._counts[field] += amount
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / lookups, 4) if lookups else None
+        return counts
+
+
+class DiskCache:
+    """Size-bounded directory of files keyed by storage name."""
+
+    def __init__(self, directory, max_bytes, max_object_size):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_object_size = max_object_size
+        self.metrics = CacheMetrics()
+        self._key_locks = {}
+        self._key_locks_lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._total = None  # bytes on disk, estimated between scans
+        # (key, inode, mtime, size) of copies this process already verified
+        self._verified = LRUCache(maxsize=4096)
+
+    def _key(self, name):
+        return hashlib.sha256(name.encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    @contextmanager
+    def _fill_lock(self, key):
+        with self._key_locks_lock:
+            lock = self._key_locks.setdefault(key, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._entry_path(key) + LOCK_SUFFIX, 'a') as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _read_digest(self, path):
+        try:
+            with open(path + DIGEST_SUFFIX) as fh:
+                return fh.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _remove(self, path):
+        for suffix in ('', DIGEST_SUFFIX):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+
+    def _lookup(self, key):
+        """``(path, size)`` of a valid cached copy, or None."""
+        path = self._entry_path(key)
+        expected = self._read_digest(path)
+        if expected is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        token = (key, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if not self._verified.get(token):
+            hasher = hashlib.sha256()
+            with open(path, 'rb') as fh:
+                for block in iter(lambda: fh.read(COPY_BUFFER_SIZE), b''):
+                    hasher.update(block)
+            if hasher.hexdigest() != expected:
+                print(f"Disk cache: dropping corrupted copy {path}")
+                self.metrics.incr('corrupt')
+                self._remove(path)
+                return None
+            self._verified.set(token, True)
+
+        # Eviction orders by access time; set it explicitly (noatime mounts)
+        os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+        return path, stat.st_size
+
+    def _fill(self, key, source, expected_size):
+        """Copy ``source`` into the cache; returns the entry path."""
+        path = self._entry_path(key)
+        hasher = hashlib.sha256()
+        written = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for block in iter(lambda: source.read(COPY_BUFFER_SIZE), b''):
+                    hasher.update(block)
+                    tmp.write(block)
+                    written += len(block)
+            if expected_size is not None and written != expected_size:
+                raise IOError(f"Fetched {written} bytes, storage reports {expected_size}")
+            # Data first, then the digest that marks the entry complete
+            os.replace(tmp_path, path)
+            with open(tmp_path + DIGEST_SUFFIX, 'w') as fh:
+                fh.write(hasher.hexdigest())
+            os.replace(tmp_path + DIGEST_SUFFIX, path + DIGEST_SUFFIX)
+        except BaseException:
+            for leftover in (tmp_path, tmp_path + DIGEST_SUFFIX):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+
+        self.metrics.incr('fills')
+        self.metrics.incr('bytes_filled', written)
+        self._add_bytes(written)
+        return path
+
+    def _hit(self, path, size):
+        self.metrics.incr('hits')
+        self.metrics.incr('bytes_saved', size)
+        return path
+
+    def get_path(self, name, open_source, source_size):
+        """
+        Local path holding the bytes of storage file ``name``.
+
+        ``open_source()`` opens the remote file and ``source_size()`` returns
+        its size. Returns None when the file is too large to cache.
+        """
+        key = self._key(name)
+        cached = self._lookup(key)
+        if cached:
+            return self._hit(*cached)
+
+        size = source_size()
+        if size > self.max_object_size:
+            self.metrics.incr('misses')
+            self.metrics.incr('bypassed')
+            return None
+
+        os.makedirs(os.path.dirname(self._entry_path(key)), exist_ok=True)
+        with self._fill_lock(key):
+            # Another thread or process may have filled it while we waited
+            cached = self._lookup(key)
+            if cached:
+                return self._hit(*cached)
+            self.metrics.incr('misses')
+            try:
+                with open_source() as source:
+                    return self._fill(key, source, size)
+            except Exception:
+                self.metrics.incr('fill_errors')
+                raise
+
+    def discard(self, name):
+        """Drop the cached copy of ``name``, if any."""
+        key = self._key(name)
+        path = self._entry_path(key)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        self._remove(path)
+        self._add_bytes(-size)
+
+    def _add_bytes(self, amount):
+        with self._evict_lock:
+            if self._total is None:
+                self._total = self._scan_total()
+            else:
+                self._total += amount
+            if self._total <= self.max_bytes:
+                return
+        self.evict()
+
+    def _entries(self):
+        """Yield ``(atime_ns, size, path)`` for every cached file."""
+        if not os.path.isdir(self.directory):
+            return
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if '.' in entry.name:  # digest, lock and partial files
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield stat.st_atime_ns, stat.st_size, entry.path
+
+    def _scan_total(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, target=None):
+        """
+        Delete least recently read files until the cache fits ``target``
+        bytes (default 90% of the budget). Returns the bytes freed.
+        """
+        if target is None:
+            target = int(self.max_bytes * EVICT_TO_RATIO)
+        with self._evict_lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            freed = 0
+            for _, size, path in entries:
+                if total - freed <= target:
+                    break
+                self._remove(path)
+                try:
+                    os.remove(path + LOCK_SUFFIX)
+                except FileNotFoundError:
+                    pass
+                freed += size
+                self.metrics.incr('evictions')
+            self.metrics.incr('bytes_evicted', freed)
+            self._total = total - freed
+        if freed:
+            print(f"Disk cache: evicted {freed} bytes")
+        return freed
+
+    def usage(self):
+        """Current ``{'files', 'bytes'}`` on disk (scans the directory)."""
+        files = total = 0
+        for _, size, _ in self._entries():
+            files += 1
+            total += size
+        return {'files': files, 'bytes': total, 'max_bytes': self.max_bytes}
+
+
+class CachedStorage(Storage):
+    """
+    Storage delegating to ``DOCUMENT_CACHE_BACKEND`` with reads served from
+    a local ``DiskCache``.
+    """
+
+    def __init__(self):
+        self.backend = import_string(settings.DOCUMENT_CACHE_BACKEND)()
+        self.cache = get_disk_cache()
+
+    def _cached_path(self, name):
+        return self.cache.get_path(
+            name,
+            lambda: self.backend.open(name, 'rb'),
+            lambda: self.backend.size(name),
+        )
+
+    def path(self, name):
+        """
+        Local copy of ``name``.
+
+        Raises NotImplementedError, like other remote storages, when the
+        file is too large to cache or cannot be fetched.
+        """
+        try:
+            path = self._cached_path(name)
+        except Exception as e:
+            print(f"Disk cache: could not fetch {name}: {e}")
+            path = None
+        if path is None:
+            raise NotImplementedError("This file is not cached locally.")
+        return path
+
+    def _open(self, name, mode='rb'):
+        if 'w' in mode or 'a' in mode or '+' in mode:
+            self.cache.discard(name)
+            return self.backend.open(name, mode)
+        try:
+            return File(open(self.path(name), mode), name=name)
+        except (NotImplementedError, FileNotFoundError):
+            return self.backend.open(name, mode)
+
+    def save(self, name, content, max_length=None):
+        saved = self.backend.save(name, content, max_length=max_length)
+        self.cache.discard(saved)
+        return saved
+
+    def delete(self, name):
+        self.cache.discard(name)
+        self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def iter_files(self, prefix=''):
+        from .storage_gc import iter_storage_files
+        return iter_storage_files(self.backend, prefix)
+
+    def get_available_name(self, name, max_length=None):
+        return self.backend.get_available_name(name, max_length=max_length)
+
+    def generate_filename(self, filename):
+        return self.backend.generate_filename(filename)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+    def __getattr__(self, attr):
+        # Backend-specific helpers (e.g. the Cloudinary metadata index)
+        backend = self.__dict__.get('backend')
+        if backend is None:
+            raise AttributeError(attr)
+        return getattr(backend, attr)
+
+
+_disk_cache = None
+_disk_cache_lock = threading.Lock()
+
+
+def get_disk_cache():
+    """The process-wide DiskCache configured from settings."""
+    global _disk_cache
+    with _disk_cache_lock:
+        if _disk_cache is None:
+            _disk_cache = DiskCache(
+                settings.DOCUMENT_CACHE_DIR,
+                settings.DOCUMENT_CACHE_MAX_BYTES,
+                settings.DOCUMENT_CACHE_MAX_OBJECT_SIZE,
+            )
+        return _disk_cache
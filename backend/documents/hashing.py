@@ -0,0 +1,74 @@
+"""
+Streaming SHA-256 hashing for uploaded documents.
+"""
+import hashlib
+import secrets
+import time
+
+
+class DocumentHasher:
+    """
+    Incremental document hasher.
+
+    File content is fed chunk by chunk so only one chunk is held in memory
+    at a time. The name/timestamp/salt suffix that makes ``doc_hash`` unique
+    is appended at the end, on a copy of the content state, so the plain
+    content digest stays available as well.
+    """
+
+    def __init__(self):
+        self._sha = hashlib.sha256()
+        self.size = 0
+
+    def update(self, chunk):
+        """Feed a chunk of file content."""
+        self._sha.update(chunk)
+        self.size += len(chunk)
+
+    def feed(self, uploaded_file, chunk_size=None):
+        """Feed every chunk of an uploaded file (memory or temp-file backed)."""
+        for chunk in uploaded_file.chunks(chunk_size):
+            self.update(chunk)
+        return self
+
+    def copy(self):
+        """Return an independent hasher with the same state."""
+        clone = DocumentHasher()
+        clone._sha = self._sha.copy()
+        clone.size = self.size
+        return clone
+
+    @property
+    def content_digest(self):
+        """SHA-256 of the file content alone (unsalted)."""
+        return self._sha.hexdigest()
+
+    def finalize(self, file_name, timestamp=None, random_salt=None):
+        """
+        Return the salted document hash for the content fed so far.
+
+        Matches the original scheme: sha256(content + name + timestamp + salt).
+        """
+        if timestamp is None:
+            timestamp = str(int(time.time() * 1000))  # milliseconds for uniqueness
+        if random_salt is None:
+            random_salt = secrets.token_hex(16)  # 32-character random hex
+
+        sha = self._sha.copy()
+        sha.update(file_name.encode('utf-8'))
+        sha.update(timestamp.encode('utf-8'))
+        sha.update(random_salt.encode('utf-8'))
+        return sha.hexdigest()
+
+
+def hash_uploaded_file(uploaded_file):
+    """
+    Hash an uploaded file in constant memory.
+
+    Returns ``(doc_hash, hasher)``; the hasher still exposes the content
+    digest and the number of bytes read.
+    """
+    hasher = DocumentHasher().feed(uploaded_file)
+    doc_hash = hasher.finalize(uploaded_file.name)
+    uploaded_file.seek(0)
+    return doc_hash, hasher
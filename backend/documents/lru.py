@@ -0,0 +1,56 @@
+"""
+Bounded in-process LRU cache with optional per-entry TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe mapping that evicts the least recently used entry once
+    ``maxsize`` is reached. Entries older than ``ttl`` seconds are treated
+    as missing; ``ttl=None`` keeps them until evicted.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=_MISSING):
+        """Store ``value``; ``ttl`` overrides the cache's TTL for this entry."""
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
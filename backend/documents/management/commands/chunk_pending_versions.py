@@ -0,0 +1,22 @@
+"""
+Management command to chunk document versions still pending or failed.
+"""
+from django.core.management.base import BaseCommand
+from documents.versioning import chunk_pending_versions
+
+
+class Command(BaseCommand):
+    help = 'Chunk document versions still pending (e.g. after a restart) or failed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pending-only', action='store_true', help='Skip versions marked failed')
+
+    def handle(self, *args, **options):
+        summary = chunk_pending_versions(include_failed=not options['pending_only'])
+        if not summary:
+            self.stdout.write('No pending versions found')
+            return
+        for state, count in sorted(summary.items(), key=lambda item: str(item[0])):
+            self.stdout.write(f'{state}: {count}')
+        style = self.style.ERROR if summary.get('failed') else self.style.SUCCESS
+        self.stdout.write(style('Version chunking finished'))
@@ -0,0 +1,15 @@
+"""
+Management command to remove expired chunked upload sessions.
+"""
+from django.core.management.base import BaseCommand
+from documents.chunked import cleanup_expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete expired chunked upload sessions and their spool files'
+
+    def handle(self, *args, **options):
+        count = cleanup_expired_sessions()
+        self.stdout.write(
+            self.style.SUCCESS(f'Removed {count} expired upload session(s)')
+        )
@@ -0,0 +1,52 @@
+"""
+Management command to delete stored files no document row references.
+"""
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from documents.storage_gc import DEFAULT_PREFIXES, collect_garbage
+
+
+class Command(BaseCommand):
+    help = 'Delete orphaned files from document storage (streams the listing in batches)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report orphans without deleting them')
+        parser.add_argument('--prefix', action='append', dest='prefixes',
+                            help=f"Storage prefix to scan (repeatable, default: {' '.join(DEFAULT_PREFIXES)})")
+        parser.add_argument('--batch-size', type=int, default=1000, help='Listing entries joined per query batch')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent deletes')
+        parser.add_argument('--rate', type=float, default=None, help='Maximum deletes per second')
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help='Skip files modified more recently (uploads may not have committed yet)')
+        parser.add_argument('--loop', action='store_true', help='Keep running, one pass every --interval seconds')
+        parser.add_argument('--interval', type=int, default=3600, help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            self._run_pass(options)
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+    def _run_pass(self, options):
+        dry_run = options['dry_run']
+        report = None
+        if dry_run:
+            report = lambda name, size, modified: self.stdout.write(f'orphan: {name} ({size} bytes, modified {modified})')
+
+        summary = collect_garbage(
+            prefixes=options['prefixes'],
+            dry_run=dry_run,
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            rate=options['rate'],
+            min_age=timedelta(hours=options['min_age_hours']),
+            on_orphan=report,
+        )
+        for key, value in summary.items():
+            self.stdout.write(f'{key}: {value}')
+        style = self.style.ERROR if summary['failed'] else self.style.SUCCESS
+        verb = 'would be deleted' if dry_run else 'deleted'
+        count = summary['orphaned'] if dry_run else summary['deleted']
+        self.stdout.write(style(f'Storage GC finished: {count} orphaned file(s) {verb}'))
@@ -0,0 +1,22 @@
+"""
+Management command to render document previews that are still missing.
+"""
+from django.core.management.base import BaseCommand
+from documents.previews import generate_pending_previews
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnails and page metadata for blobs still pending (e.g. after a restart or upgrade)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--include-failed', action='store_true', help='Retry blobs whose preview failed')
+
+    def handle(self, *args, **options):
+        summary = generate_pending_previews(include_failed=options['include_failed'])
+        if not summary:
+            self.stdout.write('No pending previews found')
+            return
+        for state, count in sorted(summary.items()):
+            self.stdout.write(f'{state}: {count}')
+        style = self.style.ERROR if summary.get('failed') else self.style.SUCCESS
+        self.stdout.write(style('Preview generation finished'))
@@ -0,0 +1,22 @@
+"""
+Management command to push pending or failed document blobs to storage.
+"""
+from django.core.management.base import BaseCommand
+from documents.offload import retry_unstored_blobs
+
+
+class Command(BaseCommand):
+    help = 'Offload document blobs still pending (e.g. after a restart) or failed to storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pending-only', action='store_true', help='Skip blobs marked failed')
+
+    def handle(self, *args, **options):
+        summary = retry_unstored_blobs(include_failed=not options['pending_only'])
+        if not summary:
+            self.stdout.write('No unstored blobs found')
+            return
+        for state, count in sorted(summary.items()):
+            self.stdout.write(f'{state}: {count}')
+        style = self.style.ERROR if summary.get('failed') else self.style.SUCCESS
+        self.stdout.write(style('Storage offload retry finished'))
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('documents', '0005_remove_documentrecord_salt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('file_name', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=100)),
+                ('file_size', models.PositiveIntegerField()),
+                ('offset', models.PositiveIntegerField(default=0)),
+                ('spool_path', models.CharField(max_length=500)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('completed', 'Completed')], default='active', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('expires_at', models.DateTimeField()),
+                ('document', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_session', to='documents.documentrecord')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'document_upload_sessions',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='document_up_status_87f40b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_digest', models.CharField(max_length=64, unique=True)),
+                ('storage_path', models.CharField(max_length=500)),
+                ('size', models.PositiveIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'document_blobs',
+            },
+        ),
+        migrations.AddField(
+            model_name='documentrecord',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documents', to='documents.documentblob'),
+        ),
+    ]
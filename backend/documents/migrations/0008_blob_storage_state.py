@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_documentblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentblob',
+            name='spool_path',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='storage_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='storage_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='storage_state',
+            field=models.CharField(choices=[('pending', 'Pending'), ('stored', 'Stored'), ('failed', 'Failed')], default='stored', max_length=10),
+        ),
+    ]
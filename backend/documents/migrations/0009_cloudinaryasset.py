@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_blob_storage_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CloudinaryAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('storage_path', models.CharField(max_length=500, unique=True)),
+                ('public_id', models.CharField(max_length=500)),
+                ('resource_type', models.CharField(max_length=10)),
+                ('version', models.PositiveBigIntegerField()),
+                ('bytes', models.PositiveBigIntegerField(default=0)),
+                ('format', models.CharField(blank=True, default='', max_length=20)),
+                ('secure_url', models.URLField(max_length=1000)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'cloudinary_assets',
+            },
+        ),
+    ]
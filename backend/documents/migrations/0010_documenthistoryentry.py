@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_profile_history(apps, schema_editor):
+    """Move UserProfile.doc_history lists into DocumentHistoryEntry rows."""
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    DocumentHistoryEntry = apps.get_model('documents', 'DocumentHistoryEntry')
+    for profile in UserProfile.objects.exclude(doc_history=[]).iterator():
+        # De-duplicate here: the unique index is only built once the migration ends
+        DocumentHistoryEntry.objects.bulk_create(
+            [DocumentHistoryEntry(user_id=profile.user_id, doc_hash=doc_hash)
+             for doc_hash in dict.fromkeys(profile.doc_history)]
+        )
+
+
+def restore_profile_history(apps, schema_editor):
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    DocumentHistoryEntry = apps.get_model('documents', 'DocumentHistoryEntry')
+    for profile in UserProfile.objects.iterator():
+        profile.doc_history = list(
+            DocumentHistoryEntry.objects.filter(user_id=profile.user_id)
+            .order_by('id').values_list('doc_hash', flat=True)
+        )
+        profile.save(update_fields=['doc_history'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0003_userprofile_doc_history'),
+        ('documents', '0009_cloudinaryasset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentHistoryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_hash', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_history', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'document_history',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['user', 'id'], name='document_hi_user_id_9a7432_idx')],
+                'unique_together': {('user', 'doc_hash')},
+            },
+        ),
+        migrations.RunPython(copy_profile_history, restore_profile_history),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0010_documenthistoryentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='documentrecord',
+            index=models.Index(fields=['user', '-upload_date', '-id'], name='document_re_user_id_19ec65_idx'),
+        ),
+    ]
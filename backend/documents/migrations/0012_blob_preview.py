@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0011_documentrecord_user_upload_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentblob',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='preview_path',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='preview_state',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed'), ('unsupported', 'Unsupported')], default='pending', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
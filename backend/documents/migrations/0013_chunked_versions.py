@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0012_blob_preview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('size', models.PositiveIntegerField()),
+                ('storage_path', models.CharField(max_length=500)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'document_chunks',
+            },
+        ),
+        migrations.AddField(
+            model_name='documentversion',
+            name='content_digest',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='documentversion',
+            name='manifest',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='documentversion',
+            name='stored_bytes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='documentversion',
+            name='storage_path',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:17
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_stored_size(apps, schema_editor):
+    """Files stored before compression existed are stored as is."""
+    DocumentBlob = apps.get_model('documents', 'DocumentBlob')
+    DocumentRecord = apps.get_model('documents', 'DocumentRecord')
+    DocumentBlob.objects.filter(storage_state='stored').update(stored_size=F('size'))
+    DocumentRecord.objects.exclude(blob__storage_state__in=['pending', 'failed']).update(stored_size=F('file_size'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0013_chunked_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentblob',
+            name='compression',
+            field=models.CharField(blank=True, choices=[('', 'None'), ('zlib', 'zlib'), ('zstd', 'zstd')], default='', max_length=4),
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='stored_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='documentrecord',
+            name='compression',
+            field=models.CharField(blank=True, choices=[('', 'None'), ('zlib', 'zlib'), ('zstd', 'zstd')], default='', max_length=4),
+        ),
+        migrations.AddField(
+            model_name='documentrecord',
+            name='stored_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_stored_size, migrations.RunPython.noop),
+    ]
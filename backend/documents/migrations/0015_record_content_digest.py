@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:27
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_blob_digests(apps, schema_editor):
+    """Records stored through a blob share its content digest."""
+    DocumentBlob = apps.get_model('documents', 'DocumentBlob')
+    DocumentRecord = apps.get_model('documents', 'DocumentRecord')
+    DocumentRecord.objects.filter(blob__isnull=False).update(content_digest=Subquery(
+        DocumentBlob.objects.filter(pk=OuterRef('blob_id')).values('content_digest')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0014_stored_compression'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentrecord',
+            name='content_digest',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.RunPython(copy_blob_digests, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0015_record_content_digest'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('completing', 'Completing'), ('completed', 'Completed')], default='active', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0016_upload_session_completing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentversion',
+            name='chunk_state',
+            field=models.CharField(choices=[('pending', 'Pending'), ('stored', 'Stored'), ('failed', 'Failed')], default='stored', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='documentversion',
+            name='spool_path',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+    ]
@@ -2,23 +2,115 @@
 Document models for file upload and management.
 """
 import hashlib
+import uuid
 from django.db import models
 from django.utils import timezone
 from django.core.validators import FileExtensionValidator
 from django.conf import settings
 
 
+class DocumentBlob(models.Model):
+    """
+    Content-addressed stored file shared by every DocumentRecord with the
+    same bytes. Keyed by the unsalted SHA-256 of the content.
+
+    With asynchronous storage offload a blob starts ``pending`` with its
+    bytes in a local spool file until a background worker has pushed them
+    to the storage backend.
+
+    A thumbnail and page metadata are rendered in the background and stored
+    next to the blob (``preview_path``).
+
+    ``size`` is the logical size; ``stored_size`` is what the backend holds,
+    smaller when the file was stored compressed (see ``compression``).
+    """
+    STORAGE_STATE_CHOICES = [
+        ('pending', 'Pending'),
+        ('stored', 'Stored'),
+        ('failed', 'Failed'),
+    ]
+    PREVIEW_STATE_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+        ('unsupported', 'Unsupported'),
+    ]
+    COMPRESSION_CHOICES = [
+        ('', 'None'),
+        ('zlib', 'zlib'),
+        ('zstd', 'zstd'),
+    ]
+
+    content_digest = models.CharField(max_length=64, unique=True)
+    storage_path = models.CharField(max_length=500)
+    size = models.PositiveIntegerField()
+    stored_size = models.PositiveIntegerField(blank=True, null=True)  # unknown until stored
+    compression = models.CharField(max_length=4, choices=COMPRESSION_CHOICES, blank=True, default='')
+    ref_count = models.PositiveIntegerField(default=0)
+    storage_state = models.CharField(max_length=10, choices=STORAGE_STATE_CHOICES, default='stored')
+    spool_path = models.CharField(max_length=500, blank=True, default='')
+    storage_attempts = models.PositiveIntegerField(default=0)
+    storage_error = models.TextField(blank=True, null=True)
+    preview_state = models.CharField(max_length=12, choices=PREVIEW_STATE_CHOICES, default='pending')
+    preview_path = models.CharField(max_length=500, blank=True, default='')
+    page_count = models.PositiveIntegerField(blank=True, null=True)
+    width = models.PositiveIntegerField(blank=True, null=True)  # pixels, or points for PDFs
+    height = models.PositiveIntegerField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'document_blobs'
+
+    def __str__(self):
+        return f"{self.content_digest[:16]}... ({self.ref_count} refs)"
+
+
+class CloudinaryAsset(models.Model):
+    """
+    Upload metadata returned by Cloudinary for a stored file, keyed by the
+    storage path recorded on DocumentBlob / DocumentRecord.
+
+    Lets the storage backend answer exists/size/url locally instead of
+    calling the Cloudinary API.
+    """
+    storage_path = models.CharField(max_length=500, unique=True)
+    public_id = models.CharField(max_length=500)
+    resource_type = models.CharField(max_length=10)
+    version = models.PositiveBigIntegerField()
+    bytes = models.PositiveBigIntegerField(default=0)
+    format = models.CharField(max_length=20, blank=True, default='')
+    secure_url = models.URLField(max_length=1000)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'cloudinary_assets'
+
+    def __str__(self):
+        return f"{self.public_id} v{self.version}"
+
+
 class DocumentRecord(models.Model):
     """
     Model to store document information and metadata.
     """
     user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='documents')
     doc_hash = models.CharField(max_length=64, unique=True)
+    # Unsalted SHA-256 of the file content, for verifying a presented file
+    content_digest = models.CharField(max_length=64, blank=True, default='', db_index=True)
     upload_date = models.DateTimeField(auto_now_add=True)
     file_name = models.CharField(max_length=255)
     file_size = models.PositiveIntegerField()
     is_original = models.BooleanField(default=False)
     storage_path = models.CharField(max_length=500)
+    # Bytes held by the storage backend; differs from file_size when compressed
+    stored_size = models.PositiveIntegerField(blank=True, null=True)
+    compression = models.CharField(
+        max_length=4, choices=DocumentBlob.COMPRESSION_CHOICES, blank=True, default=''
+    )
+    blob = models.ForeignKey(
+        DocumentBlob, on_delete=models.PROTECT, related_name='documents', blank=True, null=True
+    )
     file_type = models.CharField(max_length=10, default='pdf')
     
     # Additional metadata
@@ -28,6 +120,9 @@ class DocumentRecord(models.Model):
     class Meta:
         db_table = 'document_records'
         ordering = ['-upload_date']
+        indexes = [
+            models.Index(fields=['user', '-upload_date', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.file_name} ({self.doc_hash[:16]}...)"
@@ -44,6 +139,11 @@ class DocumentRecord(models.Model):
         content = f"{self.user.user_hash}{self.file_name}{self.upload_date}"
         return hashlib.sha256(content.encode()).hexdigest()
 
+    @property
+    def storage_state(self):
+        """Storage state of the underlying blob (legacy records are stored)."""
+        return self.blob.storage_state if self.blob_id else 'stored'
+
     @property
     def file_size_mb(self):
         """Return file size in MB."""
@@ -55,16 +155,78 @@ class DocumentRecord(models.Model):
         return f"/api/documents/download/{self.doc_hash}/"
 
 
+class DocumentHistoryEntry(models.Model):
+    """
+    Append-only history of every document hash a user has uploaded.
+
+    Each upload inserts one row (ignoring duplicates) instead of rewriting
+    a JSON list on the profile, so concurrent uploads cannot drop each
+    other's entry and the cost of an append does not grow with history.
+    """
+    user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='document_history')
+    doc_hash = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'document_history'
+        unique_together = ['user', 'doc_hash']
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.doc_hash[:16]}..."
+
+
+class DocumentChunk(models.Model):
+    """
+    Content-defined chunk shared by document versions.
+
+    Keyed by the SHA-256 of its bytes; ``ref_count`` counts the versions
+    whose manifest contains it.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    size = models.PositiveIntegerField()
+    storage_path = models.CharField(max_length=500)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'document_chunks'
+
+    def __str__(self):
+        return f"{self.digest[:16]}... ({self.size} bytes, {self.ref_count} refs)"
+
+
 class DocumentVersion(models.Model):
     """
     Track document versions and changes.
+
+    A version's bytes are the concatenation of the chunks listed in its
+    ``manifest`` (``[digest, size]`` pairs); ``stored_bytes`` is how much of
+    it had to be written because no earlier version had those chunks.
+    Chunking runs in the background: until then the version is ``pending``
+    and its bytes are in ``spool_path`` (or the original document for
+    version 1).
     """
+    CHUNK_STATE_CHOICES = [
+        ('pending', 'Pending'),
+        ('stored', 'Stored'),
+        ('failed', 'Failed'),
+    ]
+
     document = models.ForeignKey(DocumentRecord, on_delete=models.CASCADE, related_name='versions')
     version_number = models.PositiveIntegerField()
     doc_hash = models.CharField(max_length=64)
     file_name = models.CharField(max_length=255)
     file_size = models.PositiveIntegerField()
-    storage_path = models.CharField(max_length=500)
+    storage_path = models.CharField(max_length=500, blank=True, default='')
+    content_digest = models.CharField(max_length=64, blank=True, default='')
+    manifest = models.JSONField(default=list, blank=True)
+    stored_bytes = models.PositiveIntegerField(default=0)
+    chunk_state = models.CharField(max_length=10, choices=CHUNK_STATE_CHOICES, default='stored')
+    spool_path = models.CharField(max_length=500, blank=True, default='')
     upload_date = models.DateTimeField(auto_now_add=True)
     change_reason = models.TextField(blank=True, null=True)
     
@@ -97,4 +259,47 @@ class DocumentAccessLog(models.Model):
         ordering = ['-access_date']
 
     def __str__(self):
-        return f"{self.document.file_name} - {self.access_type} by {self.accessed_by.email}"
\ No newline at end of file
+        return f"{self.document.file_name} - {self.access_type} by {self.accessed_by.email}"
+
+
+class UploadSession(models.Model):
+    """
+    Resumable chunked upload in progress.
+
+    Chunks are appended to a spool file on local disk; the SHA-256 state is
+    advanced as each chunk arrives so finalizing does not re-read the file.
+    """
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('completing', 'Completing'),
+        ('completed', 'Completed'),
+    ]
+
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='upload_sessions')
+    file_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    file_size = models.PositiveIntegerField()
+    offset = models.PositiveIntegerField(default=0)
+    spool_path = models.CharField(max_length=500)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    document = models.OneToOneField(
+        DocumentRecord, on_delete=models.SET_NULL, related_name='upload_session', blank=True, null=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'document_upload_sessions'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.file_name} ({self.offset}/{self.file_size})"
+
+    @property
+    def is_expired(self):
+        return timezone.now() > self.expires_at
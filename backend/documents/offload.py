@@ -0,0 +1,169 @@
+"""
+Asynchronous storage offload for uploaded documents.
+
+When ``ASYNC_STORAGE_OFFLOAD`` is on, an upload is spooled to local disk and
+its blob is committed as ``pending``. A background thread pool then pushes
+the spooled bytes to the configured storage backend, retrying with
+exponential backoff, and marks the blob ``stored`` or ``failed``.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from accounts.models import UserProfile
+from .compression import save_file
+from .models import DocumentBlob, DocumentRecord
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def offload_enabled():
+    return settings.ASYNC_STORAGE_OFFLOAD
+
+
+def spool_dir():
+    return os.path.join(settings.UPLOAD_SPOOL_DIR, 'pending')
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.OFFLOAD_WORKERS,
+                thread_name_prefix='storage-offload',
+            )
+        return _executor
+
+
+def spool_upload(uploaded_file, content_digest, file_extension=''):
+    """Copy an uploaded file to the local spool and return the spool path."""
+    os.makedirs(spool_dir(), exist_ok=True)
+    spool_path = os.path.join(spool_dir(), f"{content_digest}{file_extension.lower()}")
+    tmp_path = f"{spool_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as spool:
+        for chunk in uploaded_file.chunks():
+            spool.write(chunk)
+    os.replace(tmp_path, spool_path)
+    uploaded_file.seek(0)
+    return spool_path
+
+
+def schedule_offload(blob_id):
+    """Queue a pending blob for upload once the current transaction commits."""
+    transaction.on_commit(lambda: _get_executor().submit(_run_offload, blob_id))
+
+
+def run_in_background(func, *args):
+    """Run ``func(*args)`` on the offload pool once the current transaction commits."""
+    transaction.on_commit(lambda: _get_executor().submit(_run_task, func, *args))
+
+
+def _run_task(func, *args):
+    try:
+        func(*args)
+    except Exception as e:
+        print(f"Background task {func.__name__}{args} crashed: {e}")
+    finally:
+        close_old_connections()
+
+
+def _run_offload(blob_id):
+    try:
+        offload_blob(blob_id)
+    except Exception as e:
+        print(f"Storage offload crashed for blob {blob_id}: {e}")
+    finally:
+        close_old_connections()
+
+
+def offload_blob(blob_id, max_retries=None):
+    """
+    Push a pending blob's spool file to storage, retrying with backoff.
+
+    Returns the final storage state.
+    """
+    if max_retries is None:
+        max_retries = settings.OFFLOAD_MAX_RETRIES
+
+    blob = DocumentBlob.objects.filter(pk=blob_id).first()
+    if blob is None or blob.storage_state == 'stored':
+        return blob.storage_state if blob else None
+    if not blob.spool_path or not os.path.exists(blob.spool_path):
+        DocumentBlob.objects.filter(pk=blob.pk).update(
+            storage_state='failed', storage_error='Spool file is missing'
+        )
+        return 'failed'
+
+    for attempt in range(max_retries + 1):
+        try:
+            with open(blob.spool_path, 'rb') as spool:
+                saved_path, compression, stored_size = save_file(
+                    default_storage, blob.storage_path, File(spool, name=blob.storage_path), blob.size
+                )
+        except Exception as e:
+            DocumentBlob.objects.filter(pk=blob.pk).update(
+                storage_attempts=blob.storage_attempts + attempt + 1, storage_error=str(e)
+            )
+            if attempt == max_retries:
+                DocumentBlob.objects.filter(pk=blob.pk).update(storage_state='failed')
+                print(f"Storage offload failed for {blob.content_digest}: {e}")
+                return 'failed'
+            delay = settings.OFFLOAD_RETRY_BACKOFF * (2 ** attempt)
+            time.sleep(delay + random.uniform(0, delay / 2))
+            continue
+
+        with transaction.atomic():
+            DocumentBlob.objects.filter(pk=blob.pk).update(
+                storage_state='stored',
+                storage_path=saved_path,
+                stored_size=stored_size,
+                compression=compression,
+                spool_path='',
+                storage_attempts=blob.storage_attempts + attempt + 1,
+                storage_error=None,
+            )
+            DocumentRecord.objects.filter(blob=blob).update(
+                storage_path=saved_path, stored_size=stored_size, compression=compression
+            )
+            if saved_path != blob.storage_path:
+                UserProfile.objects.filter(storage_path=blob.storage_path).update(
+                    storage_path=saved_path, updated_at=timezone.now()
+                )
+        try:
+            os.remove(blob.spool_path)
+        except FileNotFoundError:
+            pass
+        return 'stored'
+
+
+def retry_unstored_blobs(include_failed=True):
+    """
+    Synchronously offload blobs left pending (e.g. after a restart) or failed.
+
+    Returns a ``{state: count}`` summary.
+    """
+    states = ['pending', 'failed'] if include_failed else ['pending']
+    summary = {}
+    for blob_id in DocumentBlob.objects.filter(storage_state__in=states).values_list('pk', flat=True):
+        if include_failed:
+            DocumentBlob.objects.filter(pk=blob_id, storage_state='failed').update(storage_state='pending')
+        state = offload_blob(blob_id)
+        summary[state] = summary.get(state, 0) + 1
+    return summary
+
+
+def discard_spool(spool_path):
+    """Remove a spool file that will never be offloaded."""
+    if spool_path:
+        try:
+            os.remove(spool_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,19 @@
+"""
+Pagination classes for document endpoints.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class DocumentHistoryPagination(CursorPagination):
+    """
+    Cursor pagination over a user's documents, newest first.
+
+    DRF positions the opaque cursor on ``upload_date`` alone, so each page
+    starts with an index range scan on ``(user, -upload_date, -id)`` however
+    long the history is. Documents sharing the boundary timestamp are
+    skipped with an offset stored in the cursor; ``id`` only makes their
+    order stable, it is not part of the position.
+    """
+    ordering = ('-upload_date', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,161 @@
+"""
+Background preview pipeline for uploaded documents.
+
+When a new blob is created, a dispatcher thread hands its bytes to a process
+pool that renders a JPEG thumbnail and reads page count and dimensions (see
+``rendering``). The thumbnail is stored next to the blob as
+``<digest>-thumb.jpg`` and the metadata is recorded on the blob, so previews
+and history listings can use the small derivative instead of the original.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from .compression import logical_name, open_stored
+from .models import DocumentBlob
+from .rendering import PDF_THUMBNAILS, render_preview
+from .serving import local_path
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+
+_process_pool = None
+_dispatcher = None
+_pool_lock = threading.Lock()
+
+
+def previews_enabled():
+    return settings.DOCUMENT_PREVIEWS_ENABLED
+
+
+def preview_kind(storage_path):
+    """'image', 'pdf' or None for files without a preview."""
+    extension = os.path.splitext(logical_name(storage_path))[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        return 'image'
+    if extension == '.pdf':
+        return 'pdf'
+    return None
+
+
+def preview_storage_path(blob):
+    return f"{os.path.splitext(logical_name(blob.storage_path))[0]}-thumb.jpg"
+
+
+def _get_pools():
+    global _process_pool, _dispatcher
+    with _pool_lock:
+        if _process_pool is None:
+            # Spawned workers only import the Django-free rendering module
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.PREVIEW_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            _dispatcher = ThreadPoolExecutor(
+                max_workers=settings.PREVIEW_WORKERS,
+                thread_name_prefix='preview-dispatch',
+            )
+            if not PDF_THUMBNAILS:
+                print("pypdfium2 is not installed: PDF previews get page metadata but no thumbnail")
+        return _process_pool, _dispatcher
+
+
+def schedule_preview(blob_id):
+    """Queue preview rendering for a blob once the current transaction commits."""
+    if previews_enabled():
+        transaction.on_commit(lambda: _get_pools()[1].submit(_run_preview, blob_id))
+
+
+def _run_preview(blob_id):
+    try:
+        generate_preview(blob_id)
+    except Exception as e:
+        print(f"Preview generation crashed for blob {blob_id}: {e}")
+    finally:
+        close_old_connections()
+
+
+@contextmanager
+def _local_source(blob):
+    """Yield a local path holding the blob's bytes."""
+    if blob.spool_path and os.path.exists(blob.spool_path):
+        yield blob.spool_path
+        return
+    path = local_path(blob.storage_path)
+    if path is not None and not blob.compression:
+        yield path
+        return
+    # Remote or compressed: copy to a temporary file the worker process can open
+    os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=settings.UPLOAD_SPOOL_DIR, suffix='.preview') as tmp:
+        with open_stored(default_storage, blob.storage_path, blob.compression) as source:
+            shutil.copyfileobj(source, tmp)
+        tmp.flush()
+        yield tmp.name
+
+
+def generate_preview(blob_id):
+    """
+    Render and store the preview for a blob.
+
+    Returns the final preview state.
+    """
+    blob = DocumentBlob.objects.filter(pk=blob_id).first()
+    if blob is None:
+        return None
+    if blob.preview_state == 'ready':
+        return 'ready'
+
+    kind = preview_kind(blob.storage_path)
+    if kind is None or blob.size > settings.PREVIEW_MAX_SOURCE_SIZE:
+        DocumentBlob.objects.filter(pk=blob.pk).update(preview_state='unsupported')
+        return 'unsupported'
+
+    try:
+        with _local_source(blob) as path:
+            process_pool = _get_pools()[0]
+            result = process_pool.submit(
+                render_preview, path, kind, settings.PREVIEW_MAX_DIMENSION
+            ).result()
+    except Exception as e:
+        DocumentBlob.objects.filter(pk=blob.pk).update(preview_state='failed')
+        print(f"Preview rendering failed for {blob.content_digest}: {e}")
+        return 'failed'
+
+    preview_path = ''
+    if result['thumbnail']:
+        preview_path = default_storage.save(
+            preview_storage_path(blob), ContentFile(result['thumbnail'])
+        )
+
+    updated = DocumentBlob.objects.filter(pk=blob.pk).update(
+        preview_state='ready',
+        preview_path=preview_path,
+        page_count=result['page_count'],
+        width=result['width'],
+        height=result['height'],
+    )
+    if not updated and preview_path:
+        # The blob was released while rendering
+        default_storage.delete(preview_path)
+    return 'ready'
+
+
+def generate_pending_previews(include_failed=False):
+    """
+    Synchronously render previews still pending (e.g. after a restart).
+
+    Returns a ``{state: count}`` summary.
+    """
+    states = ['pending', 'failed'] if include_failed else ['pending']
+    summary = {}
+    for blob_id in DocumentBlob.objects.filter(preview_state__in=states).values_list('pk', flat=True):
+        state = generate_preview(blob_id)
+        summary[state] = summary.get(state, 0) + 1
+    return summary
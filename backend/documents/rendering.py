@@ -0,0 +1,105 @@
+"""
+Thumbnail rendering and page metadata extraction.
+
+Runs inside preview worker processes, so this module must not import Django.
+Images are downscaled with Pillow. PDFs get their page count and first-page
+size; page one is rendered to a thumbnail when pypdfium2 is installed.
+"""
+import io
+import mmap
+import re
+from PIL import Image, ImageOps
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # Optional: without it PDFs get metadata but no thumbnail
+    pdfium = None
+
+PDF_THUMBNAILS = pdfium is not None
+
+PAGE_RE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+MEDIABOX_RE = re.compile(
+    rb'/MediaBox\s*\[\s*([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s*\]'
+)
+JPEG_QUALITY = 80
+
+
+def _encode_jpeg(image):
+    """Encode a PIL image as JPEG, flattening transparency onto white."""
+    if image.mode in ('RGBA', 'LA', 'P') and (image.mode != 'P' or 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def render_image(path, max_size):
+    with Image.open(path) as image:
+        width, height = image.size
+        page_count = getattr(image, 'n_frames', 1)
+        # JPEG decoders can scale down while decoding, which is much cheaper
+        image.draft('RGB', (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_size, max_size))
+        return {
+            'thumbnail': _encode_jpeg(image),
+            'page_count': page_count,
+            'width': width,
+            'height': height,
+        }
+
+
+def _scan_pdf(path):
+    """Page count and first MediaBox (points) from uncompressed PDF objects."""
+    with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        page_count = sum(1 for _ in PAGE_RE.finditer(data)) or None
+        match = MEDIABOX_RE.search(data)
+        box = [float(value) for value in match.groups()] if match else None
+    width = height = None
+    if box:
+        x0, y0, x1, y1 = box
+        width, height = round(abs(x1 - x0)), round(abs(y1 - y0))
+    return page_count, width, height
+
+
+def render_pdf(path, max_size):
+    if pdfium is None:
+        page_count, width, height = _scan_pdf(path)
+        return {'thumbnail': None, 'page_count': page_count, 'width': width, 'height': height}
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        page = pdf[0]
+        try:
+            width, height = page.get_size()
+            scale = max_size / max(width, height, 1)
+            image = page.render(scale=scale).to_pil()
+        finally:
+            page.close()
+        return {
+            'thumbnail': _encode_jpeg(image),
+            'page_count': len(pdf),
+            'width': round(width),
+            'height': round(height),
+        }
+    finally:
+        pdf.close()
+
+
+def render_preview(path, kind, max_size):
+    """
+    Return ``{'thumbnail', 'page_count', 'width', 'height'}`` for a file.
+
+    ``thumbnail`` is JPEG bytes or None; sizes are pixels for images and
+    points for PDFs.
+    """
+    if kind == 'image':
+        return render_image(path, max_size)
+    if kind == 'pdf':
+        return render_pdf(path, max_size)
+    raise ValueError(f"Unsupported preview kind: {kind}")
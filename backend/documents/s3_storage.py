@@ -0,0 +1,129 @@
+"""
+S3 storage with parallel multipart uploads for document files.
+"""
+import base64
+import hashlib
+import posixpath
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from botocore.exceptions import BotoCoreError, ClientError
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name, setting
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for every part but the last
+
+
+class MultipartS3Storage(S3Boto3Storage):
+    """
+    S3Boto3Storage that uploads large files as parallel multipart uploads.
+
+    Files at or above ``AWS_S3_MULTIPART_THRESHOLD`` are split into
+    ``AWS_S3_MULTIPART_PART_SIZE`` parts and uploaded from a thread pool of
+    ``AWS_S3_MULTIPART_CONCURRENCY`` workers. At most that many parts are
+    held in memory at once. A failed part is retried on its own; if it keeps
+    failing the multipart upload is aborted so no orphaned parts are billed.
+    Smaller files use the regular single PUT.
+    """
+
+    def get_default_settings(self):
+        defaults = super().get_default_settings()
+        defaults.update({
+            'multipart_threshold': setting('AWS_S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024),
+            'multipart_part_size': setting('AWS_S3_MULTIPART_PART_SIZE', 8 * 1024 * 1024),
+            'multipart_concurrency': setting('AWS_S3_MULTIPART_CONCURRENCY', 4),
+            'multipart_max_retries': setting('AWS_S3_MULTIPART_MAX_RETRIES', 3),
+        })
+        return defaults
+
+    def iter_files(self, prefix=''):
+        """
+        Yield ``(name, modified, size)`` for every file under ``prefix``,
+        fetching the bucket listing one page (up to 1000 keys) at a time.
+        """
+        key_prefix = self._normalize_name(clean_name(prefix)) if prefix else self.location
+        if key_prefix and not key_prefix.endswith('/'):
+            key_prefix += '/'
+        paginator = self.connection.meta.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=key_prefix):
+            for entry in page.get('Contents', ()):
+                name = posixpath.relpath(entry['Key'], self.location) if self.location else entry['Key']
+                yield name, entry['LastModified'], entry['Size']
+
+    def _save(self, name, content):
+        size = getattr(content, 'size', None)
+        if size is None or size < self.multipart_threshold:
+            return super()._save(name, content)
+
+        cleaned_name = clean_name(name)
+        key = self._normalize_name(cleaned_name)
+        params = self._get_write_parameters(key, content)
+        if self.gzip and params.get('ContentType') in self.gzip_content_types:
+            # Compressed size is unknown up front; keep the stock upload path
+            return super()._save(name, content)
+
+        content.seek(0)
+        self._multipart_upload(key, content, params)
+        return cleaned_name
+
+    def _multipart_upload(self, key, content, params):
+        client = self.connection.meta.client
+        part_size = max(self.multipart_part_size, MIN_PART_SIZE)
+        concurrency = max(1, self.multipart_concurrency)
+
+        upload_id = client.create_multipart_upload(
+            Bucket=self.bucket_name, Key=key, **params
+        )['UploadId']
+        try:
+            futures = []
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='s3-part') as pool:
+                in_flight = set()
+                part_number = 1
+                while True:
+                    data = content.read(part_size)
+                    if not data:
+                        break
+                    if isinstance(data, str):
+                        data = data.encode('utf-8')
+                    if len(in_flight) >= concurrency:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()  # surface a failed part before reading more
+                    future = pool.submit(
+                        self._upload_part, client, key, upload_id, part_number, data
+                    )
+                    in_flight.add(future)
+                    futures.append(future)
+                    part_number += 1
+                parts = [future.result() for future in futures]
+
+            client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts},
+            )
+        except BaseException:
+            try:
+                client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+            except (BotoCoreError, ClientError) as e:
+                print(f"Failed to abort multipart upload {upload_id} for {key}: {e}")
+            raise
+
+    def _upload_part(self, client, key, upload_id, part_number, data):
+        """Upload one part, retrying it alone with exponential backoff."""
+        content_md5 = base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
+        for attempt in range(self.multipart_max_retries + 1):
+            try:
+                response = client.upload_part(
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=data,
+                    ContentMD5=content_md5,
+                )
+                return {'PartNumber': part_number, 'ETag': response['ETag']}
+            except (BotoCoreError, ClientError):
+                if attempt == self.multipart_max_retries:
+                    raise
+                time.sleep(0.5 * (2 ** attempt))
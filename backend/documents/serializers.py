@@ -2,7 +2,10 @@
 Serializers for document-related API endpoints.
 """
 from rest_framework import serializers
-from .models import DocumentRecord, DocumentVersion, DocumentAccessLog
+from django.conf import settings
+from .models import DocumentRecord, DocumentVersion, DocumentAccessLog, UploadSession
+
+ALLOWED_CONTENT_TYPES = ['application/pdf', 'image/jpeg', 'image/png']
 
 
 class DocumentUploadSerializer(serializers.Serializer):
@@ -15,34 +18,94 @@ class DocumentUploadSerializer(serializers.Serializer):
         """
         Validate uploaded file.
         """
-        # Check file size (10MB limit)
-        if value.size > 10 * 1024 * 1024:  # 10MB
-            raise serializers.ValidationError("File size cannot exceed 10MB")
+        # Single-file uploads reject oversized or mistyped files while
+        # streaming (ValidatingUploadHandler); these checks cover batch uploads
+        if value.size > settings.MAX_FILE_SIZE:
+            raise serializers.ValidationError(
+                f"File size cannot exceed {settings.MAX_FILE_SIZE // (1024 * 1024)}MB"
+            )
         
         # Check file type
-        allowed_types = ['application/pdf', 'image/jpeg', 'image/png']
-        if value.content_type not in allowed_types:
+        if value.content_type not in ALLOWED_CONTENT_TYPES:
             raise serializers.ValidationError("Only PDF, JPEG, and PNG files are allowed")
         
         return value
 
 
+class ChunkedUploadInitSerializer(serializers.Serializer):
+    """
+    Serializer for starting a resumable chunked upload.
+    """
+    file_name = serializers.CharField(max_length=255)
+    file_size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(max_length=100)
+
+    def validate_file_size(self, value):
+        """
+        Enforce the per-upload size limit.
+        """
+        limit = settings.CHUNKED_UPLOAD_MAX_SIZE
+        if value > limit:
+            raise serializers.ValidationError(
+                f"File size cannot exceed {limit // (1024 * 1024)}MB"
+            )
+        return value
+
+    def validate_content_type(self, value):
+        """
+        Validate declared file type.
+        """
+        if value not in ALLOWED_CONTENT_TYPES:
+            raise serializers.ValidationError("Only PDF, JPEG, and PNG files are allowed")
+        return value
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for chunked upload session state.
+    """
+    class Meta:
+        model = UploadSession
+        fields = [
+            'upload_id', 'file_name', 'content_type', 'file_size', 'offset',
+            'status', 'created_at', 'expires_at'
+        ]
+
+
+def preview_data(document):
+    """Thumbnail URL and page metadata once the preview has been rendered."""
+    blob = document.blob if document.blob_id else None
+    if blob is None or blob.preview_state != 'ready':
+        return None
+    return {
+        'thumbnail_url': f"/api/documents/thumbnail/{document.doc_hash}/" if blob.preview_path else None,
+        'page_count': blob.page_count,
+        'width': blob.width,
+        'height': blob.height,
+    }
+
+
 class DocumentRecordSerializer(serializers.ModelSerializer):
     """
     Serializer for document records.
     """
     file_size_mb = serializers.ReadOnlyField()
+    storage_state = serializers.ReadOnlyField()
     download_url = serializers.SerializerMethodField()
     user_name = serializers.SerializerMethodField()
+    preview = serializers.SerializerMethodField()
     
     class Meta:
         model = DocumentRecord
         fields = [
-            'id', 'doc_hash', 'upload_date', 'file_name', 'file_size',
-            'file_size_mb', 'is_original', 'storage_path', 'file_type',
-            'download_url', 'user_name'
+            'id', 'doc_hash', 'content_digest', 'upload_date', 'file_name', 'file_size',
+            'file_size_mb', 'stored_size', 'compression', 'is_original', 'storage_path',
+            'file_type', 'storage_state', 'download_url', 'user_name', 'preview'
         ]
-        read_only_fields = ['id', 'doc_hash', 'upload_date', 'user']
+        read_only_fields = ['id', 'doc_hash', 'content_digest', 'upload_date', 'user']
+    
+    def get_preview(self, obj):
+        return preview_data(obj)
     
     def get_user_name(self, obj):
         """Get user's full name."""
@@ -64,15 +127,19 @@ class DocumentHistorySerializer(serializers.ModelSerializer):
     """
     file_size_mb = serializers.ReadOnlyField()
     download_url = serializers.SerializerMethodField()
+    preview = serializers.SerializerMethodField()
     
     class Meta:
         model = DocumentRecord
         fields = [
             'id', 'doc_hash', 'upload_date', 'file_name', 'file_size',
             'file_size_mb', 'is_original', 'storage_path', 'file_type',
-            'download_url'
+            'download_url', 'preview'
         ]
     
+    def get_preview(self, obj):
+        return preview_data(obj)
+    
     def get_download_url(self, obj):
         """Get download URL for the document."""
         try:
@@ -102,5 +169,5 @@ class DocumentVersionSerializer(serializers.ModelSerializer):
         model = DocumentVersion
         fields = [
             'id', 'version_number', 'doc_hash', 'file_name', 'file_size',
-            'storage_path', 'upload_date', 'change_reason'
+            'content_digest', 'stored_bytes', 'chunk_state', 'upload_date', 'change_reason'
         ]
\ No newline at end of file
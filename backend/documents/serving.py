@@ -0,0 +1,246 @@
+"""
+Serving document bytes to clients.
+
+Remote backends (Cloudinary, S3) are served by redirecting to the backend
+URL. For local storage the bytes are never copied through Python:
+
+- ``x-accel-redirect``: nginx serves the file from an ``internal`` location
+  mapped to ``MEDIA_ROOT``, e.g.::
+
+      location /protected-media/ {
+          internal;
+          alias /path/to/media/;
+      }
+
+- ``x-sendfile``: Apache mod_xsendfile / lighttpd serve the absolute path.
+- ``file``: a FileResponse, which gunicorn hands to ``os.sendfile`` through
+  ``wsgi.file_wrapper``.
+
+``DOCUMENT_SERVE_MODE = 'auto'`` uses ``file`` for local storage and
+``redirect`` otherwise. Documents stored compressed are always streamed
+through Python and decompressed on the fly.
+
+A document's bytes never change once ``doc_hash`` exists, so responses carry
+a strong ETag derived from it, long-lived ``private, immutable`` caching,
+``If-None-Match`` revalidation and single ``Range`` / ``If-Range`` requests.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, quote_etag
+from .compression import FramedReader, open_stored
+
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def document_etag(document, variant=''):
+    """Strong ETag for a document; ``variant`` distinguishes other representations."""
+    return quote_etag(f"{document.doc_hash}{variant}")
+
+
+def not_modified(request, etag, cache_control=IMMUTABLE_CACHE_CONTROL):
+    """
+    Return a 304 (or 412) response if the client's conditional headers match.
+
+    Callers check this before any audit insert or storage access.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['Cache-Control'] = cache_control
+    return response
+
+
+def _parse_range(header, size):
+    """
+    Parse a single ``bytes=`` range into inclusive ``(start, end)``.
+
+    Returns None when the header should be ignored (absent, malformed or
+    multi-range) and ``False`` when it cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        suffix = int(last)
+        if suffix == 0:
+            return False
+        start = max(size - suffix, 0)
+        end = size - 1
+    if start >= size:
+        return False
+    return start, end
+
+
+class _RangeFile:
+    """
+    Read-only view of ``length`` bytes of an open file starting at ``start``.
+
+    Exposes ``fileno()`` so gunicorn can still ``os.sendfile`` the slice; it
+    sends Content-Length bytes from the current offset.
+    """
+
+    def __init__(self, file, start, length):
+        self._file = file
+        self._remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+def serve_file(request, path, document, as_attachment=False, file_name=None, variant=''):
+    """
+    FileResponse for a local file with Range / If-Range support.
+
+    ``file_name`` and ``variant`` describe a derivative such as a thumbnail.
+    """
+    return serve_fileobj(
+        request, lambda: open(path, 'rb'), os.path.getsize(path), document, as_attachment, file_name, variant
+    )
+
+
+def serve_fileobj(request, opener, size, document, as_attachment=False, file_name=None, variant=''):
+    """
+    FileResponse over the seekable file ``opener()`` returns, ``size`` bytes
+    long, with Range / If-Range support.
+    """
+    etag = document_etag(document, variant)
+    file_name = file_name or document.file_name
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range or if_range.strip() == etag:
+        byte_range = _parse_range(request.META.get('HTTP_RANGE'), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    file = opener()
+    if byte_range:
+        start, end = byte_range
+        response = FileResponse(
+            _RangeFile(file, start, end - start + 1),
+            as_attachment=as_attachment,
+            filename=file_name,
+            status=206
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        response = FileResponse(file, as_attachment=as_attachment, filename=file_name)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def local_path(storage_path):
+    """Absolute filesystem path for a stored file, or None for remote storage."""
+    try:
+        return default_storage.path(storage_path)
+    except NotImplementedError:
+        return None
+
+
+def _serve_mode(path):
+    mode = settings.DOCUMENT_SERVE_MODE
+    if path is None:
+        return 'redirect'
+    if mode == 'auto':
+        return 'file'
+    if mode == 'x-accel-redirect' and not path.startswith(os.path.join(str(settings.MEDIA_ROOT), '')):
+        # Only MEDIA_ROOT is mapped to the internal location (e.g. disk cache copies)
+        return 'file'
+    return mode
+
+
+def serve_document(request, document, as_attachment=False, storage_path=None, file_name=None, variant=''):
+    """
+    Return a response delivering the stored bytes of ``document``.
+
+    Pass ``storage_path``, ``file_name`` and ``variant`` to serve a stored
+    derivative of the document instead of the original.
+    """
+    if storage_path is None and document.compression:
+        return serve_compressed(request, document, as_attachment)
+
+    storage_path = storage_path or document.storage_path
+    file_name = file_name or document.file_name
+    path = local_path(storage_path)
+    mode = _serve_mode(path)
+
+    if mode == 'redirect':
+        # The target URL may be signed or versioned, so only the ETag is set
+        response = HttpResponseRedirect(default_storage.url(storage_path))
+        response['ETag'] = document_etag(document, variant)
+        return response
+
+    if mode == 'file':
+        return serve_file(request, path, document, as_attachment, file_name, variant)
+
+    content_type = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+    response = HttpResponse(content_type=content_type)
+    response['Content-Disposition'] = content_disposition_header(as_attachment, file_name)
+    if mode == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.DOCUMENT_ACCEL_REDIRECT_PREFIX + quote(storage_path)
+    else:  # x-sendfile
+        response['X-Sendfile'] = path
+    # The proxy answers Range requests itself
+    response['ETag'] = document_etag(document, variant)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def serve_compressed(request, document, as_attachment=False):
+    """
+    Serve a document stored compressed, decompressing on the fly.
+
+    Neither the backend URL nor the proxy can hand out the compressed bytes,
+    so they are read through a FramedReader (from the local or disk-cached
+    copy when there is one); a Range request only inflates the frames it
+    covers.
+    """
+    path = local_path(document.storage_path)
+    if path is not None:
+        opener = lambda: FramedReader(open(path, 'rb'))
+    else:
+        opener = lambda: open_stored(default_storage, document.storage_path, document.compression)
+    return serve_fileobj(request, opener, document.file_size, document, as_attachment)
+
+
+def serve_stream(chunks, size, file_name, etag, as_attachment=True):
+    """StreamingHttpResponse for bytes assembled on the fly (e.g. a chunked version)."""
+    content_type = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Length'] = str(size)
+    response['Content-Disposition'] = content_disposition_header(as_attachment, file_name)
+    response['ETag'] = etag
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
@@ -0,0 +1,24 @@
+"""
+Signal handlers for document models.
+"""
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .blobs import release_blob
+from .models import DocumentRecord, DocumentVersion
+from .versioning import discard_version_spool, release_chunks
+from ledger.events import record_document_deleted
+
+
+@receiver(post_delete, sender=DocumentRecord)
+def release_document_blob(sender, instance, **kwargs):
+    """Record the deletion and drop the blob reference (covers user cascades too)."""
+    record_document_deleted(instance)
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+
+
+@receiver(post_delete, sender=DocumentVersion)
+def release_version_chunks(sender, instance, **kwargs):
+    """Drop the deleted version's chunk references (covers document cascades too)."""
+    release_chunks(instance.manifest)
+    discard_version_spool(instance.spool_path)
@@ -0,0 +1,205 @@
+"""
+Garbage collection of stored files no row references any more.
+
+Blobs, chunks and previews delete their files when their last reference
+goes, but files can still be orphaned: uploads that crashed between the
+storage write and the database commit, deletes that failed against the
+backend, and legacy per-user copies from before the blob store.
+
+The storage listing is streamed page by page and joined against every
+column holding a storage path one batch at a time, so memory stays bounded
+by the batch size however many files the backend holds. Storages whose
+listed names may differ from the stored paths (Cloudinary) are matched on
+their ``reference_key`` as well. Files younger than ``min_age`` are skipped
+because an upload may not have committed its row yet, and each batch is
+re-checked right before its orphans are deleted.
+"""
+import posixpath
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone as dt_timezone
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+from .models import DocumentBlob, DocumentChunk, DocumentRecord, DocumentVersion
+
+DEFAULT_PREFIXES = ['blobs/', 'chunks/', 'documents/']
+# Prefix conditions OR-ed into one query by referenced_keys
+KEY_QUERY_SIZE = 100
+
+# (model, field) pairs whose values are storage paths
+REFERENCES = [
+    (DocumentRecord, 'storage_path'),
+    (DocumentBlob, 'storage_path'),
+    (DocumentBlob, 'preview_path'),
+    (DocumentChunk, 'storage_path'),
+    (DocumentVersion, 'storage_path'),
+]
+
+
+class RateLimiter:
+    """Token bucket shared by the deleting threads; ``rate=None`` disables it."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._tokens = rate or 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _walk(storage, path):
+    """Depth-first listing for storages without ``iter_files`` (e.g. local disk)."""
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for file_name in sorted(files):
+        name = posixpath.join(path, file_name)
+        try:
+            yield name, storage.get_modified_time(name), storage.size(name)
+        except FileNotFoundError:
+            continue  # Deleted while listing
+    for directory in sorted(directories):
+        yield from _walk(storage, posixpath.join(path, directory))
+
+
+def iter_storage_files(storage, prefix=''):
+    """Yield ``(name, modified, size)`` for the files under ``prefix``."""
+    if hasattr(storage, 'iter_files'):
+        return storage.iter_files(prefix)
+    return _walk(storage, prefix.rstrip('/'))
+
+
+def referenced_paths(names):
+    """The subset of ``names`` some row still references."""
+    names = list(names)
+    found = set()
+    for model, field in REFERENCES:
+        found.update(
+            model.objects.filter(**{f'{field}__in': names}).values_list(field, flat=True)
+        )
+    return found
+
+
+def referenced_keys(storage, names):
+    """
+    The subset of ``names`` whose ``storage.reference_key`` matches the key
+    of a referenced path (for storages whose listed names are not exact).
+
+    A referenced path always starts with its key, so candidates are found
+    with prefix queries and then compared on the normalized key.
+    """
+    keys = {storage.reference_key(name): name for name in names}
+    found = set()
+    key_list = list(keys)
+    for start in range(0, len(key_list), KEY_QUERY_SIZE):
+        chunk = key_list[start:start + KEY_QUERY_SIZE]
+        for model, field in REFERENCES:
+            condition = Q()
+            for key in chunk:
+                condition |= Q(**{f'{field}__startswith': key})
+            for path in model.objects.filter(condition).values_list(field, flat=True):
+                key = storage.reference_key(path)
+                if key in keys:
+                    found.add(keys[key])
+    return found
+
+
+def _referenced(storage, names):
+    names = list(names)
+    found = referenced_paths(names)
+    if hasattr(storage, 'reference_key'):
+        found |= referenced_keys(storage, [name for name in names if name not in found])
+    return found
+
+
+def _aware(value):
+    """Storage backends report naive UTC or aware times."""
+    if timezone.is_naive(value):
+        return timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def collect_garbage(prefixes=None, dry_run=False, batch_size=1000, workers=4, rate=None,
+                    min_age=timedelta(hours=24), on_orphan=None):
+    """
+    Delete stored files under ``prefixes`` that no row references.
+
+    ``rate`` caps deletes per second across ``workers`` threads.
+    ``on_orphan(name, size, modified)`` is called for every orphan found
+    (e.g. for a dry-run report). Returns a summary of counts and bytes.
+    """
+    storage = default_storage
+    cutoff = timezone.now() - min_age
+    limiter = RateLimiter(rate)
+    summary = {
+        'scanned': 0, 'referenced': 0, 'too_recent': 0, 'orphaned': 0,
+        'orphaned_bytes': 0, 'deleted': 0, 'deleted_bytes': 0, 'failed': 0,
+    }
+
+    def delete(entry):
+        name, size = entry
+        limiter.acquire()
+        try:
+            storage.delete(name)
+            return size
+        except Exception as e:
+            print(f"Storage GC: could not delete {name}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='storage-gc') as executor:
+        for prefix in prefixes or DEFAULT_PREFIXES:
+            for batch in _batches(iter_storage_files(storage, prefix), batch_size):
+                summary['scanned'] += len(batch)
+                referenced = _referenced(storage, (name for name, _, _ in batch))
+                orphans = []
+                for name, modified, size in batch:
+                    if name in referenced:
+                        summary['referenced'] += 1
+                    elif modified is not None and _aware(modified) > cutoff:
+                        summary['too_recent'] += 1
+                    else:
+                        orphans.append((name, size))
+                        summary['orphaned'] += 1
+                        summary['orphaned_bytes'] += size
+                        if on_orphan:
+                            on_orphan(name, size, modified)
+                if dry_run or not orphans:
+                    continue
+
+                # A row may have claimed a path since the batch was joined
+                still_referenced = _referenced(storage, (name for name, _ in orphans))
+                orphans = [entry for entry in orphans if entry[0] not in still_referenced]
+                for deleted in executor.map(delete, orphans):
+                    if deleted is None:
+                        summary['failed'] += 1
+                    else:
+                        summary['deleted'] += 1
+                        summary['deleted_bytes'] += deleted
+    return summary
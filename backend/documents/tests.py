@@ -1,3 +1,1053 @@
-from django.test import TestCase
+"""
+Tests for the documents app.
+"""
+import hashlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import skipIf
+from unittest.mock import MagicMock, PropertyMock, patch
+from cloudinary.exceptions import NotFound
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User, UserProfile
+from accounts.authentication import generate_tokens
+from .chunked import _hashers, claim_session
+from .cloudinary_storage import DocumentCloudinaryStorage
+from .compression import (
+    CompressedFileError, FramedReader, compress_to, get_codec, open_stored, save_file
+)
+from .disk_cache import DiskCache
+from .hashing import DocumentHasher, hash_uploaded_file
+from .lru import LRUCache
+from .models import (
+    CloudinaryAsset, DocumentAccessLog, DocumentBlob, DocumentChunk, DocumentRecord, DocumentVersion, UploadSession
+)
+from .offload import offload_blob, retry_unstored_blobs
+from .previews import generate_preview
+from .serving import _parse_range
+from .storage_gc import collect_garbage
+from .upload_handlers import SNIFF_BYTES, UploadTypeMismatch, check_content_type
+from .versioning import chunk_pending_versions
 
-# Create your tests here.
+try:
+    from botocore.exceptions import ClientError
+    from .s3_storage import MIN_PART_SIZE, MultipartS3Storage
+except ImportError:  # boto3 and django-storages are optional
+    MultipartS3Storage = None
+
+PDF_BYTES = b'%PDF-1.4\n' + b'BT /F1 10 Tf (hello) Tj ET\n' * 200
+PNG_BYTES = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 20
+
+
+def make_user(email='employee@example.com'):
+    return User.objects.create_user(email=email, username=email, password='test-password-123')
+
+
+def make_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {generate_tokens(user)['access']}")
+    return client
+
+
+def pdf_file(name='document.pdf', content=PDF_BYTES):
+    return SimpleUploadedFile(name, content, content_type='application/pdf')
+
+
+class LocalStorageMixin:
+    """Run against a temporary local file storage with background work disabled."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        storage = {'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                   'OPTIONS': {'location': media_root, 'base_url': '/media/'}}
+        overrides = override_settings(
+            MEDIA_ROOT=media_root,
+            STORAGES={'default': storage, 'staticfiles': {
+                'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}},
+            UPLOAD_SPOOL_DIR=media_root + '/spool',
+            SECURE_SSL_REDIRECT=False,
+            ASYNC_STORAGE_OFFLOAD=False,
+            VERSION_CHUNKING_ASYNC=False,
+            DOCUMENT_PREVIEWS_ENABLED=False,
+            DOCUMENT_COMPRESSION_ENABLED=False,
+            RATE_LIMIT_ENABLE=False,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = make_user()
+        UserProfile.objects.create(user=self.user)
+        self.client = make_client(self.user)
+
+    def upload(self, upload_file):
+        return self.client.post('/api/documents/upload/', {'file': upload_file}, format='multipart')
+
+
+class DocumentHasherTests(SimpleTestCase):
+    """Streaming hashes match the original one-shot scheme."""
+
+    def test_chunked_hash_matches_one_shot(self):
+        hasher = DocumentHasher().feed(pdf_file(), chunk_size=100)
+        expected = hashlib.sha256(PDF_BYTES + b'document.pdf' + b'1700000000000' + b'salt').hexdigest()
+        self.assertEqual(hasher.finalize('document.pdf', '1700000000000', 'salt'), expected)
+        self.assertEqual(hasher.content_digest, hashlib.sha256(PDF_BYTES).hexdigest())
+        self.assertEqual(hasher.size, len(PDF_BYTES))
+
+    def test_finalize_and_copy_leave_the_state_alone(self):
+        hasher = DocumentHasher()
+        hasher.update(b'abc')
+        clone = hasher.copy()
+        clone.update(b'def')
+        hasher.finalize('a.pdf')
+        self.assertEqual(hasher.content_digest, hashlib.sha256(b'abc').hexdigest())
+        self.assertEqual(clone.content_digest, hashlib.sha256(b'abcdef').hexdigest())
+
+    def test_hash_uploaded_file_rewinds(self):
+        upload = pdf_file()
+        doc_hash, hasher = hash_uploaded_file(upload)
+        self.assertEqual(len(doc_hash), 64)
+        self.assertEqual(upload.read(), PDF_BYTES)
+
+
+class BlobStoreTests(LocalStorageMixin, TestCase):
+    """Identical uploads share one stored blob, freed with its last reference."""
+
+    def test_duplicate_upload_reuses_the_blob(self):
+        first = self.upload(pdf_file('first.pdf')).json()['data']
+        second = self.upload(pdf_file('second.pdf')).json()['data']
+        self.assertNotEqual(first['doc_hash'], second['doc_hash'])
+        blob = DocumentBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.content_digest, hashlib.sha256(PDF_BYTES).hexdigest())
+        self.assertTrue(default_storage.exists(blob.storage_path))
+        self.assertEqual(
+            set(DocumentRecord.objects.values_list('storage_path', flat=True)), {blob.storage_path}
+        )
+
+    def test_stored_file_removed_with_the_last_reference(self):
+        self.upload(pdf_file('first.pdf'))
+        second = self.upload(pdf_file('second.pdf')).json()['data']
+        blob = DocumentBlob.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/documents/delete/{second['doc_hash']}/")
+        self.assertEqual(response.status_code, 200)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(default_storage.exists(blob.storage_path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DocumentRecord.objects.get().delete()
+        self.assertFalse(DocumentBlob.objects.exists())
+        self.assertFalse(default_storage.exists(blob.storage_path))
+
+
+@override_settings(OFFLOAD_RETRY_BACKOFF=0)
+class StorageOffloadTests(LocalStorageMixin, TestCase):
+    """Uploads are accepted from the spool and pushed to storage afterwards."""
+
+    def setUp(self):
+        super().setUp()
+        with self.settings(ASYNC_STORAGE_OFFLOAD=True):
+            response = self.upload(pdf_file())
+        self.assertEqual(response.status_code, 202)
+        self.doc_hash = response.json()['data']['doc_hash']
+        self.blob = DocumentBlob.objects.get()
+
+    def status(self):
+        return self.client.get(f'/api/documents/status/{self.doc_hash}/').json()['data']
+
+    def test_pending_document_served_from_the_spool(self):
+        self.assertEqual(self.status()['storageState'], 'pending')
+        self.assertFalse(default_storage.exists(self.blob.storage_path))
+        response = self.client.get(f'/api/documents/download/{self.doc_hash}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), PDF_BYTES)
+
+    def test_offload_stores_the_blob_and_removes_the_spool(self):
+        self.assertEqual(offload_blob(self.blob.pk), 'stored')
+        self.assertEqual(self.status(), {'docHash': self.doc_hash, 'storageState': 'stored', 'attempts': 1})
+        self.assertTrue(default_storage.exists(self.blob.storage_path))
+        self.assertFalse(os.path.exists(self.blob.spool_path))
+
+    def test_failed_offload_is_reported_and_retryable(self):
+        with patch('documents.offload.save_file', side_effect=OSError('storage down')):
+            self.assertEqual(offload_blob(self.blob.pk, max_retries=1), 'failed')
+        status = self.status()
+        self.assertEqual((status['storageState'], status['attempts'], status['error']), ('failed', 2, 'storage down'))
+        self.assertEqual(retry_unstored_blobs(), {'stored': 1})
+
+
+class BatchUploadTests(LocalStorageMixin, TestCase):
+    """Several files per request, hashed in parallel and written in bulk."""
+
+    def batch(self, files):
+        return self.client.post('/api/documents/upload/batch/', {'files': files}, format='multipart')
+
+    def test_uploads_every_file(self):
+        files = [pdf_file(f'doc{index}.pdf', PDF_BYTES + bytes([index])) for index in range(3)]
+        response = self.batch(files)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()['data']
+        self.assertEqual((data['uploaded'], data['failed']), (3, 0))
+        hashes = [result['data']['doc_hash'] for result in data['results']]
+        self.assertEqual(len(set(hashes)), 3)
+        self.assertEqual(DocumentBlob.objects.count(), 3)
+        self.assertEqual(DocumentAccessLog.objects.filter(access_type='upload').count(), 3)
+        # The first file of the batch becomes the original
+        self.assertEqual(UserProfile.objects.get(user=self.user).doc_hash, hashes[0])
+        self.assertEqual(list(DocumentRecord.objects.filter(is_original=True).values_list('doc_hash', flat=True)),
+                         hashes[:1])
+
+    @override_settings(BATCH_UPLOAD_MAX_FILES=2)
+    def test_rejects_oversized_batches(self):
+        response = self.batch([pdf_file(f'doc{index}.pdf') for index in range(3)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DocumentRecord.objects.exists())
+
+
+@skipIf(MultipartS3Storage is None, 'boto3 and django-storages are not installed')
+class MultipartS3StorageTests(SimpleTestCase):
+    """Large files go up as parallel parts, retried alone and aborted on failure."""
+
+    DATA = bytes(range(256)) * (11 * 1024 * 4)  # 11 MiB: three 5 MiB parts
+
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+        self.client.upload_part.side_effect = lambda **kwargs: {'ETag': f"etag-{kwargs['PartNumber']}"}
+        connection = patch.object(MultipartS3Storage, 'connection', new_callable=PropertyMock,
+                                  return_value=MagicMock(meta=MagicMock(client=self.client)))
+        connection.start()
+        self.addCleanup(connection.stop)
+        sleep = patch('documents.s3_storage.time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+        self.storage = MultipartS3Storage(
+            bucket_name='documents', multipart_threshold=MIN_PART_SIZE, multipart_part_size=MIN_PART_SIZE,
+            multipart_concurrency=2, multipart_max_retries=1
+        )
+
+    def save(self):
+        return self.storage._save('documents/EMP1/big.pdf', ContentFile(self.DATA, name='big.pdf'))
+
+    def test_parts_uploaded_and_completed_in_order(self):
+        self.assertEqual(self.save(), 'documents/EMP1/big.pdf')
+        parts = self.client.complete_multipart_upload.call_args.kwargs['MultipartUpload']['Parts']
+        self.assertEqual(parts, [{'PartNumber': n, 'ETag': f'etag-{n}'} for n in (1, 2, 3)])
+        bodies = sorted((c.kwargs['PartNumber'], c.kwargs['Body']) for c in self.client.upload_part.call_args_list)
+        self.assertEqual(b''.join(body for _, body in bodies), self.DATA)
+
+    def test_failed_part_is_retried_alone(self):
+        failures = {2: 1}
+
+        def upload_part(**kwargs):
+            if failures.get(kwargs['PartNumber']):
+                failures[kwargs['PartNumber']] -= 1
+                raise ClientError({'Error': {'Code': 'SlowDown'}}, 'UploadPart')
+            return {'ETag': f"etag-{kwargs['PartNumber']}"}
+
+        self.client.upload_part.side_effect = upload_part
+        self.save()
+        self.assertEqual(self.client.upload_part.call_count, 4)
+        self.client.abort_multipart_upload.assert_not_called()
+
+    def test_persistent_failure_aborts_the_upload(self):
+        self.client.upload_part.side_effect = ClientError({'Error': {'Code': 'InternalError'}}, 'UploadPart')
+        with self.assertRaises(ClientError):
+            self.save()
+        self.client.abort_multipart_upload.assert_called_once_with(
+            Bucket='documents', Key='documents/EMP1/big.pdf', UploadId='upload-1'
+        )
+        self.client.complete_multipart_upload.assert_not_called()
+
+
+class DocumentServingTests(LocalStorageMixin, TestCase):
+    """Downloads are handed to the file wrapper, the proxy or the remote URL."""
+
+    def setUp(self):
+        super().setUp()
+        self.doc_hash = self.upload(pdf_file()).json()['data']['doc_hash']
+        self.document = DocumentRecord.objects.get()
+        self.url = f'/api/documents/download/{self.doc_hash}/'
+
+    def test_local_file_streamed_without_buffering(self):
+        response = self.client.get(self.url)
+        self.assertTrue(hasattr(response, 'file_to_stream'))
+        self.assertEqual(b''.join(response.streaming_content), PDF_BYTES)
+        self.assertEqual(response['Content-Length'], str(len(PDF_BYTES)))
+        self.assertIn('attachment', response['Content-Disposition'])
+
+    @override_settings(DOCUMENT_SERVE_MODE='x-accel-redirect', DOCUMENT_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_accel_redirect_leaves_the_bytes_to_nginx(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.document.storage_path}')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(DOCUMENT_SERVE_MODE='x-sendfile')
+    def test_sendfile_names_the_absolute_path(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.document.storage_path))
+
+    def test_remote_storage_redirects(self):
+        with patch('documents.serving.local_path', return_value=None), \
+                patch('documents.serving.default_storage.url', return_value='https://cdn.example.com/doc.pdf'):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://cdn.example.com/doc.pdf')
+
+
+class RangeParsingTests(SimpleTestCase):
+    """Single byte ranges are honored; anything else is ignored or refused."""
+
+    def test_parse_range(self):
+        self.assertEqual(_parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(_parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(_parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(_parse_range('bytes=50-500', 100), (50, 99))
+        self.assertFalse(_parse_range('bytes=100-', 100))
+        self.assertFalse(_parse_range('bytes=-0', 100))
+        for ignored in (None, '', 'bytes=5-1', 'bytes=0-1,5-6', 'items=0-1', 'bytes=-'):
+            self.assertIsNone(_parse_range(ignored, 100), ignored)
+
+
+class ConditionalRangeTests(LocalStorageMixin, TestCase):
+    """ETag revalidation and single byte ranges keyed by doc_hash."""
+
+    def setUp(self):
+        super().setUp()
+        self.doc_hash = self.upload(pdf_file()).json()['data']['doc_hash']
+        self.url = f'/api/documents/download/{self.doc_hash}/'
+        self.etag = f'"{self.doc_hash}"'
+
+    def test_range_returns_partial_content(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5-14')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 5-14/{len(PDF_BYTES)}')
+        self.assertEqual(b''.join(response.streaming_content), PDF_BYTES[5:15])
+        self.assertEqual(response['ETag'], self.etag)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(PDF_BYTES)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(PDF_BYTES)}')
+
+    def test_if_range_with_a_stale_etag_sends_everything(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), PDF_BYTES)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=self.etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_if_none_match_revalidates_without_an_access_log(self):
+        logged = DocumentAccessLog.objects.count()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(DocumentAccessLog.objects.count(), logged)
+
+
+class FramedCompressionTests(SimpleTestCase):
+    """Framed containers decompress only the frames a read touches."""
+
+    def setUp(self):
+        rng = random.Random(7)
+        # Compressible but not uniform, so every frame differs
+        self.data = b''.join(f"line {rng.randrange(10 ** 6)}\n".encode() for _ in range(3000))
+        self.container = io.BytesIO()
+        compress_to(io.BytesIO(self.data), self.container, get_codec('zlib'), frame_size=1000)
+        self.container.seek(0)
+
+    def test_round_trip(self):
+        reader = FramedReader(self.container)
+        self.assertEqual(reader.size, len(self.data))
+        self.assertLess(len(self.container.getvalue()), len(self.data))
+        self.assertEqual(b''.join(reader), self.data)
+
+    def test_seeks_across_frame_boundaries(self):
+        reader = FramedReader(self.container)
+        for offset, length in ((0, 10), (995, 10), (2999, 2002), (len(self.data) - 5, 100)):
+            reader.seek(offset)
+            self.assertEqual(reader.read(length), self.data[offset:offset + length])
+        reader.seek(-20, os.SEEK_END)
+        reader.seek(5, os.SEEK_CUR)
+        self.assertEqual(reader.tell(), len(self.data) - 15)
+        self.assertEqual(reader.read(), self.data[-15:])
+
+    def test_reads_only_the_frames_touched(self):
+        reader = FramedReader(self.container)
+        decompress = MagicMock(wraps=reader._codec.decompress)
+        reader._codec = reader._codec._replace(decompress=decompress)
+        reader.seek(4500)
+        reader.read(1000)
+        self.assertEqual(decompress.call_count, 2)
+
+    def test_sample_frame_decides_whether_to_compress(self):
+        noise = random.Random(7).randbytes(5000)
+        self.assertIsNone(compress_to(io.BytesIO(noise), io.BytesIO(), get_codec('zlib'), 1000, max_ratio=0.9))
+
+    def test_truncated_container_is_rejected(self):
+        with self.assertRaises(CompressedFileError):
+            FramedReader(io.BytesIO(self.container.getvalue()[:-4]))
+
+
+@override_settings(DOCUMENT_COMPRESSION_CODEC='zlib', DOCUMENT_COMPRESSION_TYPES=['application/pdf'])
+class CompressedServingTests(LocalStorageMixin, TestCase):
+    """Compressed uploads are served as their original bytes, ranges included."""
+
+    def setUp(self):
+        super().setUp()
+        with self.settings(DOCUMENT_COMPRESSION_ENABLED=True):
+            self.doc_hash = self.upload(pdf_file()).json()['data']['doc_hash']
+        self.url = f'/api/documents/download/{self.doc_hash}/'
+
+    def test_stored_compressed(self):
+        blob = DocumentBlob.objects.get()
+        self.assertEqual(blob.compression, 'zlib')
+        self.assertTrue(blob.storage_path.endswith('.pdf.zz'))
+        self.assertEqual(blob.size, len(PDF_BYTES))
+        self.assertLess(blob.stored_size, blob.size)
+        with open_stored(default_storage, blob.storage_path, blob.compression) as stored:
+            self.assertEqual(stored.read(), PDF_BYTES)
+
+    def test_download_and_range(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['Content-Length']), len(PDF_BYTES))
+        self.assertEqual(b''.join(response.streaming_content), PDF_BYTES)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-1999')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1999/{len(PDF_BYTES)}')
+        self.assertEqual(b''.join(response.streaming_content), PDF_BYTES[1000:2000])
+
+    def test_small_or_incompressible_files_stored_as_is(self):
+        noise = b'%PDF-1.4\n' + random.Random(7).randbytes(8000)
+        with self.settings(DOCUMENT_COMPRESSION_ENABLED=True):
+            saved, compression, stored_size = save_file(default_storage, 'blobs/noise.pdf', io.BytesIO(noise), len(noise))
+            self.assertEqual((saved, compression, stored_size), ('blobs/noise.pdf', '', len(noise)))
+            saved, compression, _ = save_file(default_storage, 'blobs/small.pdf', io.BytesIO(b'%PDF' * 10), 40)
+            self.assertEqual(compression, '')
+
+    def test_not_compressed_when_served_directly(self):
+        with self.settings(DOCUMENT_COMPRESSION_ENABLED=True):
+            with self.settings(DOCUMENT_SERVE_MODE='x-accel-redirect'):
+                self.assertEqual(save_file(default_storage, 'blobs/a.pdf', io.BytesIO(PDF_BYTES), len(PDF_BYTES))[1], '')
+            remote = MagicMock(wraps=default_storage)
+            remote.path.side_effect = NotImplementedError
+            remote.save.return_value = 'blobs/b.pdf'
+            self.assertEqual(save_file(remote, 'blobs/b.pdf', io.BytesIO(PDF_BYTES), len(PDF_BYTES))[1], '')
+
+
+class DocumentHistoryTests(LocalStorageMixin, TestCase):
+    """History is an append-only table; the first upload becomes the original."""
+
+    def upload_many(self, count):
+        return [
+            self.upload(pdf_file(f'doc{index}.pdf', PDF_BYTES + bytes([index]))).json()['data']['doc_hash']
+            for index in range(count)
+        ]
+
+    def test_history_lists_every_upload_in_order(self):
+        hashes = self.upload_many(3)
+        data = self.client.get('/api/documents/hashes/').json()['data']
+        self.assertEqual(data['docHistory'], hashes)
+        self.assertEqual(data['docHash'], hashes[0])
+        self.assertEqual(UserProfile.objects.get(user=self.user).doc_history, hashes)
+
+    def test_only_one_upload_claims_the_original(self):
+        hashes = self.upload_many(2)
+        originals = DocumentRecord.objects.filter(is_original=True).values_list('doc_hash', flat=True)
+        self.assertEqual(list(originals), hashes[:1])
+
+    def test_history_outlives_deleted_documents(self):
+        hashes = self.upload_many(2)
+        self.client.delete(f'/api/documents/delete/{hashes[1]}/')
+        self.assertEqual(self.client.get('/api/documents/hashes/').json()['data']['docHistory'], hashes)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class HistoryPaginationTests(TestCase):
+    """Cursor pages of the history listing, with a fixed number of queries."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.client = make_client(self.user)
+        for index in range(5):
+            self.add_document(index)
+
+    def add_document(self, index):
+        blob = DocumentBlob.objects.create(
+            content_digest=f'{index:064d}', storage_path=f'blobs/{index}.pdf', size=10, preview_state='ready',
+            preview_path=f'blobs/{index}-thumb.jpg', page_count=1
+        )
+        document = DocumentRecord.objects.create(
+            user=self.user, doc_hash=f'{index:064x}', file_name=f'{index}.pdf', file_size=10,
+            storage_path=blob.storage_path, blob=blob
+        )
+        DocumentRecord.objects.filter(pk=document.pk).update(upload_date=timezone.now() + timedelta(minutes=index))
+        return document
+
+    def walk(self, url):
+        names = []
+        while url:
+            page = self.client.get(url).json()
+            names.extend(result['file_name'] for result in page['results'])
+            url = page['next']
+        return names
+
+    def test_pages_cover_every_document_newest_first(self):
+        self.assertEqual(self.walk('/api/documents/history/?page_size=2'), [f'{i}.pdf' for i in (4, 3, 2, 1, 0)])
+
+    def test_cursor_is_stable_when_documents_are_added(self):
+        first = self.client.get('/api/documents/history/?page_size=2').json()
+        self.add_document(9)
+        rest = self.walk(first['next'])
+        self.assertEqual(rest, ['2.pdf', '1.pdf', '0.pdf'])
+
+    def test_equal_timestamps_are_paged_by_offset(self):
+        DocumentRecord.objects.update(upload_date=timezone.now())
+        names = self.walk('/api/documents/history/?page_size=2')
+        # Ordered by id among equal timestamps, each document exactly once
+        self.assertEqual(names, [f'{i}.pdf' for i in (4, 3, 2, 1, 0)])
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/documents/history/?page_size=1')
+        with CaptureQueriesContext(connection) as large:
+            self.client.get('/api/documents/history/?page_size=5')
+        self.assertEqual(len(small), len(large))
+
+
+@override_settings(VERSION_CHUNK_AVG_SIZE=4096)
+class DocumentVersionTests(LocalStorageMixin, TestCase):
+    """Revisions share content-defined chunks with earlier versions."""
+
+    ORIGINAL = b'%PDF-1.4\n' + random.Random(7).randbytes(96 * 1024)
+
+    def setUp(self):
+        super().setUp()
+        self.doc_hash = self.upload(pdf_file(content=self.ORIGINAL)).json()['data']['doc_hash']
+        self.revised = self.ORIGINAL[:50000] + b'an edit in the middle' + self.ORIGINAL[50000:]
+
+    def add_version(self, content):
+        return self.client.post(f'/api/documents/versions/{self.doc_hash}/', {
+            'file': pdf_file('revised.pdf', content), 'change_reason': 'typo'
+        }, format='multipart')
+
+    def download(self, number):
+        response = self.client.get(f'/api/documents/versions/{self.doc_hash}/{number}/download/')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_revision_stores_only_changed_chunks(self):
+        response = self.add_version(self.revised)
+        self.assertEqual(response.status_code, 201)
+        version = DocumentVersion.objects.get(version_number=2)
+        self.assertLess(version.stored_bytes, len(self.revised) // 4)
+        self.assertEqual(version.change_reason, 'typo')
+        self.assertEqual(self.download(1), self.ORIGINAL)
+        self.assertEqual(self.download(2), self.revised)
+        listed = self.client.get(f'/api/documents/versions/{self.doc_hash}/').json()['data']
+        self.assertEqual([item['version_number'] for item in listed], [2, 1])
+
+    def test_deleting_the_document_releases_its_chunks(self):
+        self.add_version(self.revised)
+        paths = list(DocumentChunk.objects.values_list('storage_path', flat=True))
+        self.assertTrue(paths)
+        with self.captureOnCommitCallbacks(execute=True):
+            DocumentRecord.objects.get().delete()
+        self.assertFalse(DocumentChunk.objects.exists())
+        self.assertFalse(any(default_storage.exists(path) for path in paths))
+
+    @override_settings(VERSION_CHUNKING_ASYNC=True)
+    def test_chunking_runs_after_the_upload_responds(self):
+        with patch('documents.versioning.run_in_background') as run_in_background, \
+                patch('documents.versioning.scan_chunks') as scan_chunks:
+            response = self.add_version(self.revised)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data']['chunk_state'], 'pending')
+        scan_chunks.assert_not_called()
+        self.assertFalse(DocumentChunk.objects.exists())
+
+        # Pending versions are served from the spooled upload and the original
+        self.assertEqual(self.download(1), self.ORIGINAL)
+        self.assertEqual(self.download(2), self.revised)
+        spool_path = DocumentVersion.objects.get(version_number=2).spool_path
+        self.assertTrue(os.path.exists(spool_path))
+
+        for call in run_in_background.call_args_list:
+            self.assertEqual(call.args[0](*call.args[1:]), 'stored')
+        version = DocumentVersion.objects.get(version_number=2)
+        self.assertEqual(version.chunk_state, 'stored')
+        self.assertEqual(version.content_digest, hashlib.sha256(self.revised).hexdigest())
+        self.assertLess(version.stored_bytes, len(self.revised) // 4)
+        self.assertFalse(os.path.exists(spool_path))
+        self.assertEqual(self.download(2), self.revised)
+
+    @override_settings(VERSION_CHUNKING_ASYNC=True)
+    def test_failed_chunking_is_retried(self):
+        with patch('documents.versioning.run_in_background'):
+            self.add_version(self.revised)
+        with patch('documents.versioning.acquire_chunks', side_effect=OSError('disk full')):
+            self.assertEqual(chunk_pending_versions(), {'failed': 2})
+        self.assertEqual(self.download(2), self.revised)
+        self.assertEqual(chunk_pending_versions(), {'stored': 2})
+        self.assertEqual(self.download(1), self.ORIGINAL)
+
+
+class DiskCacheTests(SimpleTestCase):
+    """Read-through copies of remote files, bounded by size and verified."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.remote = {f'doc{index}.pdf': bytes([index]) * 100 for index in range(4)}
+        self.fetches = []
+
+    def make_cache(self, max_bytes=10_000, max_object_size=1_000):
+        return DiskCache(self.directory, max_bytes, max_object_size)
+
+    def get(self, cache, name, delay=0):
+        def open_source():
+            self.fetches.append(name)
+            time.sleep(delay)
+            return io.BytesIO(self.remote[name])
+        return cache.get_path(name, open_source, lambda: len(self.remote[name]))
+
+    def read(self, path):
+        with open(path, 'rb') as fh:
+            return fh.read()
+
+    def test_miss_then_hit(self):
+        cache = self.make_cache()
+        path = self.get(cache, 'doc1.pdf')
+        self.assertEqual(self.read(path), self.remote['doc1.pdf'])
+        self.assertEqual(self.get(cache, 'doc1.pdf'), path)
+        self.assertEqual(self.fetches, ['doc1.pdf'])
+        stats = cache.metrics.snapshot()
+        self.assertEqual((stats['hits'], stats['misses'], stats['bytes_saved']), (1, 1, 100))
+
+    def test_concurrent_misses_fetch_once(self):
+        cache = self.make_cache()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            paths = set(pool.map(lambda _: self.get(cache, 'doc1.pdf', delay=0.05), range(8)))
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(self.fetches, ['doc1.pdf'])
+
+    def test_corrupted_copy_is_fetched_again(self):
+        path = self.get(self.make_cache(), 'doc1.pdf')
+        with open(path, 'r+b') as fh:
+            fh.write(b'X')
+        # A process that has not verified the copy yet checks its digest
+        self.assertEqual(self.read(self.get(self.make_cache(), 'doc1.pdf')), self.remote['doc1.pdf'])
+        self.assertEqual(len(self.fetches), 2)
+
+    def test_short_fetch_leaves_no_entry(self):
+        cache = self.make_cache()
+        with self.assertRaises(IOError):
+            cache.get_path('doc1.pdf', lambda: io.BytesIO(b'short'), lambda: 100)
+        self.assertEqual(cache.usage()['files'], 0)
+
+    def test_large_files_bypass_the_cache(self):
+        self.assertIsNone(self.get(self.make_cache(max_object_size=50), 'doc1.pdf'))
+        self.assertEqual(self.fetches, [])
+
+    def test_least_recently_read_files_evicted(self):
+        cache = self.make_cache(max_bytes=350)
+        for index, name in enumerate(['doc0.pdf', 'doc1.pdf', 'doc2.pdf']):
+            path = self.get(cache, name)
+            os.utime(path, ns=(index * 10 ** 9, index * 10 ** 9))
+        self.get(cache, 'doc0.pdf')  # read again: now the most recent
+        self.get(cache, 'doc3.pdf')
+        self.assertEqual(cache.usage()['bytes'], 300)
+        self.fetches.clear()
+        for name in ('doc0.pdf', 'doc2.pdf', 'doc3.pdf'):
+            self.get(cache, name)
+        self.assertEqual(self.fetches, [])
+
+
+class UploadValidationTests(LocalStorageMixin, TestCase):
+    """Streaming validation of single uploads and per-file results for batches."""
+
+    def test_single_upload_rejects_disguised_file(self):
+        response = self.upload(pdf_file(content=PNG_BYTES))
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(DocumentRecord.objects.exists())
+
+    @override_settings(MAX_FILE_SIZE=1024)
+    def test_single_upload_aborts_oversized_file(self):
+        response = self.upload(pdf_file())
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(DocumentRecord.objects.exists())
+
+    def test_check_content_type(self):
+        check_content_type(PDF_BYTES[:SNIFF_BYTES], 'application/pdf')
+        check_content_type(PNG_BYTES[:SNIFF_BYTES], 'image/png')
+        with self.assertRaises(UploadTypeMismatch):
+            check_content_type(b'MZ\x90\x00', 'application/pdf')
+
+    def test_batch_reports_bad_file_without_failing_the_others(self):
+        files = [pdf_file('good.pdf'), pdf_file('disguised.pdf', PNG_BYTES), pdf_file('other.pdf', PDF_BYTES + b'%')]
+        response = self.client.post('/api/documents/upload/batch/', {'files': files}, format='multipart')
+        self.assertEqual(response.status_code, 207)
+        results = response.json()['data']['results']
+        self.assertEqual([result['success'] for result in results], [True, False, True])
+        self.assertIn('does not match', results[1]['error'])
+        self.assertEqual(DocumentRecord.objects.count(), 2)
+
+
+class ChunkedUploadTests(LocalStorageMixin, TestCase):
+    """Resumable uploads, and only one of concurrent completions finalizing."""
+
+    def start(self, content=PDF_BYTES):
+        response = self.client.post('/api/documents/uploads/', {
+            'file_name': 'document.pdf', 'file_size': len(content), 'content_type': 'application/pdf'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.json()['data']['upload_id']
+        response = self.client.patch(
+            f'/api/documents/uploads/{upload_id}/', content,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='0'
+        )
+        self.assertEqual(response.status_code, 200)
+        return upload_id
+
+    def complete(self, upload_id):
+        return self.client.post(f'/api/documents/uploads/{upload_id}/complete/')
+
+    def test_complete_is_idempotent(self):
+        upload_id = self.start()
+        first = self.complete(upload_id)
+        self.assertEqual(first.status_code, 201)
+        second = self.complete(upload_id)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['data']['doc_hash'], first.json()['data']['doc_hash'])
+        self.assertEqual(DocumentRecord.objects.count(), 1)
+
+    def test_concurrent_complete_gets_conflict(self):
+        upload_id = self.start()
+        session = UploadSession.objects.get(upload_id=upload_id)
+        self.assertTrue(claim_session(session))
+        self.assertFalse(claim_session(UploadSession.objects.get(upload_id=upload_id)))
+        self.assertEqual(self.complete(upload_id).status_code, 409)
+        response = self.client.patch(
+            f'/api/documents/uploads/{upload_id}/', b'x',
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(len(PDF_BYTES))
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(DocumentRecord.objects.exists())
+
+    def test_failed_completion_can_be_retried(self):
+        upload_id = self.start()
+        with patch('documents.views.save_uploaded_document', side_effect=OSError('disk full')):
+            self.assertEqual(self.complete(upload_id).status_code, 400)
+        self.assertEqual(UploadSession.objects.get(upload_id=upload_id).status, 'active')
+        self.assertEqual(self.complete(upload_id).status_code, 201)
+
+    def start_partial(self, length):
+        response = self.client.post('/api/documents/uploads/', {
+            'file_name': 'document.pdf', 'file_size': len(PDF_BYTES), 'content_type': 'application/pdf'
+        }, format='json')
+        upload_id = response.json()['data']['upload_id']
+        self.patch_chunk(upload_id, 0, PDF_BYTES[:length])
+        return upload_id
+
+    def patch_chunk(self, upload_id, offset, content):
+        return self.client.patch(
+            f'/api/documents/uploads/{upload_id}/', content,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_resume_after_hash_state_is_evicted(self):
+        half = len(PDF_BYTES) // 2
+        upload_id = self.start_partial(half)
+        # Another worker, or an evicted entry: the state is rebuilt from the spool
+        _hashers.clear()
+        self.assertEqual(self.patch_chunk(upload_id, half, PDF_BYTES[half:]).status_code, 200)
+        self.assertEqual(self.complete(upload_id).status_code, 201)
+        self.assertEqual(DocumentRecord.objects.get().content_digest, hashlib.sha256(PDF_BYTES).hexdigest())
+
+    def test_truncated_spool_rewinds_the_chunk_offset(self):
+        half = len(PDF_BYTES) // 2
+        upload_id = self.start_partial(half)
+        session = UploadSession.objects.get(upload_id=upload_id)
+        with open(session.spool_path, 'r+b') as spool:
+            spool.truncate(10)
+        _hashers.clear()
+
+        response = self.patch_chunk(upload_id, half, PDF_BYTES[half:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '10')
+        self.assertEqual(UploadSession.objects.get(upload_id=upload_id).offset, 10)
+
+        self.assertEqual(self.patch_chunk(upload_id, 10, PDF_BYTES[10:]).status_code, 200)
+        self.assertEqual(self.complete(upload_id).status_code, 201)
+        self.assertEqual(DocumentRecord.objects.get().content_digest, hashlib.sha256(PDF_BYTES).hexdigest())
+
+    def test_truncated_spool_on_complete_is_not_finalized(self):
+        upload_id = self.start()
+        session = UploadSession.objects.get(upload_id=upload_id)
+        os.remove(session.spool_path)
+        _hashers.clear()
+
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['data']['offset'], 0)
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.offset), ('active', 0))
+        self.assertFalse(DocumentRecord.objects.exists())
+
+
+def png_bytes(size=(800, 600)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class PreviewPipelineTests(LocalStorageMixin, TestCase):
+    """Thumbnails and page metadata rendered off the request path."""
+
+    def setUp(self):
+        super().setUp()
+        # Render on a thread instead of a spawned process
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        pools = patch('documents.previews._get_pools', return_value=(pool, pool))
+        pools.start()
+        self.addCleanup(pools.stop)
+
+    def upload_png(self):
+        self.upload(SimpleUploadedFile('photo.png', png_bytes(), content_type='image/png'))
+        return DocumentRecord.objects.select_related('blob').get()
+
+    @override_settings(PREVIEW_MAX_DIMENSION=200)
+    def test_image_thumbnail_and_metadata(self):
+        document = self.upload_png()
+        self.assertEqual(generate_preview(document.blob_id), 'ready')
+        blob = DocumentBlob.objects.get()
+        self.assertEqual((blob.width, blob.height, blob.page_count), (800, 600, 1))
+        with default_storage.open(blob.preview_path) as thumb, Image.open(thumb) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (200, 150)))
+        preview = self.client.get('/api/documents/history/').json()['results'][0]['preview']
+        self.assertEqual(preview['thumbnail_url'], f'/api/documents/thumbnail/{document.doc_hash}/')
+
+    def test_pdf_metadata_without_a_renderer(self):
+        content = b'%PDF-1.4\n1 0 obj << /Type /Pages /Kids [2 0 R 3 0 R] >> endobj\n' \
+                  b'2 0 obj << /Type /Page /MediaBox [0 0 612 792] >> endobj\n' \
+                  b'3 0 obj << /Type /Page /MediaBox [0 0 612 792] >> endobj\n'
+        self.upload(pdf_file(content=content))
+        with patch('documents.rendering.pdfium', None):
+            self.assertEqual(generate_preview(DocumentBlob.objects.get().pk), 'ready')
+        blob = DocumentBlob.objects.get()
+        self.assertEqual((blob.page_count, blob.width, blob.height, blob.preview_path), (2, 612, 792, ''))
+
+    def test_rendering_failure_is_recorded(self):
+        document = self.upload_png()
+        with patch('documents.previews.render_preview', side_effect=OSError('corrupt')):
+            self.assertEqual(generate_preview(document.blob_id), 'failed')
+        self.assertEqual(DocumentBlob.objects.get().preview_state, 'failed')
+        # The preview endpoint falls back to the original
+        self.assertEqual(self.client.get(f'/api/documents/preview/{document.doc_hash}/').status_code, 200)
+
+
+class DocumentPreviewTests(LocalStorageMixin, TestCase):
+    """The preview endpoint serves the rendered image, not the original."""
+
+    THUMB = b'\xff\xd8\xff\xe0 thumbnail'
+
+    def setUp(self):
+        super().setUp()
+        self.assertEqual(self.upload(pdf_file()).status_code, 201)
+        self.document = DocumentRecord.objects.select_related('blob').get()
+        self.url = f'/api/documents/preview/{self.document.doc_hash}/'
+
+    def set_preview(self, state):
+        blob = self.document.blob
+        blob.preview_state = state
+        if state == 'ready':
+            blob.preview_path = default_storage.save('blobs/thumb.jpg', ContentFile(self.THUMB))
+        blob.save()
+
+    def test_serves_rendered_preview(self):
+        self.set_preview('ready')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.THUMB)
+        self.assertEqual(response['ETag'], f'"{self.document.doc_hash}-thumb"')
+
+    def test_falls_back_to_original_when_rendering_failed(self):
+        self.set_preview('failed')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), PDF_BYTES)
+
+    def test_pending_preview_asks_to_retry(self):
+        with self.settings(DOCUMENT_PREVIEWS_ENABLED=True):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '5')
+
+
+class LRUCacheTests(SimpleTestCase):
+    """Least recently used eviction and per-entry expiry."""
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+
+    def test_entries_expire(self):
+        cache = LRUCache(maxsize=4, ttl=60)
+        with patch('documents.lru.time.monotonic', return_value=1000):
+            cache.set('long', 1)
+            cache.set('short', 2, ttl=5)
+            cache.set('forever', 3, ttl=None)
+        with patch('documents.lru.time.monotonic', return_value=1010):
+            self.assertEqual((cache.get('long'), cache.get('short')), (1, None))
+        with patch('documents.lru.time.monotonic', return_value=10 ** 6):
+            self.assertEqual((cache.get('long'), cache.get('forever')), (None, 3))
+
+
+class CloudinaryAssetCacheTests(TestCase):
+    """exists/size/url answered from the asset index, with misses remembered."""
+
+    RESOURCE = {'public_id': 'documents/EMP1/legacy', 'resource_type': 'raw', 'version': 7, 'bytes': 42,
+                'secure_url': 'https://res.cloudinary.com/demo/raw/upload/v7/documents/EMP1/legacy'}
+
+    def setUp(self):
+        self.storage = DocumentCloudinaryStorage()
+
+    def test_missing_file_is_looked_up_once(self):
+        with patch('cloudinary.api.resource', side_effect=NotFound('missing')) as resource:
+            self.assertFalse(self.storage.exists('documents/EMP1/gone.pdf'))
+            self.assertFalse(self.storage.exists('documents/EMP1/gone.pdf'))
+            self.assertEqual(self.storage.size('documents/EMP1/gone.pdf'), 0)
+        resource.assert_called_once()
+
+    def test_legacy_file_is_indexed_from_the_lookup(self):
+        with patch('cloudinary.api.resource', return_value=self.RESOURCE) as resource:
+            self.assertEqual(self.storage.size('documents/EMP1/legacy.pdf'), 42)
+        resource.assert_called_once_with('documents/EMP1/legacy', resource_type='raw')
+        asset = CloudinaryAsset.objects.get(storage_path='documents/EMP1/legacy.pdf')
+        self.assertEqual(asset.version, 7)
+        # Another worker answers from the index without the API
+        with patch('cloudinary.api.resource') as resource:
+            self.assertEqual(DocumentCloudinaryStorage().url('documents/EMP1/legacy.pdf'), self.RESOURCE['secure_url'])
+        resource.assert_not_called()
+
+    def test_delete_after_a_cached_miss(self):
+        with patch('cloudinary.api.resource', side_effect=NotFound('missing')):
+            self.assertFalse(self.storage.exists('documents/EMP1/gone.pdf'))
+        with patch('documents.cloudinary_storage.uploader.destroy', return_value={'result': 'not found'}) as destroy:
+            self.assertFalse(self.storage.delete('documents/EMP1/gone.pdf'))
+        destroy.assert_called_once_with('documents/EMP1/gone', invalidate=True, resource_type='raw')
+
+    def test_upload_replaces_a_cached_miss(self):
+        with patch('cloudinary.api.resource', side_effect=NotFound('missing')):
+            self.assertFalse(self.storage.exists('documents/EMP1/legacy.pdf'))
+        with patch('documents.cloudinary_storage.uploader.upload', return_value=self.RESOURCE):
+            self.storage.save('documents/EMP1/legacy.pdf', pdf_file())
+        self.assertTrue(self.storage.exists('documents/EMP1/legacy.pdf'))
+
+
+class GarbageCollectionTests(LocalStorageMixin, TransactionTestCase):
+    """
+    Orphaned local files are deleted; referenced and recent ones are kept
+    (a TransactionTestCase: deletes run on threads with their own connections).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.upload(pdf_file())
+        self.blob = DocumentBlob.objects.get()
+        self.blob.preview_path = default_storage.save('blobs/thumb.jpg', ContentFile(b'jpeg'))
+        self.blob.save()
+        old = time.time() - 7 * 24 * 3600
+        for name in (self.blob.storage_path, self.blob.preview_path, 'blobs/ab/orphan.pdf', 'documents/EMP1/legacy.pdf'):
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(b'orphaned bytes'))
+            os.utime(default_storage.path(name), (old, old))
+        default_storage.save('chunks/cd/uploading', ContentFile(b'not committed yet'))
+
+    def test_deletes_only_old_unreferenced_files(self):
+        summary = collect_garbage(min_age=timedelta(hours=1))
+        self.assertEqual(
+            {key: summary[key] for key in ('scanned', 'referenced', 'too_recent', 'deleted', 'failed')},
+            {'scanned': 5, 'referenced': 2, 'too_recent': 1, 'deleted': 2, 'failed': 0}
+        )
+        self.assertEqual(summary['deleted_bytes'], 2 * len(b'orphaned bytes'))
+        self.assertTrue(default_storage.exists(self.blob.storage_path))
+        self.assertTrue(default_storage.exists(self.blob.preview_path))
+        self.assertTrue(default_storage.exists('chunks/cd/uploading'))
+        self.assertFalse(default_storage.exists('blobs/ab/orphan.pdf'))
+        self.assertFalse(default_storage.exists('documents/EMP1/legacy.pdf'))
+
+    def test_dry_run_reports_orphans(self):
+        found = []
+        summary = collect_garbage(dry_run=True, on_orphan=lambda name, size, modified: found.append(name))
+        self.assertEqual(sorted(found), ['blobs/ab/orphan.pdf', 'documents/EMP1/legacy.pdf'])
+        self.assertEqual(summary['deleted'], 0)
+        self.assertTrue(default_storage.exists('blobs/ab/orphan.pdf'))
+
+
+class CloudinaryGarbageCollectionTests(TransactionTestCase):
+    """
+    Orphan matching against Cloudinary listings of unindexed files (a
+    TransactionTestCase: deletes run on threads with their own connections).
+    """
+
+    OLD = '2020-01-01T00:00:00Z'
+
+    def setUp(self):
+        user = make_user()
+        for index, path in enumerate(['documents/EMP1/scan.jpeg', 'documents/EMP1/letter.pdf']):
+            DocumentRecord.objects.create(
+                user=user, doc_hash=str(index) * 64, file_name=path.split('/')[-1],
+                file_size=10, storage_path=path
+            )
+        self.listing = {
+            # Cloudinary reports .jpeg images as jpg and raw files without a format
+            'image': [{'public_id': 'documents/EMP1/scan', 'format': 'jpg', 'created_at': self.OLD, 'bytes': 10}],
+            'raw': [
+                {'public_id': 'documents/EMP1/letter', 'created_at': self.OLD, 'bytes': 20},
+                {'public_id': 'documents/EMP1/orphan', 'created_at': self.OLD, 'bytes': 30},
+            ],
+            'video': [],
+        }
+
+    def _collect(self, **kwargs):
+        storage = DocumentCloudinaryStorage()
+        resources = lambda **params: {'resources': self.listing[params['resource_type']]}
+        with patch('documents.storage_gc.default_storage', storage), \
+                patch('cloudinary.api.resources', side_effect=resources), \
+                patch('documents.cloudinary_storage.uploader.destroy', return_value={'result': 'ok'}) as destroy:
+            summary = collect_garbage(prefixes=['documents/'], **kwargs)
+        return summary, destroy
+
+    def test_unindexed_jpeg_and_raw_pdf_survive(self):
+        summary, destroy = self._collect()
+        self.assertEqual(summary['referenced'], 2)
+        self.assertEqual(summary['deleted'], 1)
+        destroy.assert_called_once_with('documents/EMP1/orphan', invalidate=True, resource_type='raw')
+
+    def test_dry_run_deletes_nothing(self):
+        summary, destroy = self._collect(dry_run=True)
+        self.assertEqual(summary['orphaned'], 1)
+        destroy.assert_not_called()
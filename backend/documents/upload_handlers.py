@@ -0,0 +1,145 @@
+"""
+Upload handlers that process document files while they are received.
+
+``ValidatingUploadHandler`` is installed in front of the storing handlers by
+single-file upload views (``install_validating_handler``), so an oversized
+file, or one whose leading bytes do not match its declared type, aborts the
+multipart parse after the offending chunk instead of after the whole body
+has been buffered. The rest of the request body is never read. Batch
+uploads keep the default handlers and check each file afterwards, so one
+bad file only fails its own entry.
+
+``HashingUploadHandler`` replaces the storing handlers on endpoints that
+only need a file's digest.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .hashing import DocumentHasher
+from .serializers import ALLOWED_CONTENT_TYPES
+
+try:
+    import magic
+except ImportError:  # Optional: fall back to the signature table below
+    magic = None
+
+SNIFF_BYTES = 2048
+SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+]
+
+
+class UploadRejected(APIException):
+    """An uploaded file was rejected before it was fully received."""
+    status_code = status.HTTP_400_BAD_REQUEST
+
+
+class UploadTooLarge(UploadRejected):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+class UploadTypeMismatch(UploadRejected):
+    status_code = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+
+def sniff_content_type(head):
+    """Detect a content type from the first bytes of a file, or None."""
+    if magic is not None:
+        return magic.from_buffer(head, mime=True)
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    # PDF readers accept the header anywhere in the first 1KB
+    if b'%PDF-' in head[:1024]:
+        return 'application/pdf'
+    return None
+
+
+def check_content_type(head, declared_type):
+    """Raise UploadTypeMismatch unless ``head`` is an allowed type matching ``declared_type``."""
+    detected = sniff_content_type(head)
+    if detected not in ALLOWED_CONTENT_TYPES:
+        raise UploadTypeMismatch("Only PDF, JPEG, and PNG files are allowed")
+    if detected != declared_type:
+        raise UploadTypeMismatch(
+            f"File content ({detected}) does not match its declared type ({declared_type})"
+        )
+
+
+def max_size_error():
+    return UploadTooLarge(f"File size cannot exceed {settings.MAX_FILE_SIZE // (1024 * 1024)}MB")
+
+
+class ValidatingUploadHandler(FileUploadHandler):
+    """
+    Count and sniff each uploaded file, passing chunks on unchanged to the
+    storing handlers after it.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.content_length is not None and self.content_length > settings.MAX_FILE_SIZE:
+            raise max_size_error()
+        self.received = 0
+        self.head = b''
+        self.checked = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.MAX_FILE_SIZE:
+            raise max_size_error()
+        if not self.checked:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES:
+                self._check()
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not self.checked:
+            self._check()
+        return None
+
+    def _check(self):
+        self.checked = True
+        check_content_type(self.head, self.content_type)
+
+
+def install_validating_handler(request):
+    """Validate files of ``request`` (a Django HttpRequest) while they are received."""
+    request.upload_handlers.insert(0, ValidatingUploadHandler(request))
+
+
+class HashedUpload:
+    """What ``HashingUploadHandler`` leaves in ``request.FILES`` instead of a file."""
+
+    def __init__(self, name, content_type, hasher):
+        self.name = name
+        self.content_type = content_type
+        self.size = hasher.size
+        self.content_digest = hasher.content_digest
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Hash each uploaded file as its chunks arrive and keep nothing else.
+
+    Memory use is one chunk regardless of file size and no temp file is
+    written. Files over ``MAX_FILE_SIZE`` are rejected as they are read.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.content_length is not None and self.content_length > settings.MAX_FILE_SIZE:
+            raise max_size_error()
+        self.hasher = DocumentHasher()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        if self.hasher.size > settings.MAX_FILE_SIZE:
+            raise max_size_error()
+        return None
+
+    def file_complete(self, file_size):
+        return HashedUpload(self.file_name, self.content_type, self.hasher)
@@ -0,0 +1,170 @@
+"""
+Shared document upload pipeline.
+
+Used by the single-request, batch and resumable chunked upload endpoints
+once a file has been received and hashed.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from accounts.models import UserProfile
+from ledger.events import record_document_uploads
+from verification.cache import invalidate_employee
+from verification.negative_cache import remember_documents
+from .blobs import acquire_blob, release_blob
+from .offload import offload_enabled
+from .models import DocumentRecord, DocumentAccessLog, DocumentHistoryEntry
+
+
+def _add_to_profile(request, documents):
+    """
+    Record new documents in the user's history.
+
+    History rows are appended with ``ignore_conflicts`` so concurrent uploads
+    never lose each other's entry. If the user has no original document yet,
+    the first of ``documents`` becomes the original through a conditional
+    update, so only one concurrent upload can claim it.
+    """
+    if not documents:
+        return
+    try:
+        with transaction.atomic():
+            DocumentHistoryEntry.objects.bulk_create(
+                [DocumentHistoryEntry(user=request.user, doc_hash=document.doc_hash) for document in documents],
+                ignore_conflicts=True
+            )
+
+            # First document becomes original
+            original = documents[0]
+            claimed = UserProfile.objects.filter(
+                Q(doc_hash__isnull=True) | Q(doc_hash=''),
+                user=request.user
+            ).update(
+                doc_hash=original.doc_hash,
+                storage_path=original.storage_path,
+                updated_at=timezone.now()
+            )
+            if claimed:
+                original.is_original = True
+                original.save(update_fields=['is_original'])
+                # The update above sends no signal
+                invalidate_employee(request.user.emp_id)
+
+    except Exception as e:
+        print(f"Error updating profile: {e}")
+
+
+def save_uploaded_document(request, uploaded_file, doc_hash, content_type, content_digest):
+    """
+    Store an uploaded file and create its DocumentRecord.
+
+    The file is stored once per distinct content digest; re-uploads of the
+    same bytes only add a blob reference. The first document a user uploads
+    becomes their original document.
+    """
+    blob, created = acquire_blob(uploaded_file, content_digest, defer=offload_enabled())
+    print(f"Blob {'stored' if created else 'reused'}: {blob.storage_path}")
+
+    # Create document record and its ledger entry
+    try:
+        with transaction.atomic():
+            document = DocumentRecord.objects.create(
+                user=request.user,
+                doc_hash=doc_hash,
+                content_digest=content_digest,
+                file_name=uploaded_file.name,
+                file_size=uploaded_file.size,
+                storage_path=blob.storage_path,
+                stored_size=blob.stored_size,
+                compression=blob.compression,
+                blob=blob,
+                file_type=content_type.split('/')[-1],
+                upload_ip=request.META.get('REMOTE_ADDR'),
+                user_agent=request.META.get('HTTP_USER_AGENT')
+            )
+            record_document_uploads([document])
+            remember_documents([document.doc_hash])
+    except Exception:
+        release_blob(blob.pk)
+        raise
+    print(f"Document record created with ID: {document.id}")
+
+    _add_to_profile(request, [document])
+
+    # Log access
+    DocumentAccessLog.objects.create(
+        document=document,
+        accessed_by=request.user,
+        access_type='upload',
+        ip_address=request.META.get('REMOTE_ADDR'),
+        user_agent=request.META.get('HTTP_USER_AGENT')
+    )
+
+    return document
+
+
+def save_uploaded_documents(request, uploads):
+    """
+    Store several uploaded files and create their records in one transaction.
+
+    ``uploads`` is a list of ``(uploaded_file, doc_hash, content_type,
+    content_digest)`` tuples. Records and access logs are written with
+    ``bulk_create`` and the history is appended in one insert. Returns a list aligned
+    with ``uploads`` of ``(document, error)`` pairs; a file whose storage
+    write fails does not prevent the others from being saved.
+    """
+    results = [(None, None)] * len(uploads)
+    acquired = []
+    for index, (uploaded_file, doc_hash, content_type, content_digest) in enumerate(uploads):
+        try:
+            blob, _ = acquire_blob(uploaded_file, content_digest, defer=offload_enabled())
+            acquired.append((index, blob))
+        except Exception as e:
+            results[index] = (None, str(e))
+
+    if not acquired:
+        return results
+
+    records = []
+    for index, blob in acquired:
+        uploaded_file, doc_hash, content_type, _ = uploads[index]
+        records.append(DocumentRecord(
+            user=request.user,
+            doc_hash=doc_hash,
+            content_digest=blob.content_digest,
+            file_name=uploaded_file.name,
+            file_size=uploaded_file.size,
+            storage_path=blob.storage_path,
+            stored_size=blob.stored_size,
+            compression=blob.compression,
+            blob=blob,
+            file_type=content_type.split('/')[-1],
+            upload_ip=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT')
+        ))
+
+    try:
+        with transaction.atomic():
+            documents = DocumentRecord.objects.bulk_create(records)
+            record_document_uploads(documents)
+            remember_documents([document.doc_hash for document in documents])
+            _add_to_profile(request, documents)
+            DocumentAccessLog.objects.bulk_create([
+                DocumentAccessLog(
+                    document=document,
+                    accessed_by=request.user,
+                    access_type='upload',
+                    ip_address=request.META.get('REMOTE_ADDR'),
+                    user_agent=request.META.get('HTTP_USER_AGENT')
+                )
+                for document in documents
+            ])
+    except Exception as e:
+        for index, blob in acquired:
+            release_blob(blob.pk)
+            results[index] = (None, str(e))
+        return results
+
+    for (index, _), document in zip(acquired, documents):
+        results[index] = (document, None)
+    return results
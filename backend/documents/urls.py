@@ -6,11 +6,20 @@ from . import views
 
 urlpatterns = [
     path('upload/', views.DocumentUploadView.as_view(), name='document_upload'),
+    path('upload/batch/', views.DocumentBatchUploadView.as_view(), name='document_batch_upload'),
+    path('uploads/', views.ChunkedUploadView.as_view(), name='chunked_upload'),
+    path('uploads/<uuid:upload_id>/', views.ChunkedUploadDetailView.as_view(), name='chunked_upload_detail'),
+    path('uploads/<uuid:upload_id>/complete/', views.ChunkedUploadCompleteView.as_view(), name='chunked_upload_complete'),
     path('history/', views.document_history, name='document_history'),
     path('hashes/', views.document_hashes, name='document_hashes'),
     path('download/<str:doc_hash>/', views.download_document, name='download_document'),
     path('preview/<str:doc_hash>/', views.preview_document, name='preview_document'),
+    path('thumbnail/<str:doc_hash>/', views.document_thumbnail, name='document_thumbnail'),
+    path('status/<str:doc_hash>/', views.document_storage_status, name='document_storage_status'),
+    path('versions/<str:doc_hash>/', views.DocumentVersionsView.as_view(), name='document_versions'),
+    path('versions/<str:doc_hash>/<int:version_number>/download/', views.download_document_version, name='download_document_version'),
     path('details/<str:doc_hash>/', views.document_details, name='document_details'),
     path('delete/<str:doc_hash>/', views.delete_document, name='delete_document'),
+    path('cache-stats/', views.document_cache_stats, name='document_cache_stats'),
     path('access-logs/<str:doc_hash>/', views.access_logs, name='access_logs'),
 ]
@@ -0,0 +1,299 @@
+"""
+Delta-based document versioning.
+
+A re-upload of a logical document is split into content-defined chunks (see
+``cdc``). Only chunks that no earlier version stored are written; each
+version is recorded in DocumentVersion as a manifest of ``[digest, size]``
+pairs and downloaded by streaming its chunks back in order.
+
+The first versioned upload also chunks the original file as version 1, so
+later revisions share chunks with it.
+
+Chunking is CPU-bound pure Python, so the upload request only spools the
+file and records the version as ``pending``; ``chunk_version`` then runs on
+the offload pool (inline when ``VERSION_CHUNKING_ASYNC`` is off). Pending
+versions are served from their spool file.
+"""
+import hashlib
+import os
+import uuid
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+from .cdc import READ_SIZE, iter_chunks
+from .compression import open_stored
+from .models import DocumentChunk, DocumentRecord, DocumentVersion
+from .offload import run_in_background
+
+MAX_ACQUIRE_ATTEMPTS = 3
+
+
+def chunk_storage_path(digest):
+    """Storage name for a chunk, fanned out by the first digest byte."""
+    return f"chunks/{digest[:2]}/{digest}"
+
+
+def scan_chunks(fileobj):
+    """
+    Return ``(manifest, content_digest)`` for a file.
+
+    Only one chunk is held in memory at a time.
+    """
+    hasher = hashlib.sha256()
+    manifest = []
+    fileobj.seek(0)
+    for chunk in iter_chunks(fileobj, settings.VERSION_CHUNK_AVG_SIZE):
+        hasher.update(chunk)
+        manifest.append([hashlib.sha256(chunk).hexdigest(), len(chunk)])
+    return manifest, hasher.hexdigest()
+
+
+def _create_chunk(digest, data):
+    """Store a new chunk with one reference; returns bytes written."""
+    for _ in range(MAX_ACQUIRE_ATTEMPTS):
+        saved_path = default_storage.save(chunk_storage_path(digest), ContentFile(data))
+        try:
+            with transaction.atomic():
+                DocumentChunk.objects.create(
+                    digest=digest, size=len(data), storage_path=saved_path, ref_count=1
+                )
+            return len(data)
+        except IntegrityError:
+            # A concurrent version stored the same chunk; reference theirs
+            default_storage.delete(saved_path)
+            if DocumentChunk.objects.filter(digest=digest).update(ref_count=F('ref_count') + 1):
+                return 0
+    raise RuntimeError(f"Could not acquire chunk {digest}")
+
+
+def acquire_chunks(fileobj, manifest):
+    """
+    Take one reference on every distinct chunk of ``manifest``, writing the
+    ones not stored yet from ``fileobj``.
+
+    Returns the number of bytes written.
+    """
+    sizes, offsets = {}, {}
+    position = 0
+    for digest, size in manifest:
+        sizes.setdefault(digest, size)
+        offsets.setdefault(digest, position)
+        position += size
+
+    with transaction.atomic():
+        # Locked so a concurrent release cannot delete a chunk we reference
+        existing = set(
+            DocumentChunk.objects.select_for_update()
+            .filter(digest__in=sizes).values_list('digest', flat=True)
+        )
+        DocumentChunk.objects.filter(digest__in=existing).update(ref_count=F('ref_count') + 1)
+
+    acquired = list(existing)
+    written = 0
+    try:
+        for digest in sorted(sizes.keys() - existing, key=offsets.get):
+            fileobj.seek(offsets[digest])
+            written += _create_chunk(digest, fileobj.read(sizes[digest]))
+            acquired.append(digest)
+    except Exception:
+        release_chunks([[digest, sizes[digest]] for digest in acquired])
+        raise
+    return written
+
+
+def release_chunks(manifest):
+    """
+    Drop one reference to every distinct chunk of ``manifest``.
+
+    Chunks left without references are deleted, with their files removed
+    after the surrounding transaction commits.
+    """
+    digests = {digest for digest, _ in manifest}
+    if not digests:
+        return
+    with transaction.atomic():
+        DocumentChunk.objects.filter(digest__in=digests, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        orphans = list(
+            DocumentChunk.objects.select_for_update()
+            .filter(digest__in=digests, ref_count=0).values_list('pk', 'storage_path')
+        )
+        if not orphans:
+            return
+        DocumentChunk.objects.filter(pk__in=[pk for pk, _ in orphans]).delete()
+        paths = [path for _, path in orphans]
+        transaction.on_commit(lambda: [default_storage.delete(path) for path in paths])
+
+
+def _open_original(document):
+    """Open the bytes a document was first uploaded with."""
+    blob = document.blob
+    if blob is not None and blob.storage_state != 'stored' and blob.spool_path and os.path.exists(blob.spool_path):
+        return open(blob.spool_path, 'rb')
+    return open_stored(default_storage, document.storage_path, document.compression)
+
+
+def open_version_source(version):
+    """Open the bytes of a version that has not been chunked yet."""
+    if version.spool_path:
+        return open(version.spool_path, 'rb')
+    return _open_original(version.document)
+
+
+def _spool_version(uploaded_file):
+    """Copy an uploaded revision to the local spool and return the spool path."""
+    directory = os.path.join(settings.UPLOAD_SPOOL_DIR, 'versions')
+    os.makedirs(directory, exist_ok=True)
+    spool_path = os.path.join(directory, uuid.uuid4().hex)
+    with open(spool_path, 'wb') as spool:
+        for chunk in uploaded_file.chunks():
+            spool.write(chunk)
+    uploaded_file.seek(0)
+    return spool_path
+
+
+def discard_version_spool(spool_path):
+    if spool_path:
+        try:
+            os.remove(spool_path)
+        except FileNotFoundError:
+            pass
+
+
+def create_version(document, uploaded_file, doc_hash, content_digest, change_reason=None):
+    """
+    Record ``uploaded_file`` as the next, still pending, version of ``document``.
+
+    The first call also records the original upload as version 1. Both are
+    chunked by ``chunk_version`` after the transaction commits.
+    """
+    spool_path = _spool_version(uploaded_file)
+    try:
+        with transaction.atomic():
+            # Serializes version numbering (and seeding version 1) per document
+            DocumentRecord.objects.select_for_update().filter(pk=document.pk).first()
+            last = document.versions.aggregate(last=Max('version_number'))['last'] or 0
+            created = []
+            if last == 0:
+                created.append(DocumentVersion.objects.create(
+                    document=document,
+                    version_number=1,
+                    doc_hash=document.doc_hash,
+                    file_name=document.file_name,
+                    file_size=document.file_size,
+                    content_digest=document.content_digest,
+                    chunk_state='pending',
+                    change_reason='Original upload',
+                ))
+                last = 1
+            version = DocumentVersion.objects.create(
+                document=document,
+                version_number=last + 1,
+                doc_hash=doc_hash,
+                file_name=uploaded_file.name,
+                file_size=uploaded_file.size,
+                content_digest=content_digest,
+                chunk_state='pending',
+                spool_path=spool_path,
+                change_reason=change_reason,
+            )
+            created.append(version)
+            if settings.VERSION_CHUNKING_ASYNC:
+                for pending in created:
+                    run_in_background(chunk_version, pending.pk)
+    except Exception:
+        discard_version_spool(spool_path)
+        raise
+
+    if not settings.VERSION_CHUNKING_ASYNC:
+        for pending in created:
+            chunk_version(pending.pk)
+        version.refresh_from_db()
+    return version
+
+
+def chunk_version(version_id):
+    """
+    Chunk a pending version and acquire its chunks.
+
+    Chunks are written outside any transaction, so if the version was
+    deleted (or chunked by another worker) meanwhile they are released
+    again. Returns the final chunk state.
+    """
+    version = DocumentVersion.objects.select_related('document__blob').filter(pk=version_id).first()
+    if version is None or version.chunk_state == 'stored':
+        return version.chunk_state if version else None
+
+    try:
+        with open_version_source(version) as fileobj:
+            manifest, content_digest = scan_chunks(fileobj)
+            stored_bytes = acquire_chunks(fileobj, manifest)
+    except Exception as e:
+        DocumentVersion.objects.filter(pk=version.pk).update(chunk_state='failed')
+        print(f"Chunking failed for version {version.version_number} of {version.document.doc_hash}: {e}")
+        return 'failed'
+
+    updated = DocumentVersion.objects.filter(pk=version.pk).exclude(chunk_state='stored').update(
+        manifest=manifest,
+        content_digest=content_digest,
+        stored_bytes=stored_bytes,
+        chunk_state='stored',
+        spool_path='',
+    )
+    if not updated:
+        release_chunks(manifest)
+        return None
+    discard_version_spool(version.spool_path)
+    return 'stored'
+
+
+def chunk_pending_versions(include_failed=True):
+    """
+    Synchronously chunk versions left pending (e.g. after a restart) or failed.
+
+    Returns a ``{state: count}`` summary.
+    """
+    states = ['pending', 'failed'] if include_failed else ['pending']
+    summary = {}
+    for version_id in DocumentVersion.objects.filter(chunk_state__in=states).values_list('pk', flat=True):
+        state = chunk_version(version_id)
+        summary[state] = summary.get(state, 0) + 1
+    return summary
+
+
+def chunk_paths(version):
+    """Storage paths of a version's chunks; raises if any chunk is missing."""
+    digests = {digest for digest, _ in version.manifest}
+    paths = dict(
+        DocumentChunk.objects.filter(digest__in=digests).values_list('digest', 'storage_path')
+    )
+    if len(paths) != len(digests):
+        raise DocumentChunk.DoesNotExist(f"Version {version.version_number} is missing chunks")
+    return paths
+
+
+def stream_spooled_version(version):
+    """
+    Return an iterator over a pending version's spooled (or original) bytes.
+
+    The source is opened right away, so it stays readable even if chunking
+    finishes and removes the spool file while the response streams.
+    """
+    source = open_version_source(version)
+
+    def blocks():
+        with source:
+            while True:
+                block = source.read(READ_SIZE)
+                if not block:
+                    return
+                yield block
+    return blocks()
+
+
+def stream_version(version, paths):
+    """Yield a version's bytes chunk by chunk."""
+    for digest, _ in version.manifest:
+        with default_storage.open(paths[digest], 'rb') as chunk:
+            yield chunk.read()
@@ -2,27 +2,80 @@
 Document-related API views.
 """
 import os
-import hashlib
-import secrets
-import time
-from django.http import HttpResponse, Http404, FileResponse
+from concurrent.futures import ThreadPoolExecutor
+from django.http import HttpResponse, Http404
 from django.conf import settings
 from django.core.files.storage import default_storage
+from django.core.files import File
 from django.core.files.base import ContentFile
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
-from .models import DocumentRecord, DocumentAccessLog
+from .models import DocumentChunk, DocumentRecord, DocumentAccessLog, DocumentHistoryEntry, UploadSession
+from .hashing import hash_uploaded_file
+from .upload_handlers import SNIFF_BYTES, UploadRejected, check_content_type, install_validating_handler
+from .uploads import save_uploaded_document, save_uploaded_documents
+from .disk_cache import CachedStorage, get_disk_cache
+from .pagination import DocumentHistoryPagination
+from .previews import previews_enabled
+from .serving import (
+    IMMUTABLE_CACHE_CONTROL, document_etag, not_modified, serve_document, serve_file,
+    serve_stream
+)
+from .chunked import (
+    ChunkOffsetMismatch, ChunkTooLarge, SessionNotActive, SpoolTruncated, create_session,
+    append_chunk, claim_session, release_session, rewind_session, finalize_hash, discard_session
+)
+from .versioning import chunk_paths, create_version, stream_spooled_version, stream_version
 from accounts.models import UserProfile
 from .serializers import (
     DocumentUploadSerializer, DocumentRecordSerializer,
-    DocumentHistorySerializer, DocumentAccessLogSerializer
+    DocumentHistorySerializer, DocumentAccessLogSerializer,
+    ChunkedUploadInitSerializer, UploadSessionSerializer, DocumentVersionSerializer
 )
 
 
+def _upload_response(document):
+    """
+    Build the response for a newly created document.
+
+    Documents whose blob is still being offloaded to storage are accepted
+    with 202 and can be polled on the storage status endpoint.
+    """
+    data = DocumentRecordSerializer(document).data
+    if document.storage_state == 'pending':
+        return Response({
+            'success': True,
+            'data': data,
+            'message': 'Document accepted; storage in progress',
+            'statusUrl': f"/api/documents/status/{document.doc_hash}/"
+        }, status=status.HTTP_202_ACCEPTED)
+    return Response({
+        'success': True,
+        'data': data,
+        'message': 'Document uploaded successfully'
+    }, status=status.HTTP_201_CREATED)
+
+
+def _parse_upload(request):
+    """
+    Parse a single-file multipart body through ValidatingUploadHandler,
+    returning an error response if it aborted the upload part-way through.
+    """
+    install_validating_handler(request._request)
+    try:
+        request.data
+    except UploadRejected as e:
+        return Response({
+            'success': False,
+            'error': str(e.detail)
+        }, status=e.status_code)
+    return None
+
+
 class DocumentUploadView(APIView):
     """
     Handle document uploads.
@@ -34,6 +87,10 @@ class DocumentUploadView(APIView):
         """
         Upload a new document.
         """
+        rejected = _parse_upload(request)
+        if rejected:
+            return rejected
+        
         print(f"Document upload request data: {request.data}")
         print(f"Request files: {request.FILES}")
         print(f"Request method: {request.method}")
@@ -53,83 +110,21 @@ class DocumentUploadView(APIView):
                 # Get the uploaded file
                 uploaded_file = serializer.validated_data['file']
                 
-                # Generate document hash from file content + document name + random salt
-                file_content = uploaded_file.read()
-                
-                # Create a unique salt combining timestamp and random data
-                timestamp = str(int(time.time() * 1000))  # milliseconds for uniqueness
-                random_salt = secrets.token_hex(16)  # 32-character random hex
-                
-                # Combine file content, document name, and salt for hash
-                hash_input = file_content + uploaded_file.name.encode('utf-8') + timestamp.encode('utf-8') + random_salt.encode('utf-8')
-                doc_hash = hashlib.sha256(hash_input).hexdigest()
+                # Hash the file chunk by chunk so only one chunk is in memory;
+                # the name/timestamp/salt suffix is appended at the end
+                doc_hash, hasher = hash_uploaded_file(uploaded_file)
                 
                 print(f"Hash generation details:")
                 print(f"  - File name: {uploaded_file.name}")
-                print(f"  - File size: {len(file_content)} bytes")
-                print(f"  - Timestamp: {timestamp}")
-                print(f"  - Random salt: {random_salt}")
+                print(f"  - File size: {hasher.size} bytes")
                 print(f"  - Generated hash: {doc_hash}")
                 
-                # Reset file pointer for saving
-                uploaded_file.seek(0)
-                
-                # Create storage path with hash as filename for uniqueness
-                file_extension = os.path.splitext(uploaded_file.name)[1]
-                storage_filename = f"{doc_hash}{file_extension}"
-                storage_path = f"documents/{request.user.emp_id}/{storage_filename}"
-                
-                # Save file to storage
-                print(f"Saving file to storage path: {storage_path}")
-                saved_path = default_storage.save(storage_path, uploaded_file)
-                print(f"File saved to: {saved_path}")
-                print(f"File exists in storage: {default_storage.exists(saved_path)}")
-                
-                # Create document record
-                document = DocumentRecord.objects.create(
-                    user=request.user,
-                    doc_hash=doc_hash,
-                    file_name=uploaded_file.name,
-                    file_size=uploaded_file.size,
-                    storage_path=saved_path,  # Actual saved file path
-                    file_type=uploaded_file.content_type.split('/')[-1],
-                    upload_ip=request.META.get('REMOTE_ADDR'),
-                    user_agent=request.META.get('HTTP_USER_AGENT')
+                document = save_uploaded_document(
+                    request, uploaded_file, doc_hash, uploaded_file.content_type,
+                    hasher.content_digest
                 )
-                print(f"Document record created with ID: {document.id}")
                 
-                # Update user profile with document hash
-                try:
-                    profile = request.user.profile
-                    if not profile.doc_hash:  # First document becomes original
-                        profile.doc_hash = doc_hash
-                        profile.storage_path = document.storage_path
-                        document.is_original = True
-                        document.save()
-                    
-                    # Add to document history
-                    if doc_hash not in profile.doc_history:
-                        profile.doc_history.append(doc_hash)
-                        profile.save()
-                        
-                except Exception as e:
-                    print(f"Error updating profile: {e}")
-                
-                # Log access
-                DocumentAccessLog.objects.create(
-                    document=document,
-                    accessed_by=request.user,
-                    access_type='upload',
-                    ip_address=request.META.get('REMOTE_ADDR'),
-                    user_agent=request.META.get('HTTP_USER_AGENT')
-                )
-                
-                response_serializer = DocumentRecordSerializer(document)
-                return Response({
-                    'success': True,
-                    'data': response_serializer.data,
-                    'message': 'Document uploaded successfully'
-                }, status=status.HTTP_201_CREATED)
+                return _upload_response(document)
                 
             except Exception as e:
                 return Response({
@@ -144,15 +139,466 @@ class DocumentUploadView(APIView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _hash_batch_file(uploaded_file):
+    """Hash one file of a batch; errors are returned instead of raised."""
+    try:
+        doc_hash, hasher = hash_uploaded_file(uploaded_file)
+        return doc_hash, hasher, None
+    except Exception as e:
+        return None, None, str(e)
+
+
+class DocumentBatchUploadView(APIView):
+    """
+    Upload several documents in one request.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        """
+        Upload every file sent under ``files``.
+
+        Files are validated individually (size, declared type and leading
+        bytes) and hashed concurrently on a bounded thread pool; records and
+        access logs are written in bulk. Each file gets its own result, so
+        one bad file does not fail the batch.
+        """
+        files = request.FILES.getlist('files')
+        if not files:
+            return Response({
+                'success': False,
+                'error': 'No files provided'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(files) > settings.BATCH_UPLOAD_MAX_FILES:
+            return Response({
+                'success': False,
+                'error': f'A batch cannot contain more than {settings.BATCH_UPLOAD_MAX_FILES} files'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [{'index': index, 'file_name': f.name} for index, f in enumerate(files)]
+
+        valid = []
+        for index, uploaded_file in enumerate(files):
+            serializer = DocumentUploadSerializer(data={'file': uploaded_file})
+            if serializer.is_valid():
+                try:
+                    check_content_type(uploaded_file.read(SNIFF_BYTES), uploaded_file.content_type)
+                except UploadRejected as e:
+                    results[index].update({'success': False, 'error': str(e.detail)})
+                    continue
+                finally:
+                    uploaded_file.seek(0)
+                valid.append((index, serializer.validated_data['file']))
+            else:
+                results[index].update({
+                    'success': False,
+                    'error': 'Validation failed',
+                    'details': serializer.errors
+                })
+
+        if valid:
+            workers = max(1, min(settings.BATCH_UPLOAD_HASH_WORKERS, len(valid)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                hashed = list(pool.map(_hash_batch_file, [f for _, f in valid]))
+
+            uploads = []
+            upload_indexes = []
+            for (index, uploaded_file), (doc_hash, hasher, error) in zip(valid, hashed):
+                if error:
+                    results[index].update({'success': False, 'error': error})
+                    continue
+                uploads.append((
+                    uploaded_file, doc_hash, uploaded_file.content_type, hasher.content_digest
+                ))
+                upload_indexes.append(index)
+
+            saved = save_uploaded_documents(request, uploads)
+            for index, (document, error) in zip(upload_indexes, saved):
+                if error:
+                    results[index].update({'success': False, 'error': error})
+                else:
+                    results[index].update({
+                        'success': True,
+                        'data': DocumentRecordSerializer(document).data
+                    })
+
+        succeeded = sum(1 for result in results if result['success'])
+        if succeeded == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif succeeded:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+
+        return Response({
+            'success': succeeded > 0,
+            'data': {
+                'results': results,
+                'uploaded': succeeded,
+                'failed': len(results) - succeeded
+            },
+            'message': f'{succeeded} of {len(results)} documents uploaded'
+        }, status=response_status)
+
+
+def _get_upload_session(request, upload_id):
+    """
+    Look up an active upload session owned by the requesting user.
+
+    Returns ``(session, None)`` or ``(None, error_response)``.
+    """
+    try:
+        session = UploadSession.objects.get(upload_id=upload_id, user=request.user)
+    except UploadSession.DoesNotExist:
+        return None, Response({
+            'success': False,
+            'error': 'Upload session not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    if session.status == 'active' and session.is_expired:
+        discard_session(session, delete=True)
+        return None, Response({
+            'success': False,
+            'error': 'Upload session has expired'
+        }, status=status.HTTP_410_GONE)
+
+    return session, None
+
+
+class ChunkedUploadView(APIView):
+    """
+    Start a resumable chunked upload.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Create an upload session for a file of the declared size and type.
+        """
+        serializer = ChunkedUploadInitSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'error': 'Validation failed',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        session = create_session(request.user, **serializer.validated_data)
+        data = UploadSessionSerializer(session).data
+        data['chunk_size'] = settings.CHUNKED_UPLOAD_CHUNK_SIZE
+        return Response({
+            'success': True,
+            'data': data,
+            'message': 'Upload session created'
+        }, status=status.HTTP_201_CREATED)
+
+
+class ChunkedUploadDetailView(APIView):
+    """
+    Query the offset of, or append a chunk to, an upload session.
+
+    Chunks are sent as the raw request body with an ``Upload-Offset`` header
+    naming the byte offset they start at.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id):
+        """
+        Return the current offset so a client can resume.
+        """
+        session, error = _get_upload_session(request, upload_id)
+        if error:
+            return error
+
+        response = Response({
+            'success': True,
+            'data': UploadSessionSerializer(session).data
+        }, status=status.HTTP_200_OK)
+        response['Upload-Offset'] = str(session.offset)
+        return response
+
+    def patch(self, request, upload_id):
+        """
+        Append a chunk at the given offset.
+        """
+        session, error = _get_upload_session(request, upload_id)
+        if error:
+            return error
+        if session.status != 'active':
+            return Response({
+                'success': False,
+                'error': 'Upload session is already completed'
+            }, status=status.HTTP_409_CONFLICT)
+
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'Upload-Offset and Content-Length headers are required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if length > settings.CHUNKED_UPLOAD_CHUNK_SIZE:
+            return Response({
+                'success': False,
+                'error': f'Chunk cannot exceed {settings.CHUNKED_UPLOAD_CHUNK_SIZE} bytes'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        try:
+            new_offset = append_chunk(session, offset, request.stream, length) if length else session.offset
+        except ChunkOffsetMismatch as e:
+            response = Response({
+                'success': False,
+                'error': str(e),
+                'data': {'offset': e.expected}
+            }, status=status.HTTP_409_CONFLICT)
+            response['Upload-Offset'] = str(e.expected)
+            return response
+        except ChunkTooLarge as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        except SessionNotActive:
+            return Response({
+                'success': False,
+                'error': 'Upload session is already completed'
+            }, status=status.HTTP_409_CONFLICT)
+
+        if offset == 0 and length:
+            # Sniff the real type from the first chunk before accepting more
+            with open(session.spool_path, 'rb') as spool:
+                head = spool.read(SNIFF_BYTES)
+            try:
+                check_content_type(head, session.content_type)
+            except UploadRejected as e:
+                discard_session(session, delete=True)
+                return Response({
+                    'success': False,
+                    'error': str(e.detail)
+                }, status=e.status_code)
+
+        response = Response({
+            'success': True,
+            'data': {'offset': new_offset, 'file_size': session.file_size}
+        }, status=status.HTTP_200_OK)
+        response['Upload-Offset'] = str(new_offset)
+        return response
+
+
+class ChunkedUploadCompleteView(APIView):
+    """
+    Finalize a chunked upload into a DocumentRecord.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id):
+        """
+        Create the document from the spooled chunks.
+
+        Safe to retry: a completed session returns the document it produced.
+        Of concurrent calls, one finalizes and the others get 409.
+        """
+        session, error = _get_upload_session(request, upload_id)
+        if error:
+            return error
+
+        if session.status == 'completed' and session.document_id:
+            return Response({
+                'success': True,
+                'data': DocumentRecordSerializer(session.document).data,
+                'message': 'Document uploaded successfully'
+            }, status=status.HTTP_200_OK)
+
+        if session.offset != session.file_size:
+            return Response({
+                'success': False,
+                'error': f'Upload incomplete: received {session.offset} of {session.file_size} bytes',
+                'data': {'offset': session.offset}
+            }, status=status.HTTP_409_CONFLICT)
+
+        if not claim_session(session):
+            return Response({
+                'success': False,
+                'error': 'Upload is already being completed'
+            }, status=status.HTTP_409_CONFLICT)
+
+        try:
+            doc_hash, hasher = finalize_hash(session)
+        except SpoolTruncated as e:
+            # Part of the spool was lost; the client resends from what is left
+            rewind_session(session, e.size)
+            response = Response({
+                'success': False,
+                'error': f'Upload incomplete: received {e.size} of {session.file_size} bytes',
+                'data': {'offset': e.size}
+            }, status=status.HTTP_409_CONFLICT)
+            response['Upload-Offset'] = str(e.size)
+            return response
+
+        try:
+            with open(session.spool_path, 'rb') as spool:
+                uploaded_file = File(spool, name=session.file_name)
+                document = save_uploaded_document(
+                    request, uploaded_file, doc_hash, session.content_type,
+                    hasher.content_digest
+                )
+
+            session.status = 'completed'
+            session.document = document
+            session.save(update_fields=['status', 'document', 'updated_at'])
+            discard_session(session)
+
+            return _upload_response(document)
+
+        except Exception as e:
+            release_session(session)
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def document_history(request):
     """
-    Get user's document history.
+    Get user's document history, one cursor page at a time.
+    """
+    # Load only the columns DocumentHistorySerializer renders
+    documents = DocumentRecord.objects.filter(user=request.user).select_related('blob').only(
+        'id', 'doc_hash', 'upload_date', 'file_name', 'file_size',
+        'is_original', 'storage_path', 'file_type', 'blob__preview_state',
+        'blob__preview_path', 'blob__page_count', 'blob__width', 'blob__height'
+    )
+    paginator = DocumentHistoryPagination()
+    page = paginator.paginate_queryset(documents, request)
+    serializer = DocumentHistorySerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+def _unstored_document_response(request, document, as_attachment):
+    """
+    Serve a document whose blob has not reached the storage backend.
+
+    The local spool copy is served if this worker has it; otherwise the
+    client is told to retry (pending) or that storage failed.
+    """
+    blob = document.blob
+    if blob.spool_path and os.path.exists(blob.spool_path):
+        return serve_file(request, blob.spool_path, document, as_attachment)
+
+    if blob.storage_state == 'pending':
+        response = Response({
+            'success': False,
+            'error': 'Document is still being stored',
+            'data': {'storageState': 'pending'}
+        }, status=status.HTTP_409_CONFLICT)
+        response['Retry-After'] = '5'
+        return response
+
+    return Response({
+        'success': False,
+        'error': 'Document storage failed',
+        'data': {'storageState': blob.storage_state}
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def document_storage_status(request, doc_hash):
+    """
+    Report whether a document has reached the storage backend.
+    """
+    try:
+        document = DocumentRecord.objects.select_related('blob').get(
+            doc_hash=doc_hash,
+            user=request.user
+        )
+    except DocumentRecord.DoesNotExist:
+        return Response({
+            'success': False,
+            'error': 'Document not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    data = {
+        'docHash': document.doc_hash,
+        'storageState': document.storage_state,
+    }
+    if document.blob_id:
+        data['attempts'] = document.blob.storage_attempts
+        if document.blob.storage_state == 'failed':
+            data['error'] = document.blob.storage_error
+    return Response({
+        'success': True,
+        'data': data
+    }, status=status.HTTP_200_OK)
+
+
+def _preview_pending_response():
+    response = Response({
+        'success': False,
+        'error': 'Preview is still being generated',
+        'data': {'previewState': 'pending'}
+    }, status=status.HTTP_409_CONFLICT)
+    response['Retry-After'] = '5'
+    return response
+
+
+def _serve_thumbnail(request, document):
+    return serve_document(
+        request,
+        document,
+        storage_path=document.blob.preview_path,
+        file_name=f"{os.path.splitext(document.file_name)[0]}-thumb.jpg",
+        variant='-thumb'
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def document_thumbnail(request, doc_hash):
+    """
+    Serve the small JPEG preview rendered for a document.
+
+    Thumbnails are fetched for every row of a listing, so they are not
+    written to the access log.
     """
-    documents = DocumentRecord.objects.filter(user=request.user)
-    serializer = DocumentHistorySerializer(documents, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    try:
+        document = DocumentRecord.objects.select_related('blob').get(
+            doc_hash=doc_hash,
+            user=request.user
+        )
+    except DocumentRecord.DoesNotExist:
+        return Response({
+            'success': False,
+            'error': 'Document not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    blob = document.blob
+    if blob is not None and blob.preview_state == 'pending':
+        return _preview_pending_response()
+    if blob is None or not blob.preview_path:
+        return Response({
+            'success': False,
+            'error': 'No preview available for this document',
+            'data': {'previewState': blob.preview_state if blob else 'unsupported'}
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    cached = not_modified(request, document_etag(document, '-thumb'))
+    if cached:
+        return cached
+
+    try:
+        return _serve_thumbnail(request, document)
+    except Exception as e:
+        print(f"Error serving thumbnail: {e}")
+        return Response({
+            'success': False,
+            'error': f'Error accessing thumbnail: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @api_view(['GET'])
@@ -162,11 +608,16 @@ def download_document(request, doc_hash):
     Download a document by hash.
     """
     try:
-        document = DocumentRecord.objects.get(
+        document = DocumentRecord.objects.select_related('blob').get(
             doc_hash=doc_hash,
             user=request.user
         )
         
+        # Bytes behind a doc_hash never change: revalidate without an audit insert
+        cached = not_modified(request, document_etag(document))
+        if cached:
+            return cached
+        
         # Log access
         DocumentAccessLog.objects.create(
             document=document,
@@ -176,10 +627,11 @@ def download_document(request, doc_hash):
             user_agent=request.META.get('HTTP_USER_AGENT')
         )
         
-        # Check if file exists in storage
-        print(f"Checking if file exists: {document.storage_path}")
-        print(f"File exists: {default_storage.exists(document.storage_path)}")
+        # Not offloaded to storage yet
+        if document.storage_state != 'stored':
+            return _unstored_document_response(request, document, as_attachment=True)
         
+        # Check if file exists in storage
         if not default_storage.exists(document.storage_path):
             print(f"File not found in storage: {document.storage_path}")
             return Response({
@@ -187,17 +639,12 @@ def download_document(request, doc_hash):
                 'error': 'File not found in storage'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # For Cloudinary storage, redirect to the file URL
+        # Redirect to remote storage, or stream local files without copying
         try:
-            file_url = default_storage.url(document.storage_path)
-            print(f"Redirecting to Cloudinary URL: {file_url}")
-            
-            # Redirect to Cloudinary URL
-            from django.http import HttpResponseRedirect
-            return HttpResponseRedirect(file_url)
+            return serve_document(request, document, as_attachment=True)
             
         except Exception as e:
-            print(f"Error getting file URL: {e}")
+            print(f"Error serving file: {e}")
             return Response({
                 'success': False,
                 'error': f'Error accessing file: {str(e)}'
@@ -215,6 +662,132 @@ def download_document(request, doc_hash):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class DocumentVersionsView(APIView):
+    """
+    List and upload revisions of a document.
+
+    Revisions are stored as content-defined chunks, so only the parts that
+    changed since earlier versions take up new space.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def _get_document(self, request, doc_hash):
+        return DocumentRecord.objects.select_related('blob').filter(
+            doc_hash=doc_hash,
+            user=request.user
+        ).first()
+
+    def get(self, request, doc_hash):
+        """
+        List the versions of a document, newest first.
+        """
+        document = self._get_document(request, doc_hash)
+        if document is None:
+            return Response({
+                'success': False,
+                'error': 'Document not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        versions = document.versions.defer('manifest')
+        return Response({
+            'success': True,
+            'data': DocumentVersionSerializer(versions, many=True).data
+        })
+
+    def post(self, request, doc_hash):
+        """
+        Upload a new version of a document.
+        """
+        rejected = _parse_upload(request)
+        if rejected:
+            return rejected
+
+        document = self._get_document(request, doc_hash)
+        if document is None:
+            return Response({
+                'success': False,
+                'error': 'Document not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = DocumentUploadSerializer(
+            data=request.data,
+            context={'request': request}
+        )
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'error': 'Validation failed',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            uploaded_file = serializer.validated_data['file']
+            version_hash, hasher = hash_uploaded_file(uploaded_file)
+            version = create_version(
+                document, uploaded_file, version_hash, hasher.content_digest,
+                request.data.get('change_reason')
+            )
+            print(f"Recorded version {version.version_number} of {document.doc_hash} "
+                  f"({version.chunk_state}): {version.stored_bytes} of {version.file_size} bytes new")
+
+            return Response({
+                'success': True,
+                'data': DocumentVersionSerializer(version).data,
+                'message': 'Version uploaded successfully'
+            }, status=status.HTTP_201_CREATED)
+
+        except Exception as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_document_version(request, doc_hash, version_number):
+    """
+    Download one version of a document, streamed from its chunks.
+    """
+    document = DocumentRecord.objects.filter(doc_hash=doc_hash, user=request.user).first()
+    version = document.versions.filter(version_number=version_number).first() if document else None
+    if version is None:
+        return Response({
+            'success': False,
+            'error': 'Version not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    # A version's bytes never change either
+    etag = document_etag(document, f'-v{version_number}')
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    try:
+        if version.chunk_state != 'stored':
+            # Not chunked yet: served from the spooled upload
+            chunks = stream_spooled_version(version)
+        else:
+            chunks = stream_version(version, chunk_paths(version))
+    except (DocumentChunk.DoesNotExist, OSError) as e:
+        print(f"Error serving version: {e}")
+        return Response({
+            'success': False,
+            'error': 'Version content not found in storage'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    DocumentAccessLog.objects.create(
+        document=document,
+        accessed_by=request.user,
+        access_type='download',
+        ip_address=request.META.get('REMOTE_ADDR'),
+        user_agent=request.META.get('HTTP_USER_AGENT')
+    )
+
+    return serve_stream(chunks, version.file_size, version.file_name, etag)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def document_details(request, doc_hash):
@@ -222,11 +795,18 @@ def document_details(request, doc_hash):
     Get document details by hash.
     """
     try:
-        document = DocumentRecord.objects.get(
+        document = DocumentRecord.objects.select_related('user', 'blob').get(
             doc_hash=doc_hash,
             user=request.user
         )
         
+        # Details only change while the blob is being offloaded to storage
+        etag = document_etag(document, f"-details-{document.storage_state}")
+        cache_control = IMMUTABLE_CACHE_CONTROL if document.storage_state == 'stored' else 'private, no-cache'
+        cached = not_modified(request, etag, cache_control)
+        if cached:
+            return cached
+        
         # Log access
         DocumentAccessLog.objects.create(
             document=document,
@@ -237,7 +817,10 @@ def document_details(request, doc_hash):
         )
         
         serializer = DocumentRecordSerializer(document)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
         
     except DocumentRecord.DoesNotExist:
         return Response(
@@ -265,6 +848,8 @@ def delete_document(request, doc_hash):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # The post_delete handler drops the blob reference; the stored file
+        # is removed only when no other record shares it
         document.delete()
         return Response(
             {'message': 'Document deleted successfully'}, 
@@ -310,11 +895,16 @@ def document_hashes(request):
     """
     try:
         profile = request.user.profile
+        # Served from the indexed history table; no JSON blob to load
+        doc_history = list(
+            DocumentHistoryEntry.objects.filter(user=request.user)
+            .order_by('id').values_list('doc_hash', flat=True)
+        )
         return Response({
             'success': True,
             'data': {
                 'docHash': profile.doc_hash,  # Original valid hash
-                'docHistory': profile.doc_history,  # Array of all hashes
+                'docHistory': doc_history,  # Array of all hashes
                 'storagePath': profile.storage_path
             },
             'message': 'Document history retrieved successfully'
@@ -331,13 +921,27 @@ def document_hashes(request):
 def preview_document(request, doc_hash):
     """
     Preview a document by hash (for verification purposes).
+
+    Serves the rendered preview image; the original is served only for
+    documents whose preview failed or is not supported (or when previews
+    are disabled).
     """
     try:
-        document = DocumentRecord.objects.get(
+        document = DocumentRecord.objects.select_related('blob').get(
             doc_hash=doc_hash,
             user=request.user
         )
         
+        blob = document.blob
+        if previews_enabled() and blob is not None and blob.preview_state == 'pending':
+            return _preview_pending_response()
+        use_thumbnail = blob is not None and blob.preview_state == 'ready' and bool(blob.preview_path)
+        
+        # Bytes behind a doc_hash never change: revalidate without an audit insert
+        cached = not_modified(request, document_etag(document, '-thumb' if use_thumbnail else ''))
+        if cached:
+            return cached
+        
         # Log access
         DocumentAccessLog.objects.create(
             document=document,
@@ -347,6 +951,20 @@ def preview_document(request, doc_hash):
             user_agent=request.META.get('HTTP_USER_AGENT')
         )
         
+        if use_thumbnail:
+            try:
+                return _serve_thumbnail(request, document)
+            except Exception as e:
+                print(f"Error serving preview: {e}")
+                return Response({
+                    'success': False,
+                    'error': f'Error accessing preview: {str(e)}'
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        # Not offloaded to storage yet
+        if document.storage_state != 'stored':
+            return _unstored_document_response(request, document, as_attachment=False)
+        
         # Check if file exists in storage
         if not default_storage.exists(document.storage_path):
             return Response({
@@ -354,17 +972,12 @@ def preview_document(request, doc_hash):
                 'error': 'File not found in storage'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # For Cloudinary storage, redirect to the file URL for preview
+        # Redirect to remote storage, or stream local files without copying
         try:
-            file_url = default_storage.url(document.storage_path)
-            print(f"Redirecting to Cloudinary URL for preview: {file_url}")
-            
-            # Redirect to Cloudinary URL
-            from django.http import HttpResponseRedirect
-            return HttpResponseRedirect(file_url)
+            return serve_document(request, document, as_attachment=False)
             
         except Exception as e:
-            print(f"Error getting file URL: {e}")
+            print(f"Error serving file: {e}")
             return Response({
                 'success': False,
                 'error': f'Error accessing file: {str(e)}'
@@ -379,4 +992,28 @@ def preview_document(request, doc_hash):
         return Response({
             'success': False,
             'error': f'Preview failed: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def document_cache_stats(request):
+    """
+    Hit rate and bytes saved by the local document cache in this worker.
+    """
+    if not isinstance(default_storage, CachedStorage):
+        return Response({
+            'success': True,
+            'data': {'enabled': False}
+        })
+
+    cache = get_disk_cache()
+    return Response({
+        'success': True,
+        'data': {
+            'enabled': True,
+            'pid': os.getpid(),
+            **cache.metrics.snapshot(),
+            **cache.usage()
+        }
+    })
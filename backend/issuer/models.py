@@ -1,8 +1,9 @@
 """
 Issuer models for employee authorization and management.
 """
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
+from ledger.events import record_authorization
 
 
 class Issuer(models.Model):
@@ -58,20 +59,26 @@ class IssuerAuthorization(models.Model):
     def __str__(self):
         return f"{self.issuer.name} - {self.emp_id} ({self.status})"
 
+    def _save_and_record(self):
+        """Save the new status and append it to the ledger together."""
+        with transaction.atomic():
+            self.save()
+            record_authorization(self)
+
     def approve(self, reason="Approved by issuer"):
         """Approve the authorization."""
         self.status = 'approved'
         self.permission_granted = True
         self.granted_at = timezone.now()
         self.reason = reason
-        self.save()
+        self._save_and_record()
 
     def reject(self, reason="Rejected by issuer"):
         """Reject the authorization."""
         self.status = 'rejected'
         self.permission_granted = False
         self.reason = reason
-        self.save()
+        self._save_and_record()
 
     def revoke(self, reason="Revoked by issuer"):
         """Revoke the authorization."""
@@ -79,7 +86,7 @@ class IssuerAuthorization(models.Model):
         self.permission_granted = False
         self.revoked_at = timezone.now()
         self.reason = reason
-        self.save()
+        self._save_and_record()
 
 
 class IssuerAccessLog(models.Model):
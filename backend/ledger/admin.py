@@ -0,0 +1,72 @@
+"""
+Admin configuration for ledger app.
+"""
+from django.contrib import admin
+from .models import LedgerBlock, LedgerCheckpoint, LedgerEntry, MerkleBatch, MerkleLeaf
+
+
+@admin.register(MerkleBatch)
+class MerkleBatchAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for MerkleBatch model.
+    """
+    list_display = ('id', 'root', 'leaf_count', 'sealed_at')
+    search_fields = ('root',)
+    ordering = ('-id',)
+    exclude = ('levels',)
+
+    readonly_fields = ('root', 'leaf_count', 'sealed_at')
+
+
+@admin.register(MerkleLeaf)
+class MerkleLeafAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for MerkleLeaf model.
+    """
+    list_display = ('doc_hash', 'batch', 'index', 'document')
+    search_fields = ('doc_hash',)
+    ordering = ('-id',)
+
+    readonly_fields = ('batch', 'index', 'doc_hash', 'document')
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for LedgerEntry model.
+    """
+    list_display = ('id', 'event_type', 'subject', 'sequence', 'block', 'created_at')
+    list_filter = ('event_type',)
+    search_fields = ('subject', 'entry_hash')
+    ordering = ('-id',)
+
+    readonly_fields = (
+        'event_type', 'subject', 'payload', 'created_at',
+        'sequence', 'prev_hash', 'entry_hash', 'block'
+    )
+
+
+@admin.register(LedgerBlock)
+class LedgerBlockAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for LedgerBlock model.
+    """
+    list_display = ('number', 'first_sequence', 'last_sequence', 'block_hash', 'sealed_at')
+    search_fields = ('block_hash',)
+    ordering = ('-number',)
+
+    readonly_fields = (
+        'number', 'first_sequence', 'last_sequence', 'head_entry_hash',
+        'prev_block_hash', 'block_hash', 'sealed_at'
+    )
+
+
+@admin.register(LedgerCheckpoint)
+class LedgerCheckpointAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for LedgerCheckpoint model.
+    """
+    list_display = ('block_number', 'block_hash', 'verified_at')
+    ordering = ('-id',)
+
+    readonly_fields = ('block_number', 'block_hash', 'verified_at')
@@ -0,0 +1,178 @@
+"""
+Hash chain over ledger entries, sealed into blocks.
+
+Each sealed entry gets the next ``sequence`` and
+
+    entry_hash = SHA-256(prev_hash || canonical JSON of the entry)
+
+where ``prev_hash`` is the previous entry's hash (64 zeros for the first).
+Every ``LEDGER_BLOCK_SIZE`` entries form a block whose hash covers its
+number, sequence range, head entry hash and the previous block hash, so
+rewriting any sealed entry or block breaks every later link.
+
+Sealing is the only read-modify-write of the chain head and runs in one
+process (``manage.py seal_ledger``), so appends on the request path stay
+plain inserts. ``verify_ledger`` re-hashes only the blocks sealed since the
+last checkpoint.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import LedgerBlock, LedgerCheckpoint, LedgerEntry
+
+GENESIS_HASH = '0' * 64
+
+
+class LedgerVerificationError(Exception):
+    """A sealed entry or block does not match its recorded hash."""
+
+
+def entry_digest(prev_hash, entry):
+    canonical = json.dumps({
+        'sequence': entry.sequence,
+        'event_type': entry.event_type,
+        'subject': entry.subject,
+        'payload': entry.payload,
+        'created_at': entry.created_at.isoformat(),
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(prev_hash.encode() + canonical.encode()).hexdigest()
+
+
+def block_digest(number, first_sequence, last_sequence, head_entry_hash, prev_block_hash):
+    header = f"{number}:{first_sequence}:{last_sequence}:{head_entry_hash}:{prev_block_hash}"
+    return hashlib.sha256(header.encode()).hexdigest()
+
+
+def _seal_block(block_size, flush):
+    """Seal one block; returns it, or None when not enough entries are waiting."""
+    with transaction.atomic():
+        last_block = LedgerBlock.objects.select_for_update().order_by('-number').first()
+        entries = list(
+            LedgerEntry.objects.select_for_update()
+            .filter(block__isnull=True)
+            .order_by('id')[:block_size]
+        )
+        if not entries:
+            return None
+        if len(entries) < block_size and not flush:
+            return None
+
+        if last_block is None:
+            number, sequence, prev_hash, prev_block_hash = 1, 0, GENESIS_HASH, GENESIS_HASH
+        else:
+            number = last_block.number + 1
+            sequence = last_block.last_sequence
+            prev_hash = last_block.head_entry_hash
+            prev_block_hash = last_block.block_hash
+
+        first_sequence = sequence + 1
+        for entry in entries:
+            sequence += 1
+            entry.sequence = sequence
+            entry.prev_hash = prev_hash
+            entry.entry_hash = entry_digest(prev_hash, entry)
+            prev_hash = entry.entry_hash
+
+        block = LedgerBlock.objects.create(
+            number=number,
+            first_sequence=first_sequence,
+            last_sequence=sequence,
+            head_entry_hash=prev_hash,
+            prev_block_hash=prev_block_hash,
+            block_hash=block_digest(number, first_sequence, sequence, prev_hash, prev_block_hash),
+        )
+        for entry in entries:
+            entry.block = block
+        LedgerEntry.objects.bulk_update(
+            entries, ['sequence', 'prev_hash', 'entry_hash', 'block'], batch_size=500
+        )
+    return block
+
+
+def seal_ledger(block_size=None, flush=False):
+    """
+    Seal every full block of waiting entries.
+
+    A partial block is sealed too when ``flush`` is set or the oldest
+    waiting entry is older than ``LEDGER_BLOCK_MAX_WAIT`` seconds, so quiet
+    periods are still sealed. Returns the blocks created.
+    """
+    block_size = block_size or settings.LEDGER_BLOCK_SIZE
+    if not flush:
+        oldest = LedgerEntry.objects.filter(block__isnull=True).order_by('id').values_list('created_at', flat=True).first()
+        max_wait = timedelta(seconds=settings.LEDGER_BLOCK_MAX_WAIT)
+        flush = oldest is not None and oldest <= timezone.now() - max_wait
+
+    blocks = []
+    try:
+        while True:
+            block = _seal_block(block_size, flush)
+            if block is None:
+                return blocks
+            print(f"Sealed ledger block {block.number} (#{block.first_sequence}-#{block.last_sequence})")
+            blocks.append(block)
+    except IntegrityError:
+        # Another sealer extended the chain first
+        print("Ledger sealing raced with another sealer; retry on the next run")
+        return blocks
+
+
+def _verify_block(block, prev_block_hash, prev_hash):
+    """Re-hash one block's entries; returns its head entry hash."""
+    if block.prev_block_hash != prev_block_hash:
+        raise LedgerVerificationError(f"Block {block.number} does not link to the previous block")
+
+    expected_sequence = block.first_sequence
+    entries = LedgerEntry.objects.filter(block=block).order_by('sequence').iterator(chunk_size=2000)
+    for entry in entries:
+        if entry.sequence != expected_sequence:
+            raise LedgerVerificationError(f"Block {block.number} is missing entry #{expected_sequence}")
+        if entry.prev_hash != prev_hash or entry.entry_hash != entry_digest(prev_hash, entry):
+            raise LedgerVerificationError(f"Entry #{entry.sequence} in block {block.number} was modified")
+        prev_hash = entry.entry_hash
+        expected_sequence += 1
+
+    if expected_sequence != block.last_sequence + 1:
+        raise LedgerVerificationError(f"Block {block.number} is missing entries")
+    expected = block_digest(
+        block.number, block.first_sequence, block.last_sequence, prev_hash, block.prev_block_hash
+    )
+    if block.head_entry_hash != prev_hash or block.block_hash != expected:
+        raise LedgerVerificationError(f"Block {block.number} header was modified")
+    return prev_hash
+
+
+def verify_ledger(full=False):
+    """
+    Verify blocks sealed since the last checkpoint (all blocks with
+    ``full``) and record a new checkpoint.
+
+    Returns the number of blocks verified; raises LedgerVerificationError.
+    """
+    checkpoint = None if full else LedgerCheckpoint.objects.first()
+    prev_block_hash, prev_hash, after = GENESIS_HASH, GENESIS_HASH, 0
+    if checkpoint is not None:
+        # The checkpointed block must still be the block that was verified
+        anchor = LedgerBlock.objects.filter(number=checkpoint.block_number).first()
+        if anchor is None or anchor.block_hash != checkpoint.block_hash:
+            raise LedgerVerificationError(
+                f"Checkpointed block {checkpoint.block_number} was modified; run a full verification"
+            )
+        prev_block_hash, prev_hash, after = anchor.block_hash, anchor.head_entry_hash, anchor.number
+
+    verified = 0
+    last = None
+    for block in LedgerBlock.objects.filter(number__gt=after).order_by('number').iterator():
+        if block.number != after + verified + 1:
+            raise LedgerVerificationError(f"Block {after + verified + 1} is missing")
+        prev_hash = _verify_block(block, prev_block_hash, prev_hash)
+        prev_block_hash = block.block_hash
+        verified += 1
+        last = block
+
+    if last is not None:
+        LedgerCheckpoint.objects.create(block_number=last.number, block_hash=last.block_hash)
+    return verified
@@ -0,0 +1,46 @@
+"""
+Appending events to the ledger.
+
+Called on the request path, so an append is one INSERT with no locking or
+read of the chain head; ``chain.seal_ledger`` links entries later. Appends
+made inside a transaction roll back with it.
+"""
+from .models import LedgerEntry
+
+
+def _document_event(event_type, document):
+    return LedgerEntry(
+        event_type=event_type,
+        subject=document.doc_hash,
+        payload={
+            'user_id': document.user_id,
+            'file_name': document.file_name,
+            'file_size': document.file_size,
+            'storage_path': document.storage_path,
+        }
+    )
+
+
+def record_document_uploads(documents):
+    LedgerEntry.objects.bulk_create([
+        _document_event('document_uploaded', document) for document in documents
+    ])
+
+
+def record_document_deleted(document):
+    _document_event('document_deleted', document).save()
+
+
+def record_authorization(authorization):
+    """Record an authorization's current status (approved/rejected/revoked)."""
+    LedgerEntry.objects.create(
+        event_type=f'authorization_{authorization.status}',
+        subject=authorization.emp_id,
+        payload={
+            'authorization_id': authorization.pk,
+            'issuer_id': authorization.issuer.issuer_id,
+            'user_hash': authorization.user_hash,
+            'permission_granted': authorization.permission_granted,
+            'reason': authorization.reason,
+        }
+    )
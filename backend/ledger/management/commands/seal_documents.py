@@ -0,0 +1,30 @@
+"""
+Management command to seal uploaded document hashes into Merkle batches.
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ledger.sealing import seal_all_pending
+
+
+class Command(BaseCommand):
+    help = 'Seal unsealed document hashes into Merkle trees and publish their roots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-leaves', type=int, default=None,
+                            help='Leaves per tree (default: MERKLE_BATCH_MAX_LEAVES)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep sealing every MERKLE_SEAL_INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            batches = seal_all_pending(options['max_leaves'])
+            if batches:
+                for batch in batches:
+                    self.stdout.write(f'batch {batch.pk}: {batch.leaf_count} leaves, root {batch.root}')
+                self.stdout.write(self.style.SUCCESS(f'Sealed {len(batches)} batch(es)'))
+            else:
+                self.stdout.write('No unsealed documents found')
+            if not options['loop']:
+                return
+            time.sleep(settings.MERKLE_SEAL_INTERVAL)
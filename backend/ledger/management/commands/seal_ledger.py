@@ -0,0 +1,31 @@
+"""
+Management command to chain waiting ledger entries into sealed blocks.
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ledger.chain import seal_ledger
+
+
+class Command(BaseCommand):
+    help = 'Hash-chain waiting ledger entries and seal them into blocks of LEDGER_BLOCK_SIZE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--block-size', type=int, default=None,
+                            help='Entries per block (default: LEDGER_BLOCK_SIZE)')
+        parser.add_argument('--flush', action='store_true', help='Also seal a final partial block')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep sealing every LEDGER_SEAL_INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            blocks = seal_ledger(options['block_size'], flush=options['flush'])
+            if blocks:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Sealed {len(blocks)} block(s) through entry #{blocks[-1].last_sequence}'
+                ))
+            else:
+                self.stdout.write('No block ready to seal')
+            if not options['loop']:
+                return
+            time.sleep(settings.LEDGER_SEAL_INTERVAL)
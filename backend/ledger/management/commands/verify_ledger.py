@@ -0,0 +1,22 @@
+"""
+Management command to verify the ledger hash chain.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from ledger.chain import LedgerVerificationError, verify_ledger
+
+
+class Command(BaseCommand):
+    help = 'Re-hash ledger blocks sealed since the last checkpoint and record a new checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Verify from the first block, ignoring checkpoints')
+
+    def handle(self, *args, **options):
+        try:
+            verified = verify_ledger(full=options['full'])
+        except LedgerVerificationError as e:
+            raise CommandError(f'Ledger verification failed: {e}')
+        if verified:
+            self.stdout.write(self.style.SUCCESS(f'Verified {verified} block(s)'))
+        else:
+            self.stdout.write('No new blocks since the last checkpoint')
@@ -0,0 +1,106 @@
+"""
+Merkle trees over document hashes.
+
+Hashing follows RFC 6962 domain separation so a leaf can never be passed off
+as an interior node:
+
+    leaf = SHA-256(0x00 || doc_hash as ASCII)
+    node = SHA-256(0x01 || left || right)
+
+A level with an odd number of nodes promotes its last node unchanged to the
+next level (no duplication). A tree is stored as the concatenation of its
+levels, leaves first, 32 bytes per node; the level sizes follow from the
+leaf count.
+
+This module has no Django dependency so verifiers can use it offline.
+"""
+import hashlib
+
+DIGEST_SIZE = 32
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def leaf_hash(doc_hash):
+    return hashlib.sha256(LEAF_PREFIX + doc_hash.encode()).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def level_sizes(leaf_count):
+    """Number of nodes on each level, leaves first, root last."""
+    sizes = [leaf_count]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+def build_tree(doc_hashes):
+    """
+    Build a tree over ``doc_hashes`` (in leaf order).
+
+    Returns ``(root, levels)`` where ``levels`` is the packed bytes of every
+    level, leaves first.
+    """
+    if not doc_hashes:
+        raise ValueError("Cannot build a Merkle tree without leaves")
+    level = [leaf_hash(doc_hash) for doc_hash in doc_hashes]
+    packed = [b''.join(level)]
+    while len(level) > 1:
+        level = [
+            node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+        packed.append(b''.join(level))
+    return level[0], b''.join(packed)
+
+
+def _node(levels, offset, index):
+    start = (offset + index) * DIGEST_SIZE
+    return levels[start:start + DIGEST_SIZE]
+
+
+def inclusion_proof(levels, leaf_count, index):
+    """
+    Sibling path for leaf ``index``: a list of ``(side, sibling)`` pairs from
+    the leaves up, where ``side`` says whether the sibling is on the 'left'
+    or 'right'. Promoted levels contribute no step.
+    """
+    if not 0 <= index < leaf_count:
+        raise IndexError(f"Leaf {index} is outside a tree of {leaf_count}")
+    proof = []
+    offset = 0
+    for size in level_sizes(leaf_count)[:-1]:
+        sibling = index ^ 1
+        if sibling < size:
+            side = 'left' if sibling < index else 'right'
+            proof.append((side, _node(levels, offset, sibling)))
+        offset += size
+        index //= 2
+    return proof
+
+
+def root_from_proof(doc_hash, proof):
+    """Recompute the root a proof leads to."""
+    current = leaf_hash(doc_hash)
+    for side, sibling in proof:
+        current = node_hash(sibling, current) if side == 'left' else node_hash(current, sibling)
+    return current
+
+
+def verify_proof(doc_hash, proof, root):
+    """
+    Check an inclusion proof offline.
+
+    ``proof`` is a list of ``(side, sibling)`` with siblings as bytes or hex;
+    ``root`` is bytes or hex.
+    """
+    steps = [
+        (side, bytes.fromhex(sibling) if isinstance(sibling, str) else sibling)
+        for side, sibling in proof
+    ]
+    if isinstance(root, str):
+        root = bytes.fromhex(root)
+    return root_from_proof(doc_hash, steps) == root
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('documents', '0013_chunked_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MerkleBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('root', models.CharField(max_length=64, unique=True)),
+                ('leaf_count', models.PositiveIntegerField()),
+                ('levels', models.BinaryField()),
+                ('sealed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'merkle_batches',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MerkleLeaf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('doc_hash', models.CharField(max_length=64, unique=True)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaves', to='ledger.merklebatch')),
+                ('document', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='merkle_leaf', to='documents.documentrecord')),
+            ],
+            options={
+                'db_table': 'merkle_leaves',
+                'unique_together': {('batch', 'index')},
+            },
+        ),
+    ]
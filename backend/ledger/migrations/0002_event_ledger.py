@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(unique=True)),
+                ('first_sequence', models.PositiveBigIntegerField()),
+                ('last_sequence', models.PositiveBigIntegerField()),
+                ('head_entry_hash', models.CharField(max_length=64)),
+                ('prev_block_hash', models.CharField(max_length=64)),
+                ('block_hash', models.CharField(max_length=64, unique=True)),
+                ('sealed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'ledger_blocks',
+                'ordering': ['number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_number', models.PositiveIntegerField()),
+                ('block_hash', models.CharField(max_length=64)),
+                ('verified_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'ledger_checkpoints',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('document_uploaded', 'Document Uploaded'), ('document_deleted', 'Document Deleted'), ('authorization_approved', 'Authorization Approved'), ('authorization_rejected', 'Authorization Rejected'), ('authorization_revoked', 'Authorization Revoked')], max_length=30)),
+                ('subject', models.CharField(max_length=64)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sequence', models.PositiveBigIntegerField(blank=True, null=True, unique=True)),
+                ('prev_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('entry_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('block', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='entries', to='ledger.ledgerblock')),
+            ],
+            options={
+                'db_table': 'ledger_entries',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['subject', 'id'], name='ledger_entr_subject_8e680d_idx')],
+            },
+        ),
+    ]
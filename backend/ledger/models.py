@@ -0,0 +1,125 @@
+"""
+Models for anchoring document hashes in Merkle trees.
+"""
+from django.db import models
+
+
+class MerkleBatch(models.Model):
+    """
+    One sealed Merkle tree over the documents uploaded since the last seal.
+
+    ``levels`` packs every tree level (leaves first, 32 bytes per node; see
+    ``merkle``), so inclusion proofs are sliced out without rebuilding.
+    """
+    root = models.CharField(max_length=64, unique=True)
+    leaf_count = models.PositiveIntegerField()
+    levels = models.BinaryField()
+    sealed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'merkle_batches'
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"Batch {self.pk}: {self.root[:16]}... ({self.leaf_count} leaves)"
+
+
+class MerkleLeaf(models.Model):
+    """
+    Position of a document hash in a sealed batch.
+
+    The document link is cleared if the record is deleted; the hash stays
+    provably registered under the published root.
+    """
+    batch = models.ForeignKey(MerkleBatch, on_delete=models.CASCADE, related_name='leaves')
+    index = models.PositiveIntegerField()
+    doc_hash = models.CharField(max_length=64, unique=True)
+    document = models.OneToOneField(
+        'documents.DocumentRecord',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='merkle_leaf'
+    )
+
+    class Meta:
+        db_table = 'merkle_leaves'
+        unique_together = ['batch', 'index']
+
+    def __str__(self):
+        return f"{self.doc_hash[:16]}... at {self.batch_id}/{self.index}"
+
+
+class LedgerEntry(models.Model):
+    """
+    Append-only record of a document or authorization event.
+
+    Appending is a single INSERT. The chain fields stay empty until the
+    sealer assigns ``sequence`` and links ``entry_hash`` to the previous
+    entry's hash (see ``chain``).
+    """
+    EVENT_CHOICES = [
+        ('document_uploaded', 'Document Uploaded'),
+        ('document_deleted', 'Document Deleted'),
+        ('authorization_approved', 'Authorization Approved'),
+        ('authorization_rejected', 'Authorization Rejected'),
+        ('authorization_revoked', 'Authorization Revoked'),
+    ]
+
+    event_type = models.CharField(max_length=30, choices=EVENT_CHOICES)
+    subject = models.CharField(max_length=64)  # doc_hash or emp_id
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    sequence = models.PositiveBigIntegerField(unique=True, null=True, blank=True)
+    prev_hash = models.CharField(max_length=64, blank=True, default='')
+    entry_hash = models.CharField(max_length=64, blank=True, default='')
+    block = models.ForeignKey(
+        'LedgerBlock', on_delete=models.PROTECT, null=True, blank=True, related_name='entries'
+    )
+
+    class Meta:
+        db_table = 'ledger_entries'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['subject', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.subject[:16]} (#{self.sequence or 'unsealed'})"
+
+
+class LedgerBlock(models.Model):
+    """
+    A run of consecutive sealed entries, linked to the previous block.
+    """
+    number = models.PositiveIntegerField(unique=True)
+    first_sequence = models.PositiveBigIntegerField()
+    last_sequence = models.PositiveBigIntegerField()
+    head_entry_hash = models.CharField(max_length=64)
+    prev_block_hash = models.CharField(max_length=64)
+    block_hash = models.CharField(max_length=64, unique=True)
+    sealed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ledger_blocks'
+        ordering = ['number']
+
+    def __str__(self):
+        return f"Block {self.number}: #{self.first_sequence}-#{self.last_sequence}"
+
+
+class LedgerCheckpoint(models.Model):
+    """
+    Last block the verifier confirmed; the next run starts after it.
+    """
+    block_number = models.PositiveIntegerField()
+    block_hash = models.CharField(max_length=64)
+    verified_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ledger_checkpoints'
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"Verified through block {self.block_number}"
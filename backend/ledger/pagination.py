@@ -0,0 +1,13 @@
+"""
+Pagination classes for ledger endpoints.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class MerkleBatchPagination(CursorPagination):
+    """
+    Keyset pagination over sealed batches, newest first.
+    """
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,96 @@
+"""
+Sealing uploaded document hashes into Merkle batches and serving proofs.
+
+``seal_pending_documents`` collects every document not yet in a tree (oldest
+first, up to ``MERKLE_BATCH_MAX_LEAVES``), builds one tree and stores its
+root and packed levels. Run it on a fixed interval with
+``manage.py seal_documents --loop``. Sealed batches never change, so their
+levels are cached per process and a proof is one indexed lookup plus byte
+slicing.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from documents.lru import LRUCache
+from documents.models import DocumentRecord
+from .merkle import build_tree, inclusion_proof
+from .models import MerkleBatch, MerkleLeaf
+
+_levels_cache = LRUCache(maxsize=64)
+
+
+def seal_pending_documents(max_leaves=None):
+    """
+    Seal the next batch of unsealed documents.
+
+    Returns the new MerkleBatch, or None when nothing is pending.
+    """
+    max_leaves = max_leaves or settings.MERKLE_BATCH_MAX_LEAVES
+    try:
+        with transaction.atomic():
+            pending = list(
+                DocumentRecord.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(merkle_leaf__isnull=True)
+                .exclude(doc_hash__in=MerkleLeaf.objects.values('doc_hash'))
+                .order_by('id')
+                .values_list('id', 'doc_hash')[:max_leaves]
+            )
+            if not pending:
+                return None
+
+            root, levels = build_tree([doc_hash for _, doc_hash in pending])
+            batch = MerkleBatch.objects.create(
+                root=root.hex(), leaf_count=len(pending), levels=levels
+            )
+            MerkleLeaf.objects.bulk_create([
+                MerkleLeaf(batch=batch, index=index, doc_hash=doc_hash, document_id=document_id)
+                for index, (document_id, doc_hash) in enumerate(pending)
+            ])
+    except IntegrityError:
+        # Another sealer took some of these documents first
+        print("Merkle sealing raced with another sealer; retry on the next run")
+        return None
+    print(f"Sealed {batch.leaf_count} document hash(es) under root {batch.root}")
+    return batch
+
+
+def seal_all_pending(max_leaves=None):
+    """Seal batches until nothing is pending; returns the batches created."""
+    batches = []
+    while True:
+        batch = seal_pending_documents(max_leaves)
+        if batch is None:
+            return batches
+        batches.append(batch)
+
+
+def _batch_levels(batch_id):
+    levels = _levels_cache.get(batch_id)
+    if levels is None:
+        levels = bytes(MerkleBatch.objects.values_list('levels', flat=True).get(pk=batch_id))
+        _levels_cache.set(batch_id, levels)
+    return levels
+
+
+def proof_for(doc_hash):
+    """
+    Inclusion proof for a sealed document hash, or None if not sealed yet.
+    """
+    leaf = (
+        MerkleLeaf.objects.select_related('batch')
+        .defer('batch__levels')
+        .filter(doc_hash=doc_hash)
+        .first()
+    )
+    if leaf is None:
+        return None
+    batch = leaf.batch
+    steps = inclusion_proof(_batch_levels(batch.pk), batch.leaf_count, leaf.index)
+    return {
+        'doc_hash': doc_hash,
+        'batch_id': batch.pk,
+        'root': batch.root,
+        'sealed_at': batch.sealed_at,
+        'leaf_index': leaf.index,
+        'leaf_count': batch.leaf_count,
+        'proof': [{'side': side, 'hash': sibling.hex()} for side, sibling in steps],
+    }
@@ -0,0 +1,14 @@
+"""
+Serializers for ledger API endpoints.
+"""
+from rest_framework import serializers
+from .models import MerkleBatch
+
+
+class MerkleBatchSerializer(serializers.ModelSerializer):
+    """
+    Serializer for published Merkle roots.
+    """
+    class Meta:
+        model = MerkleBatch
+        fields = ['id', 'root', 'leaf_count', 'sealed_at']
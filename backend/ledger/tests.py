@@ -0,0 +1,224 @@
+"""
+Tests for the ledger app.
+"""
+import hashlib
+from django.db import DatabaseError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from accounts.models import User
+from documents.models import DocumentRecord
+from issuer.models import Issuer, IssuerAuthorization
+from .chain import GENESIS_HASH, LedgerVerificationError, entry_digest, seal_ledger, verify_ledger
+from .events import record_document_deleted, record_document_uploads
+from .merkle import build_tree, inclusion_proof, leaf_hash, level_sizes, node_hash, verify_proof
+from .models import LedgerBlock, LedgerCheckpoint, LedgerEntry, MerkleBatch, MerkleLeaf
+from .sealing import _levels_cache, proof_for, seal_all_pending, seal_pending_documents
+
+
+def doc_hash(index):
+    return hashlib.sha256(f"document {index}".encode()).hexdigest()
+
+
+class MerkleTreeTests(SimpleTestCase):
+    """Tree construction and offline proof checks."""
+
+    def test_every_leaf_proves_against_the_root(self):
+        for leaf_count in (1, 2, 3, 5, 8, 13):
+            hashes = [doc_hash(i) for i in range(leaf_count)]
+            root, levels = build_tree(hashes)
+            self.assertEqual(len(levels), sum(level_sizes(leaf_count)) * 32)
+            for index, value in enumerate(hashes):
+                proof = inclusion_proof(levels, leaf_count, index)
+                self.assertLessEqual(len(proof), len(level_sizes(leaf_count)) - 1)
+                self.assertTrue(verify_proof(value, proof, root), (leaf_count, index))
+
+    def test_odd_node_is_promoted_not_duplicated(self):
+        hashes = [doc_hash(i) for i in range(3)]
+        root, _ = build_tree(hashes)
+        leaves = [leaf_hash(value) for value in hashes]
+        self.assertEqual(root, node_hash(node_hash(leaves[0], leaves[1]), leaves[2]))
+        self.assertEqual(level_sizes(3), [3, 2, 1])
+
+    def test_single_leaf_root_is_the_leaf(self):
+        root, _ = build_tree([doc_hash(0)])
+        self.assertEqual(root, leaf_hash(doc_hash(0)))
+        self.assertEqual(inclusion_proof(root, 1, 0), [])
+
+    def test_wrong_hash_or_root_fails(self):
+        hashes = [doc_hash(i) for i in range(4)]
+        root, levels = build_tree(hashes)
+        proof = [(side, sibling.hex()) for side, sibling in inclusion_proof(levels, 4, 1)]
+        self.assertTrue(verify_proof(hashes[1], proof, root.hex()))
+        self.assertFalse(verify_proof(hashes[2], proof, root.hex()))
+        self.assertFalse(verify_proof(hashes[1], proof, node_hash(root, root).hex()))
+
+    def test_interior_node_is_not_a_leaf(self):
+        hashes = [doc_hash(i) for i in range(2)]
+        root, _ = build_tree(hashes)
+        # Domain separation: the two leaf digests concatenated do not hash to the root as a leaf
+        self.assertNotEqual(leaf_hash(hashes[0] + hashes[1]), root)
+
+    def test_rejects_bad_input(self):
+        with self.assertRaises(ValueError):
+            build_tree([])
+        _, levels = build_tree([doc_hash(0), doc_hash(1)])
+        with self.assertRaises(IndexError):
+            inclusion_proof(levels, 2, 2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, MERKLE_BATCH_MAX_LEAVES=4)
+class MerkleSealingTests(TestCase):
+    """Sealing pending documents into batches and serving their proofs."""
+
+    def setUp(self):
+        # Batch ids are reused once a test's transaction rolls back
+        _levels_cache.clear()
+        self.addCleanup(_levels_cache.clear)
+        self.user = User.objects.create_user(
+            email='employee@example.com', username='employee@example.com',
+            password='test-password-123', emp_id='EMP100001'
+        )
+        self.hashes = [doc_hash(i) for i in range(6)]
+        for index, value in enumerate(self.hashes):
+            DocumentRecord.objects.create(
+                user=self.user, doc_hash=value, file_name=f'doc{index}.pdf',
+                file_size=100, storage_path=f'blobs/{value}.pdf'
+            )
+        self.client = APIClient()
+
+    def test_batches_cover_every_document_once(self):
+        batches = seal_all_pending()
+        self.assertEqual([batch.leaf_count for batch in batches], [4, 2])
+        self.assertIsNone(seal_pending_documents())
+        self.assertEqual(
+            list(MerkleLeaf.objects.order_by('batch_id', 'index').values_list('doc_hash', flat=True)),
+            self.hashes
+        )
+
+    def test_proof_verifies_against_published_root(self):
+        seal_all_pending()
+        for value in self.hashes:
+            proof = proof_for(value)
+            steps = [(step['side'], step['hash']) for step in proof['proof']]
+            self.assertTrue(verify_proof(value, steps, proof['root']))
+            self.assertEqual(MerkleBatch.objects.get(pk=proof['batch_id']).root, proof['root'])
+
+    def test_proof_endpoint(self):
+        self.assertEqual(self.client.get(f'/api/ledger/proof/{self.hashes[0]}/').status_code, 404)
+        seal_all_pending()
+        response = self.client.get(f'/api/ledger/proof/{self.hashes[5]}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        data = response.json()['data']
+        self.assertEqual((data['leaf_index'], data['leaf_count']), (1, 2))
+        steps = [(step['side'], step['hash']) for step in data['proof']]
+        self.assertTrue(verify_proof(self.hashes[5], steps, data['root']))
+
+    def test_roots_are_listed_newest_first(self):
+        batches = seal_all_pending()
+        response = self.client.get('/api/ledger/roots/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['root'] for row in response.json()['results']],
+            [batch.root for batch in reversed(batches)]
+        )
+
+
+@override_settings(LEDGER_BLOCK_SIZE=3, LEDGER_BLOCK_MAX_WAIT=3600)
+class LedgerChainTests(TestCase):
+    """Sealing entries into a hash chain and detecting tampering."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='employee@example.com', username='employee@example.com',
+            password='test-password-123', emp_id='EMP100001'
+        )
+        self.documents = [
+            DocumentRecord(
+                user=self.user, doc_hash=doc_hash(i), file_name=f'doc{i}.pdf',
+                file_size=100, storage_path=f'blobs/{doc_hash(i)}.pdf'
+            )
+            for i in range(7)
+        ]
+        record_document_uploads(self.documents)
+
+    def test_full_blocks_are_sealed_and_linked(self):
+        blocks = seal_ledger()
+        # The seventh entry waits for a full block or LEDGER_BLOCK_MAX_WAIT
+        self.assertEqual([(b.first_sequence, b.last_sequence) for b in blocks], [(1, 3), (4, 6)])
+        self.assertEqual(blocks[0].prev_block_hash, GENESIS_HASH)
+        self.assertEqual(blocks[1].prev_block_hash, blocks[0].block_hash)
+        self.assertEqual(LedgerEntry.objects.filter(block__isnull=True).count(), 1)
+
+        entries = list(LedgerEntry.objects.filter(block__isnull=False).order_by('sequence'))
+        prev_hash = GENESIS_HASH
+        for entry in entries:
+            self.assertEqual(entry.prev_hash, prev_hash)
+            self.assertEqual(entry.entry_hash, entry_digest(prev_hash, entry))
+            prev_hash = entry.entry_hash
+        self.assertEqual(blocks[1].head_entry_hash, prev_hash)
+
+    def test_flush_seals_a_partial_block(self):
+        seal_ledger()
+        blocks = seal_ledger(flush=True)
+        self.assertEqual([(b.first_sequence, b.last_sequence) for b in blocks], [(7, 7)])
+        self.assertEqual(verify_ledger(), 3)
+
+    def test_modified_entry_is_detected(self):
+        seal_ledger()
+        entry = LedgerEntry.objects.get(sequence=2)
+        LedgerEntry.objects.filter(pk=entry.pk).update(payload={**entry.payload, 'file_size': 1})
+        with self.assertRaisesMessage(LedgerVerificationError, 'Entry #2 in block 1 was modified'):
+            verify_ledger()
+
+    def test_deleted_entry_is_detected(self):
+        seal_ledger()
+        LedgerEntry.objects.filter(sequence=5).delete()
+        with self.assertRaisesMessage(LedgerVerificationError, 'Block 2 is missing entry #5'):
+            verify_ledger()
+
+    def test_verification_resumes_from_checkpoint(self):
+        seal_ledger()
+        self.assertEqual(verify_ledger(), 2)
+        self.assertEqual(LedgerCheckpoint.objects.first().block_number, 2)
+        self.assertEqual(verify_ledger(), 0)
+        seal_ledger(flush=True)
+        self.assertEqual(verify_ledger(), 1)
+
+        # Tampering before the checkpoint is only caught by a full pass
+        LedgerEntry.objects.filter(sequence=1).update(subject='f' * 64)
+        self.assertEqual(verify_ledger(), 0)
+        with self.assertRaises(LedgerVerificationError):
+            verify_ledger(full=True)
+
+    def test_modified_checkpoint_block_is_detected(self):
+        seal_ledger()
+        verify_ledger()
+        LedgerBlock.objects.filter(number=2).update(block_hash='f' * 64)
+        with self.assertRaisesMessage(LedgerVerificationError, 'Checkpointed block 2 was modified'):
+            verify_ledger()
+
+    def test_appends_roll_back_with_their_transaction(self):
+        try:
+            with transaction.atomic():
+                record_document_deleted(self.documents[0])
+                raise DatabaseError('upload failed')
+        except DatabaseError:
+            pass
+        self.assertEqual(LedgerEntry.objects.count(), 7)
+        self.assertFalse(LedgerEntry.objects.filter(event_type='document_deleted').exists())
+
+    def test_authorization_changes_are_recorded(self):
+        issuer = Issuer.objects.create(issuer_id='ISS1', name='HR', email='hr@example.com', company='Acme')
+        authorization = IssuerAuthorization.objects.create(
+            issuer=issuer, emp_id=self.user.emp_id, user_hash='c' * 64,
+            employee=self.user, created_by=self.user
+        )
+        authorization.approve()
+        authorization.revoke()
+        entries = LedgerEntry.objects.filter(subject=self.user.emp_id).order_by('id')
+        self.assertEqual(
+            [entry.event_type for entry in entries], ['authorization_approved', 'authorization_revoked']
+        )
+        self.assertEqual(entries[0].payload['issuer_id'], 'ISS1')
+        self.assertFalse(entries[1].payload['permission_granted'])
@@ -0,0 +1,10 @@
+"""
+URL configuration for ledger app.
+"""
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('proof/<str:doc_hash>/', views.inclusion_proof, name='inclusion_proof'),
+    path('roots/', views.merkle_roots, name='merkle_roots'),
+]
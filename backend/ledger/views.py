@@ -0,0 +1,50 @@
+"""
+Ledger API views: published Merkle roots and inclusion proofs.
+"""
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from verification.negative_cache import might_be_document
+from .models import MerkleBatch
+from .pagination import MerkleBatchPagination
+from .sealing import proof_for
+from .serializers import MerkleBatchSerializer
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])  # Proofs are public, like verification
+def inclusion_proof(request, doc_hash):
+    """
+    Merkle inclusion proof for a document hash.
+
+    Verifiers recompute the root from the hash and sibling path (see
+    ``ledger.merkle``) and compare it with a published root, offline. A hash
+    the verification negative cache has never seen is answered without a
+    query.
+    """
+    proof = proof_for(doc_hash) if might_be_document(doc_hash) else None
+    if proof is None:
+        return Response({
+            'success': False,
+            'error': 'Document hash has not been sealed yet'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    response = Response({
+        'success': True,
+        'data': proof
+    })
+    # A sealed proof never changes
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def merkle_roots(request):
+    """
+    Published Merkle roots, newest first (cursor-paginated).
+    """
+    paginator = MerkleBatchPagination()
+    page = paginator.paginate_queryset(MerkleBatch.objects.defer('levels'), request)
+    return paginator.get_paginated_response(MerkleBatchSerializer(page, many=True).data)
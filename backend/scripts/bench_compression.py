@@ -0,0 +1,87 @@
+"""
+Benchmark transparent document compression.
+
+Compresses the given files (or a synthetic text-heavy PDF-like document)
+with every available codec and reports the stored size, compression and
+full-read throughput, and the latency of small random range reads, which
+only decompress the frames they touch.
+
+Usage (from the backend directory):
+    python scripts/bench_compression.py [file ...] --ranges 200
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from documents.compression import CODECS, FramedReader, compress_to  # noqa: E402
+
+
+def synthetic_document(rng, size):
+    """Text content streams mixed with incompressible image data, like a scan with OCR."""
+    parts = [b'%PDF-1.4\n']
+    total = 0
+    while total < size:
+        if rng.random() < 0.3:
+            part = rng.randbytes(rng.randint(4096, 65536))
+        else:
+            part = b''.join(
+                f"BT /F1 10 Tf {rng.randint(0, 600)} {rng.randint(0, 800)} Td (word{rng.randint(0, 500)}) Tj ET\n".encode()
+                for _ in range(rng.randint(50, 500))
+            )
+        parts.append(part)
+        total += len(part)
+    return b''.join(parts)
+
+
+def bench(name, data, ranges, rng):
+    for codec in CODECS.values():
+        stored = io.BytesIO()
+        start = time.perf_counter()
+        compress_to(io.BytesIO(data), stored, codec)
+        compress_time = time.perf_counter() - start
+
+        stored.seek(0)
+        start = time.perf_counter()
+        assert FramedReader(stored).read() == data
+        read_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(ranges):
+            stored.seek(0)
+            reader = FramedReader(stored)
+            offset = rng.randrange(len(data))
+            reader.seek(offset)
+            assert reader.read(65536) == data[offset:offset + 65536]
+        range_time = time.perf_counter() - start
+
+        size = len(stored.getvalue())
+        print(f"{name[:30]:<30} {codec.name:>5} {len(data):>12} {size:>12} {100 * size / len(data):>6.1f}% "
+              f"{len(data) / compress_time / 1e6:>8.1f} {len(data) / read_time / 1e6:>8.1f} "
+              f"{1000 * range_time / max(ranges, 1):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('files', nargs='*', help='documents to compress (default: synthetic)')
+    parser.add_argument('--size', type=int, default=8, help='synthetic document size in MB')
+    parser.add_argument('--ranges', type=int, default=200, help='random 64KB range reads per codec')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'file':<30} {'codec':>5} {'logical':>12} {'stored':>12} {'ratio':>7} "
+          f"{'in MB/s':>8} {'out MB/s':>8} {'range ms':>8}")
+    if not args.files:
+        bench('synthetic', synthetic_document(rng, args.size * 1024 * 1024), args.ranges, rng)
+    for path in args.files:
+        with open(path, 'rb') as fh:
+            bench(os.path.basename(path), fh.read(), args.ranges, rng)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark single-PUT S3 uploads against MultipartS3Storage.
+
+Runs against any S3-compatible endpoint (MinIO, LocalStack) given with
+--endpoint-url, or starts a local moto server when none is given
+(pip install "moto[server]"). Requires django-storages and boto3.
+
+Usage (from the backend directory):
+    python scripts/bench_s3_multipart.py --sizes 16 64 --part-size 8 --concurrency 4
+    python scripts/bench_s3_multipart.py --endpoint-url http://localhost:9000 \\
+        --access-key minioadmin --secret-key minioadmin
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+MB = 1024 * 1024
+
+
+def configure_django(args):
+    from django.conf import settings
+    settings.configure(
+        AWS_ACCESS_KEY_ID=args.access_key,
+        AWS_SECRET_ACCESS_KEY=args.secret_key,
+        AWS_STORAGE_BUCKET_NAME=args.bucket,
+        AWS_S3_REGION_NAME='us-east-1',
+        AWS_S3_ENDPOINT_URL=args.endpoint_url,
+        AWS_S3_FILE_OVERWRITE=True,
+        AWS_DEFAULT_ACL=None,
+    )
+
+
+def timed_save(storage, name, path):
+    from django.core.files import File
+    with open(path, 'rb') as fh:
+        start = time.perf_counter()
+        storage.save(name, File(fh, name=name))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[16, 64], help='File sizes in MB')
+    parser.add_argument('--part-size', type=int, default=8, help='Multipart part size in MB')
+    parser.add_argument('--concurrency', type=int, default=4, help='Parts uploaded in parallel')
+    parser.add_argument('--repeat', type=int, default=3, help='Uploads per measurement')
+    parser.add_argument('--endpoint-url', default=None)
+    parser.add_argument('--access-key', default='testing')
+    parser.add_argument('--secret-key', default='testing')
+    parser.add_argument('--bucket', default='blockhire-bench')
+    args = parser.parse_args()
+
+    server = None
+    if args.endpoint_url is None:
+        import logging
+        from moto.server import ThreadedMotoServer
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = ThreadedMotoServer(port=0)
+        server.start()
+        host, port = server.get_host_and_port()
+        args.endpoint_url = f'http://{host}:{port}'
+
+    configure_django(args)
+
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from storages.backends.s3boto3 import S3Boto3Storage
+    from documents.s3_storage import MultipartS3Storage
+
+    boto3.client(
+        's3', endpoint_url=args.endpoint_url, region_name='us-east-1',
+        aws_access_key_id=args.access_key, aws_secret_access_key=args.secret_key,
+    ).create_bucket(Bucket=args.bucket)
+
+    single_put = S3Boto3Storage(transfer_config=TransferConfig(multipart_threshold=1024 * MB))
+    multipart = MultipartS3Storage(
+        multipart_threshold=args.part_size * MB,
+        multipart_part_size=args.part_size * MB,
+        multipart_concurrency=args.concurrency,
+    )
+
+    print(f"{'size MB':>8} {'single PUT MB/s':>16} {'multipart MB/s':>15}")
+    try:
+        for size_mb in args.sizes:
+            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+                block = os.urandom(MB)
+                for _ in range(size_mb):
+                    tmp.write(block)
+            try:
+                row = []
+                for label, storage in (('single', single_put), ('multipart', multipart)):
+                    best = min(
+                        timed_save(storage, f'bench/{label}-{size_mb}-{i}.pdf', tmp.name)
+                        for i in range(args.repeat)
+                    )
+                    row.append(size_mb / best)
+                print(f"{size_mb:>8} {row[0]:>16.1f} {row[1]:>15.1f}")
+            finally:
+                os.unlink(tmp.name)
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark peak RSS of document upload hashing against file size.
+
+Compares the old buffered approach (read the whole file, then build a second
+full-size hash input) with the streaming DocumentHasher used by
+DocumentUploadView. Each measurement runs in a fresh interpreter so the
+peak RSS of one run does not leak into the next.
+
+Usage (from the backend directory):
+    python scripts/bench_upload_hashing.py --sizes 1 16 64 256
+"""
+import argparse
+import hashlib
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KB (Linux reports KB)."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+def run_child(mode, path):
+    """Hash ``path`` with the given mode and print baseline and peak RSS."""
+    from django.core.files import File
+    from documents.hashing import DocumentHasher
+
+    baseline = peak_rss_kb()
+    with open(path, 'rb') as fh:
+        uploaded_file = File(fh, name=os.path.basename(path))
+        if mode == 'buffered':
+            file_content = uploaded_file.read()
+            hash_input = file_content + uploaded_file.name.encode('utf-8') + b'0' * 45
+            hashlib.sha256(hash_input).hexdigest()
+        else:
+            DocumentHasher().feed(uploaded_file).finalize(uploaded_file.name)
+    print(baseline, peak_rss_kb())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 16, 64, 256],
+                        help='File sizes to test, in MB')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    print(f"{'size MB':>8} {'buffered peak MB':>17} {'streaming peak MB':>18}")
+    for size_mb in args.sizes:
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+            block = os.urandom(1024 * 1024)
+            for _ in range(size_mb):
+                tmp.write(block)
+        try:
+            row = []
+            for mode in ('buffered', 'streaming'):
+                out = subprocess.check_output(
+                    [sys.executable, __file__, '--child', mode, tmp.name], text=True
+                )
+                baseline, peak = map(int, out.split())
+                row.append((peak - baseline) / 1024)
+            print(f"{size_mb:>8} {row[0]:>17.1f} {row[1]:>18.1f}")
+        finally:
+            os.unlink(tmp.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark content-defined chunking for document versions.
+
+Builds a random base document and a series of edited revisions (inserts,
+deletions and overwrites at random offsets), then reports chunking
+throughput and how many new bytes each revision would store compared with
+storing every revision in full.
+
+Usage (from the backend directory):
+    python scripts/bench_versioning.py --size 8 --revisions 10 --avg-kb 32
+"""
+import argparse
+import hashlib
+import io
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from documents.cdc import iter_chunks  # noqa: E402
+
+
+def edit(data, rng):
+    """Apply one small random edit."""
+    offset = rng.randrange(len(data))
+    length = rng.randint(1, 4096)
+    kind = rng.choice(['insert', 'delete', 'overwrite'])
+    if kind == 'insert':
+        return data[:offset] + rng.randbytes(length) + data[offset:]
+    if kind == 'delete':
+        return data[:offset] + data[offset + length:]
+    return data[:offset] + rng.randbytes(length) + data[offset + length:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=8, help='base document size in MB')
+    parser.add_argument('--revisions', type=int, default=10)
+    parser.add_argument('--edits', type=int, default=3, help='edits per revision')
+    parser.add_argument('--avg-kb', type=int, default=32, help='average chunk size in KB (power of two)')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    data = rng.randbytes(args.size * 1024 * 1024)
+    stored = set()
+    total_full = total_new = 0
+    elapsed = 0.0
+
+    print(f"{'rev':>4} {'size':>12} {'chunks':>7} {'new bytes':>12} {'new %':>7}")
+    for revision in range(args.revisions + 1):
+        if revision:
+            for _ in range(args.edits):
+                data = edit(data, rng)
+        start = time.perf_counter()
+        chunks = list(iter_chunks(io.BytesIO(data), args.avg_kb * 1024))
+        elapsed += time.perf_counter() - start
+        new = 0
+        for chunk in chunks:
+            digest = hashlib.sha256(chunk).digest()
+            if digest not in stored:
+                stored.add(digest)
+                new += len(chunk)
+        total_full += len(data)
+        total_new += new
+        print(f"{revision:>4} {len(data):>12} {len(chunks):>7} {new:>12} {100 * new / len(data):>6.1f}%")
+
+    print(f"\nFull copies: {total_full / 1e6:.1f}MB, chunked: {total_new / 1e6:.1f}MB "
+          f"({100 * total_new / total_full:.1f}%)")
+    print(f"Chunking throughput: {total_full / elapsed / 1e6:.1f}MB/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+"""
+Buffered audit trail of public verifications.
+
+The view decides from cached data and hands the outcome to
+``record_verification``. The record is queued in process, and a flusher
+thread writes queued records every ``VERIFICATION_AUDIT_FLUSH_INTERVAL``
+milliseconds or once ``VERIFICATION_AUDIT_BATCH_SIZE`` are waiting. Each
+flush is a few ``bulk_create`` calls, so the response never waits for the
+writes.
+
+- At most ``VERIFICATION_AUDIT_MAX_PENDING`` records are queued. A caller
+  that finds the queue full waits up to ``VERIFICATION_AUDIT_BLOCK_TIMEOUT``
+  seconds for room and otherwise writes its record itself (back-pressure).
+- Queued records are flushed when the process exits.
+- When a batch write fails, the records are retried one at a time so a
+  single bad row cannot sink the batch. Whatever still fails is put back
+  at the head of the queue (up to ``VERIFICATION_AUDIT_MAX_PENDING``) and
+  retried on the next flush. A record that has failed
+  ``VERIFICATION_AUDIT_MAX_ATTEMPTS`` times is moved to a dead-letter file
+  in the spool directory (or printed without one) and no longer retried.
+- With ``VERIFICATION_AUDIT_SPOOL_DIR`` set, records are appended to a
+  per-process spool file before they are queued. The file is removed once
+  the batch is written. Files left behind by a crashed worker are replayed
+  at startup or by ``manage.py replay_verification_audit``. Replay is
+  at-least-once: a crash between a write and the spool removal duplicates
+  that batch.
+
+Bulk verification bypasses the buffer and calls ``write_records`` once per
+chunk, so both paths write the same rows.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils.dateparse import parse_datetime
+from .models import VerificationLog, VerificationRequest, VerificationResult
+
+SPOOL_PREFIX = 'audit-'
+# Not matched by the replay glob: dead letters need a person to look at them
+DEAD_LETTER_PREFIX = 'dead-letter-'
+# Rows per INSERT statement
+WRITE_BATCH_SIZE = 1000
+SPOOL_SUFFIX = '.ndjson'
+
+
+def _request_row(record):
+    audit = record['audit']
+    is_valid = record['outcome'] == 'verified'
+    return VerificationRequest(
+        emp_id=audit['emp_id'],
+        doc_hash=audit['doc_hash'],
+        requested_by_id=audit['requested_by_id'],
+        request_ip=audit['request_ip'],
+        user_agent=audit['user_agent'],
+        status='verified' if is_valid else 'failed',
+        is_valid=is_valid,
+        verification_date=parse_datetime(audit['verification_date']),
+        result_message=record['message'],
+    )
+
+
+def _related_rows(record, verification_request):
+    """The logs and (on success) the result of one verification."""
+    audit = record['audit']
+    log = lambda action, details: VerificationLog(
+        verification_request=verification_request,
+        action=action,
+        details=details,
+        performed_by_id=audit['requested_by_id'],
+        ip_address=audit['request_ip']
+    )
+    logs = [log(
+        'verification_attempt',
+        f"Verification requested for emp_id: {audit['emp_id']}, doc_hash: {audit['doc_hash']}"
+    )]
+    result = None
+    if record['outcome'] == 'verified':
+        employee = record['employee']
+        result = VerificationResult(
+            verification_request=verification_request,
+            employee_details=employee['employee_details'],
+            document_preview_url=f"/api/documents/preview/{audit['doc_hash']}/",
+            download_url=f"/api/documents/download/{audit['doc_hash']}/",
+            verification_metadata={
+                'verified_at': audit['verification_date'],
+                'verification_method': 'hash_comparison',
+                'original_doc_hash': employee['doc_hash']
+            }
+        )
+        logs.append(log('verification_success', f"Document verified successfully for {audit['emp_id']}"))
+    elif record['outcome'] == 'error':
+        logs.append(log('verification_error', record['message']))
+    return logs, result
+
+
+def write_records(records):
+    """Persist queued verification records with bulk inserts in one transaction."""
+    if not records:
+        return
+    with transaction.atomic():
+        requests = [_request_row(record) for record in records]
+        if connection.features.can_return_rows_from_bulk_insert:
+            VerificationRequest.objects.bulk_create(requests, batch_size=WRITE_BATCH_SIZE)
+        else:
+            for verification_request in requests:
+                verification_request.save()
+        logs, results = [], []
+        for record, verification_request in zip(records, requests):
+            record_logs, result = _related_rows(record, verification_request)
+            logs.extend(record_logs)
+            if result is not None:
+                results.append(result)
+        VerificationLog.objects.bulk_create(logs, batch_size=WRITE_BATCH_SIZE)
+        VerificationResult.objects.bulk_create(results, batch_size=WRITE_BATCH_SIZE)
+
+
+def make_record(audit, outcome, message, employee=None):
+    """
+    JSON-serializable audit record.
+
+    ``audit`` holds the request fields (emp_id, doc_hash, requested_by_id,
+    request_ip, user_agent, verification_date); ``outcome`` is 'verified',
+    'failed' or 'error'.
+    """
+    audit = dict(audit, verification_date=audit['verification_date'].isoformat())
+    return {'audit': audit, 'outcome': outcome, 'message': message, 'employee': employee}
+
+
+class AuditBuffer:
+    """Bounded in-process queue of audit records with a background flusher."""
+
+    def __init__(self, batch_size, flush_interval, max_pending, block_timeout, spool_dir='', max_attempts=3):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.block_timeout = block_timeout
+        self.spool_dir = spool_dir
+        self.max_attempts = max_attempts
+        self._pending = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._spool = None
+        self._segment = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='verification-audit', daemon=True)
+        self._thread.start()
+
+    def _spool_path(self):
+        return os.path.join(self.spool_dir, f"{SPOOL_PREFIX}{os.getpid()}-{self._segment}{SPOOL_SUFFIX}")
+
+    def _append_spool(self, record):
+        if not self.spool_dir:
+            return
+        if self._spool is None:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._spool = open(self._spool_path(), 'a')
+        self._spool.write(json.dumps(record) + '\n')
+        self._spool.flush()
+
+    def submit(self, record):
+        """Queue a record; writes it inline when the queue stays full."""
+        with self._cond:
+            deadline = time.monotonic() + self.block_timeout
+            while len(self._pending) >= self.max_pending and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if len(self._pending) < self.max_pending and not self._closed:
+                self._append_spool(record)
+                self._pending.append(record)
+                if len(self._pending) in (1, self.batch_size):
+                    # Start the flush timer, or flush a full batch now
+                    self._cond.notify_all()
+                return
+        print("Verification audit queue is full; writing inline")
+        try:
+            write_records([record])
+        except Exception as e:
+            print(f"Verification audit write failed for {record['audit']['emp_id']}: {e}")
+
+    def _take(self):
+        """Swap out the pending records and their spool segment."""
+        with self._cond:
+            batch, self._pending = self._pending, []
+            spool, self._spool = self._spool, None
+            self._segment += 1
+            self._cond.notify_all()
+        if spool is not None:
+            spool.close()
+        return batch, spool.name if spool is not None else None
+
+    def flush(self):
+        """Write everything queued so far; returns the number of records written."""
+        with self._flush_lock:
+            batch, spool_path = self._take()
+            if not batch:
+                return 0
+            try:
+                write_records(batch)
+            except Exception as e:
+                print(f"Verification audit flush of {len(batch)} records failed: {e}")
+                return self._retry(batch, spool_path)
+            if spool_path:
+                os.remove(spool_path)
+            return len(batch)
+
+    def _dead_letter(self, record, error):
+        """Set aside a record that keeps failing so it stops holding up the queue."""
+        line = json.dumps(dict(record, error=str(error)))
+        if self.spool_dir:
+            path = os.path.join(self.spool_dir, f"{DEAD_LETTER_PREFIX}{os.getpid()}{SPOOL_SUFFIX}")
+            try:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                with open(path, 'a') as fh:
+                    fh.write(line + '\n')
+                print(f"Verification audit: record for {record['audit']['emp_id']} moved to {path}")
+                return
+            except OSError as e:
+                print(f"Verification audit: could not write {path}: {e}")
+        print(f"Verification audit: giving up on a record after {record['attempts']} attempts: {line}")
+
+    def _retry(self, batch, spool_path):
+        """Write a failed batch row by row and re-queue what still fails; returns the number written."""
+        failed = []
+        dead = 0
+        for record in batch:
+            try:
+                write_records([record])
+            except Exception as e:
+                record['attempts'] = record.get('attempts', 0) + 1
+                if record['attempts'] >= self.max_attempts:
+                    self._dead_letter(record, e)
+                    dead += 1
+                else:
+                    failed.append(record)
+        with self._cond:
+            room = max(0, self.max_pending - len(self._pending))
+            requeued = failed[:room]
+            for record in requeued:
+                self._append_spool(record)
+            self._pending[:0] = requeued
+            if requeued:
+                self._cond.notify_all()
+        dropped = len(failed) - len(requeued)
+        if dropped:
+            # The spool segment, if any, is kept for replay
+            print(f"Verification audit queue is full; {dropped} failed records not re-queued")
+        elif spool_path:
+            os.remove(spool_path)
+        if failed:
+            print(f"Verification audit: re-queued {len(requeued)} records after a failed write")
+        return len(batch) - len(failed) - dead
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._pending) < self.batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                closed = self._closed
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+            if closed:
+                return
+
+    def close(self):
+        """Stop the flusher after a final flush."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        if self._pending:
+            print(f"Verification audit: {len(self._pending)} records could not be written before exit")
+
+
+def replay_spool(spool_dir=None):
+    """
+    Write records left in spool files by processes that are gone.
+
+    Each file is claimed with an atomic rename so concurrent replays never
+    write it twice. Returns the number of records replayed.
+    """
+    spool_dir = spool_dir or settings.VERIFICATION_AUDIT_SPOOL_DIR
+    replayed = 0
+    for path in sorted(glob.glob(os.path.join(spool_dir, f"{SPOOL_PREFIX}*{SPOOL_SUFFIX}"))):
+        pid = int(os.path.basename(path)[len(SPOOL_PREFIX):].split('-')[0])
+        if pid == os.getpid() or _process_alive(pid):
+            continue
+        claimed = f"{path}.replay-{os.getpid()}"
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            continue  # Claimed by another replay
+        with open(claimed) as fh:
+            # A crash mid-append can leave a torn last line
+            records = []
+            for line in fh:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    print(f"Verification audit: skipping a torn line in {path}")
+        write_records(records)
+        os.remove(claimed)
+        replayed += len(records)
+    return replayed
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """The process-wide AuditBuffer, created (and leftover spools replayed) on first use."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            if settings.VERIFICATION_AUDIT_SPOOL_DIR:
+                try:
+                    replayed = replay_spool()
+                    if replayed:
+                        print(f"Verification audit: replayed {replayed} spooled records")
+                except Exception as e:
+                    print(f"Verification audit spool replay failed: {e}")
+            _buffer = AuditBuffer(
+                batch_size=settings.VERIFICATION_AUDIT_BATCH_SIZE,
+                flush_interval=settings.VERIFICATION_AUDIT_FLUSH_INTERVAL / 1000,
+                max_pending=settings.VERIFICATION_AUDIT_MAX_PENDING,
+                block_timeout=settings.VERIFICATION_AUDIT_BLOCK_TIMEOUT,
+                spool_dir=settings.VERIFICATION_AUDIT_SPOOL_DIR,
+                max_attempts=settings.VERIFICATION_AUDIT_MAX_ATTEMPTS,
+            )
+            atexit.register(_buffer.close)
+        return _buffer
+
+
+def record_verification(audit, outcome, message, employee=None):
+    """Queue a verification for the audit trail once the current transaction commits."""
+    record = make_record(audit, outcome, message, employee)
+    transaction.on_commit(lambda: get_buffer().submit(record))
@@ -0,0 +1,191 @@
+"""
+Bulk verification of (emp_id, doc_hash) pairs.
+
+Pairs are read lazily from a JSON list or an uploaded NDJSON/CSV file and
+resolved ``VERIFICATION_BULK_CHUNK_SIZE`` at a time: one ``emp_id IN (...)``
+query joined to profiles per chunk, then one NDJSON line per pair, then the
+chunk's audit records (the same request, log and result rows a single
+verification writes) with bulk inserts. The response streams while later
+chunks are still being resolved.
+"""
+import csv
+import io
+import json
+import math
+from django.conf import settings
+from django.utils import timezone
+from .audit import make_record, write_records
+from .cache import load_employees
+
+NDJSON_CONTENT_TYPES = {'application/x-ndjson', 'application/jsonl'}
+
+# (audit outcome, audit message, message returned to the client)
+DECISIONS = {
+    'no_employee': ('failed', "Employee not found", 'Employee not found'),
+    'no_profile': ('failed', "Employee profile not found", 'Employee profile not found'),
+    'no_original': ('failed', "No original document found for employee",
+                    'No original document found for employee'),
+    'mismatch': ('failed', "Document hash does not match original",
+                 'Document is tampered or not the original'),
+    'verified': ('verified', "Document verified successfully", 'Document verified successfully'),
+}
+
+
+class BulkInputError(ValueError):
+    """The uploaded list or file cannot be read."""
+
+
+def validate_pair(emp_id, doc_hash):
+    """The single-verify serializer's rules; returns an error message or None."""
+    if not isinstance(emp_id, str) or not isinstance(doc_hash, str):
+        return 'emp_id and doc_hash must be strings'
+    if len(emp_id) > 20 or not emp_id.startswith('EMP'):
+        return "Employee ID must start with 'EMP'"
+    if len(doc_hash) != 64:
+        return 'Document hash must be 64 characters long'
+    return None
+
+
+def _pair(item):
+    if isinstance(item, dict):
+        return item.get('emp_id', item.get('empId')), item.get('doc_hash', item.get('docHash'))
+    if isinstance(item, (list, tuple)) and len(item) == 2:
+        return item[0], item[1]
+    return None, None
+
+
+def _iter_ndjson(text):
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield _pair(json.loads(line))
+        except ValueError:
+            yield None, None
+
+
+def _iter_csv(text):
+    reader = csv.reader(text)
+    for number, row in enumerate(reader):
+        if number == 0 and row and row[0].strip().lower() in ('emp_id', 'empid'):
+            continue  # Header
+        if not row:
+            continue
+        yield (row[0].strip(), row[1].strip()) if len(row) >= 2 else (None, None)
+
+
+def iter_file_pairs(uploaded_file):
+    """Yield ``(emp_id, doc_hash)`` from an NDJSON or CSV upload, one line at a time."""
+    text = io.TextIOWrapper(uploaded_file, encoding='utf-8', newline='')
+    name = (uploaded_file.name or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or uploaded_file.content_type in NDJSON_CONTENT_TYPES:
+        return _iter_ndjson(text)
+    if name.endswith('.csv') or uploaded_file.content_type in ('text/csv', 'application/csv'):
+        return _iter_csv(text)
+    raise BulkInputError('Upload an .ndjson or .csv file')
+
+
+def iter_list_pairs(items):
+    if not isinstance(items, list):
+        raise BulkInputError('items must be a list of {"emp_id", "doc_hash"} objects')
+    return (_pair(item) for item in items)
+
+
+def decide(employee, doc_hash):
+    if employee['status'] != 'ok':
+        return employee['status']
+    if not employee['doc_hash']:
+        return 'no_original'
+    return 'verified' if employee['doc_hash'] == doc_hash else 'mismatch'
+
+
+def _line(data):
+    return json.dumps(data) + '\n'
+
+
+def _resolve_chunk(chunk, audit_base):
+    """
+    Resolve a chunk of ``(index, emp_id, doc_hash, error)`` items.
+
+    Returns the NDJSON bytes for the chunk, its audit records and counts.
+    """
+    employees = load_employees({emp_id for _, emp_id, _, error in chunk if error is None})
+    verification_date = timezone.now()
+    lines = []
+    records = []
+    counts = {'valid': 0, 'invalid': 0, 'errors': 0}
+    for index, emp_id, doc_hash, error in chunk:
+        if error is not None:
+            counts['errors'] += 1
+            lines.append(_line({'index': index, 'error': error}))
+            continue
+        employee = employees[emp_id]
+        outcome, audit_message, message = DECISIONS[decide(employee, doc_hash)]
+        result = {'index': index, 'emp_id': emp_id, 'doc_hash': doc_hash,
+                  'isValid': outcome == 'verified', 'message': message}
+        if outcome == 'verified':
+            result['employeeDetails'] = employee['employee_details']
+            counts['valid'] += 1
+        else:
+            counts['invalid'] += 1
+        lines.append(_line(result))
+        audit = dict(audit_base, emp_id=emp_id, doc_hash=doc_hash, verification_date=verification_date)
+        records.append(make_record(audit, outcome, audit_message, employee if outcome == 'verified' else None))
+    return ''.join(lines).encode(), records, counts
+
+
+def verify_pairs(pairs, audit_base, max_items=None, charge=None, chunk_size=None):
+    """
+    Generator of NDJSON bytes for ``pairs``, ending with a summary line.
+
+    ``audit_base`` holds requested_by_id, request_ip and user_agent.
+    ``charge(count)`` is called before each chunk is resolved and returns
+    None to go ahead, or the seconds to wait when the caller is out of
+    rate-limit tokens; the remaining pairs are then not verified.
+    ``chunk_size`` lowers ``VERIFICATION_BULK_CHUNK_SIZE`` (e.g. so one
+    chunk never costs more than a full bucket).
+    """
+    if max_items is None:
+        max_items = settings.VERIFICATION_BULK_MAX_ITEMS
+    chunk_size = max(1, min(settings.VERIFICATION_BULK_CHUNK_SIZE, chunk_size or max_items, max_items))
+    totals = {'total': 0, 'valid': 0, 'invalid': 0, 'errors': 0}
+    chunk = []
+    failure = None
+
+    def affordable():
+        nonlocal failure
+        wait = charge(len(chunk)) if charge is not None else None
+        if wait is None:
+            return True
+        failure = f'Rate limit exceeded; retry the remaining pairs in {math.ceil(wait)} seconds'
+        chunk.clear()
+        return False
+
+    def resolve():
+        body, records, counts = _resolve_chunk(chunk, audit_base)
+        write_records(records)
+        totals['total'] += len(chunk)
+        for key, value in counts.items():
+            totals[key] += value
+        chunk.clear()
+        return body
+
+    try:
+        for index, (emp_id, doc_hash) in enumerate(pairs):
+            if index >= max_items:
+                failure = f'Only the first {max_items} pairs were verified'
+                break
+            chunk.append((index, emp_id, doc_hash, validate_pair(emp_id, doc_hash)))
+            if len(chunk) >= chunk_size:
+                if not affordable():
+                    break
+                yield resolve()
+    except (UnicodeDecodeError, csv.Error) as e:
+        failure = f'Could not read the uploaded file: {e}'
+
+    if chunk and affordable():
+        yield resolve()
+    if failure:
+        yield _line({'error': failure}).encode()
+    yield _line({'summary': totals}).encode()
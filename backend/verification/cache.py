@@ -0,0 +1,135 @@
+"""
+Two-tier cache of the data behind a verification decision.
+
+``verify_document`` only needs an employee's original ``doc_hash`` and the
+employee details returned on success. Both are cached per emp_id in a
+process-local LRU in front of the shared Django cache, so a warm lookup runs
+no query and a cold one runs a single query.
+
+The local tier has a short TTL (``VERIFICATION_LOCAL_CACHE_TTL``) so that
+invalidations made by other workers are picked up quickly. The shared tier
+is invalidated after commit whenever a user or profile is saved or deleted,
+and when an upload claims a profile's original document.
+
+A lookup that read the database before such a commit must not store its
+stale row after the invalidation. Shared entries are therefore keyed by a
+per-employee generation that invalidating bumps; a fill is stored under the
+generation read before the query, which nobody reads once it is bumped.
+The local tier skips a fill if any eviction happened in this process while
+it was loading.
+"""
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from accounts.models import User
+from documents.lru import LRUCache
+
+_local = LRUCache(
+    maxsize=settings.VERIFICATION_LOCAL_CACHE_SIZE,
+    ttl=settings.VERIFICATION_LOCAL_CACHE_TTL,
+)
+# Bumped on every eviction; a local fill only lands if it has not moved
+_local_generation = 0
+_local_lock = threading.Lock()
+
+
+def _key(emp_id):
+    # emp_id is public input; hash it into a key every cache backend accepts
+    return f"verification:employee:{hashlib.sha256(emp_id.encode()).hexdigest()[:32]}"
+
+
+EMPLOYEE_COLUMNS = {
+    'emp_id': 'emp_id',
+    'user_hash': 'user_hash',
+    'email': 'email',
+    'first_name': 'profile__first_name',
+    'last_name': 'profile__last_name',
+    'job_designation': 'profile__job_designation',
+    'department': 'profile__department',
+    'is_profile_complete': 'profile__is_profile_complete',
+}
+
+
+def load_employees(emp_ids):
+    """
+    Read verification data for many emp_ids with one query (values, no
+    model instances); returns a dict by emp_id.
+
+    Each value has a ``status`` of 'ok', 'no_employee' or 'no_profile';
+    'ok' entries carry ``doc_hash`` and ``employee_details``.
+    """
+    employees = dict.fromkeys(emp_ids, {'status': 'no_employee'})
+    rows = User.objects.filter(emp_id__in=list(employees)).values(
+        'profile__id', 'profile__doc_hash', *EMPLOYEE_COLUMNS.values()
+    )
+    for row in rows:
+        if row['profile__id'] is None:
+            employees[row['emp_id']] = {'status': 'no_profile'}
+            continue
+        employees[row['emp_id']] = {
+            'status': 'ok',
+            'doc_hash': row['profile__doc_hash'] or '',
+            'employee_details': {key: row[column] for key, column in EMPLOYEE_COLUMNS.items()},
+        }
+    return employees
+
+
+def load_employee(emp_id):
+    """``load_employees`` for a single emp_id."""
+    return load_employees([emp_id])[emp_id]
+
+
+def _generation(key):
+    """Current shared generation of ``key``, starting one if there is none."""
+    generation_key = f"{key}:generation"
+    generation = cache.get(generation_key)
+    if generation is None:
+        # Never restart at a value an older entry may still be stored under
+        cache.add(generation_key, time.time_ns(), None)
+        generation = cache.get(generation_key)
+    return generation
+
+
+def get_employee(emp_id):
+    """Cached ``load_employee``; absent employees are cached too."""
+    key = _key(emp_id)
+    employee = _local.get(key)
+    if employee is not None:
+        return employee
+    local_generation = _local_generation
+    # Read before the query, so an invalidation committed meanwhile wins
+    versioned_key = f"{key}:{_generation(key)}"
+    employee = cache.get(versioned_key)
+    if employee is None:
+        employee = load_employee(emp_id)
+        cache.set(versioned_key, employee, settings.VERIFICATION_CACHE_TIMEOUT)
+    with _local_lock:
+        if _local_generation == local_generation:
+            _local.set(key, employee)
+    return employee
+
+
+def _evict(emp_id):
+    global _local_generation
+    key = _key(emp_id)
+    with _local_lock:
+        _local_generation += 1
+        _local.pop(key)
+    try:
+        cache.incr(f"{key}:generation")
+    except ValueError:
+        # No generation yet: the next lookup starts a fresh one
+        pass
+
+
+def invalidate_employee(emp_id):
+    """Drop cached verification data for ``emp_id`` once the current transaction commits."""
+    if emp_id:
+        transaction.on_commit(lambda: _evict(emp_id))
+
+
+def clear_local_cache():
+    _local.clear()
@@ -0,0 +1,18 @@
+"""
+Management command to rebuild the verification negative cache from the database.
+"""
+from django.core.management.base import BaseCommand
+from verification.negative_cache import get_negative_cache
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Bloom filter of known emp_ids and document hashes and publish it to all workers'
+
+    def handle(self, *args, **options):
+        negative_cache = get_negative_cache()
+        negative_cache.rebuild()
+        stats = negative_cache.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Published {stats['keys']} keys in {stats['memory_bytes']} bytes "
+            f"(estimated false-positive rate {stats['estimated_fp_rate']:.2e})"
+        ))
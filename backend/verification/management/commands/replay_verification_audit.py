@@ -0,0 +1,20 @@
+"""
+Management command to write verification audit records left in spool files.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from verification.audit import replay_spool
+
+
+class Command(BaseCommand):
+    help = 'Replay verification audit records spooled by workers that exited before flushing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spool-dir', default=None, help='Spool directory (default: VERIFICATION_AUDIT_SPOOL_DIR)')
+
+    def handle(self, *args, **options):
+        spool_dir = options['spool_dir'] or settings.VERIFICATION_AUDIT_SPOOL_DIR
+        if not spool_dir:
+            raise CommandError('VERIFICATION_AUDIT_SPOOL_DIR is not set')
+        replayed = replay_spool(spool_dir)
+        self.stdout.write(self.style.SUCCESS(f'Replayed {replayed} verification audit record(s)'))
@@ -0,0 +1,333 @@
+"""
+Negative cache of emp_ids and document hashes that do not exist.
+
+A Bloom filter holds every known emp_id and every issued ``doc_hash``. A
+key the filter has never seen certainly does not exist, so
+``verify_document`` answers it without a query. A key the filter contains
+is only probably known and goes through the normal lookup. The filter has
+no false negatives as long as every worker sees every addition.
+
+Workers share the filter through the Django cache:
+
+- A full snapshot is stored with the sequence number of the last addition
+  it covers. A worker loads it on first use, or rebuilds it from the
+  database and publishes it if there is none (``manage.py
+  rebuild_verification_filter`` does the same on demand).
+- Each registration or upload publishes a small delta under the next
+  sequence number. Before answering a miss, a worker applies any deltas
+  it has not seen, so a key added by another worker is never reported
+  missing. While a delta is still missing (published between its incr and
+  set, or lost) every key is treated as probable.
+- If publishing an addition fails, this worker drops its filter and
+  rebuilds it from the database on the next lookup (answering "probable"
+  until that succeeds) rather than report a committed key missing.
+
+Deltas only reach other processes through a shared cache
+(``CACHE_REDIS_URL``), so the filter is off by default without one. Bloom
+filters cannot forget: deleted users and documents stay probable until the
+next rebuild.
+"""
+import hashlib
+import math
+import struct
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from accounts.models import User
+from documents.models import DocumentRecord
+
+SNAPSHOT_KEY = 'verification:filter:snapshot'
+SEQUENCE_KEY = 'verification:filter:seq'
+DELTA_KEY = 'verification:filter:delta:{}'
+DELTA_TIMEOUT = 7 * 24 * 3600
+# Reload the snapshot instead of fetching more deltas than this
+MAX_DELTA_FETCH = 1000
+# A delta still missing after this long was lost; resynchronize from scratch
+GAP_TIMEOUT = 5.0
+
+
+def employee_key(emp_id):
+    return f"e:{emp_id}"
+
+
+def document_key(doc_hash):
+    return f"d:{doc_hash}"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, sized for ``capacity`` keys at ``fp_rate``."""
+
+    HEADER = struct.Struct('<4sQQBQd')
+    MAGIC = b'BHBF'
+
+    def __init__(self, capacity, fp_rate):
+        self.capacity = max(1, capacity)
+        self.fp_rate = fp_rate
+        self.num_bits = max(64, math.ceil(-self.capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        bits = self.bits
+        added = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def fill_ratio(self):
+        return int.from_bytes(self.bits, 'little').bit_count() / self.num_bits
+
+    def estimated_fp_rate(self):
+        """False-positive rate implied by the bits set so far."""
+        return self.fill_ratio() ** self.num_hashes
+
+    def to_bytes(self):
+        header = self.HEADER.pack(self.MAGIC, self.capacity, self.num_bits, self.num_hashes, self.count, self.fp_rate)
+        return header + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, capacity, num_bits, num_hashes, count, fp_rate = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError('Not a serialized BloomFilter')
+        bloom = cls.__new__(cls)
+        bloom.capacity, bloom.num_bits, bloom.num_hashes = capacity, num_bits, num_hashes
+        bloom.count, bloom.fp_rate = count, fp_rate
+        bloom.bits = bytearray(data[cls.HEADER.size:])
+        return bloom
+
+
+class NegativeCache:
+    """This worker's copy of the shared filter, kept in step through cache deltas."""
+
+    COUNTERS = ('lookups', 'negatives', 'syncs', 'deltas_applied', 'rebuilds', 'snapshot_loads')
+
+    def __init__(self, capacity, fp_rate, snapshot_every):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.snapshot_every = snapshot_every
+        self._filter = None
+        self._seq = 0
+        self._gap_since = None
+        self._rebuild_next = False
+        self._lock = threading.RLock()
+        self._counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def _incr(self, field, amount=1):
+        with self._lock:
+            self._counts[field] += amount
+
+    def _ensure_loaded(self):
+        if self._filter is None:
+            with self._lock:
+                if self._filter is None and self._rebuild_next:
+                    self.rebuild()
+                elif self._filter is None:
+                    self._load()
+
+    def _load(self):
+        snapshot = cache.get(SNAPSHOT_KEY)
+        if snapshot is None:
+            self.rebuild()
+            return
+        self._filter = BloomFilter.from_bytes(snapshot['bits'])
+        self._seq = snapshot['seq']
+        self._gap_since = None
+        self._counts['snapshot_loads'] += 1
+        self._sync()
+
+    def rebuild(self):
+        """Rebuild the filter from the database and publish it as the shared snapshot."""
+        with self._lock:
+            # Additions committed up to this sequence are visible to the queries below
+            seq = cache.get(SEQUENCE_KEY, 0)
+            emp_ids = User.objects.exclude(emp_id='').values_list('emp_id', flat=True)
+            doc_hashes = DocumentRecord.objects.values_list('doc_hash', flat=True)
+            total = emp_ids.count() + doc_hashes.count()
+            bloom = BloomFilter(max(self.capacity, 2 * total), self.fp_rate)
+            for emp_id in emp_ids.iterator():
+                bloom.add(employee_key(emp_id))
+            for doc_hash in doc_hashes.iterator():
+                bloom.add(document_key(doc_hash))
+            self._filter = bloom
+            self._seq = seq
+            self._gap_since = None
+            self._rebuild_next = False
+            self._counts['rebuilds'] += 1
+            self._publish_snapshot()
+            self._sync()
+            print(f"Verification filter rebuilt with {total} keys ({len(bloom.bits)} bytes)")
+
+    def _publish_snapshot(self):
+        cache.set(SNAPSHOT_KEY, {'seq': self._seq, 'bits': self._filter.to_bytes()}, None)
+
+    def _sync(self):
+        """
+        Apply deltas published since this worker's sequence number.
+
+        Returns False while a published delta is still missing.
+        """
+        current = cache.get(SEQUENCE_KEY, 0)
+        if current <= self._seq:
+            return True
+        self._counts['syncs'] += 1
+        if current - self._seq > MAX_DELTA_FETCH:
+            snapshot = cache.get(SNAPSHOT_KEY)
+            if snapshot is not None and snapshot['seq'] > self._seq:
+                self._filter = BloomFilter.from_bytes(snapshot['bits'])
+                self._seq = snapshot['seq']
+                self._counts['snapshot_loads'] += 1
+        wanted = [DELTA_KEY.format(seq) for seq in range(self._seq + 1, min(current, self._seq + MAX_DELTA_FETCH) + 1)]
+        deltas = cache.get_many(wanted)
+        for key in wanted:
+            if key not in deltas:
+                # Published by a worker between its incr and set, or lost
+                if self._gap_since is None:
+                    self._gap_since = time.monotonic()
+                elif time.monotonic() - self._gap_since > GAP_TIMEOUT:
+                    print(f"Verification filter delta {key} is missing; rebuilding")
+                    self.rebuild()
+                    return True
+                return False
+            for item in deltas[key]:
+                self._filter.add(item)
+            self._seq += 1
+            self._counts['deltas_applied'] += 1
+        self._gap_since = None
+        return current <= self._seq
+
+    def might_contain(self, key):
+        """False only if ``key`` was never added by any worker."""
+        self._ensure_loaded()
+        self._incr('lookups')
+        if key in self._filter:
+            return True
+        with self._lock:
+            # The key may be in a delta that has not arrived yet
+            if not self._sync() or key in self._filter:
+                return True
+        self._incr('negatives')
+        return False
+
+    def add(self, keys):
+        """Add ``keys`` here and publish them for the other workers."""
+        if not keys:
+            return
+        self._ensure_loaded()
+        with self._lock:
+            for key in keys:
+                self._filter.add(key)
+            cache.add(SEQUENCE_KEY, 0, None)
+            seq = cache.incr(SEQUENCE_KEY)
+            cache.set(DELTA_KEY.format(seq), list(keys), DELTA_TIMEOUT)
+            if self._filter.count > self._filter.capacity:
+                self.rebuild()
+            elif seq % self.snapshot_every == 0:
+                self._sync()
+                self._publish_snapshot()
+
+    def invalidate(self):
+        """Drop this worker's filter; the next lookup rebuilds it from the database."""
+        with self._lock:
+            self._filter = None
+            self._rebuild_next = True
+
+    def stats(self):
+        self._ensure_loaded()
+        with self._lock:
+            counts = dict(self._counts)
+            bloom = self._filter
+            counts.update({
+                'seq': self._seq,
+                'keys': bloom.count,
+                'capacity': bloom.capacity,
+                'bits': bloom.num_bits,
+                'hashes': bloom.num_hashes,
+                'memory_bytes': len(bloom.bits),
+                'fill_ratio': round(bloom.fill_ratio(), 6),
+                'target_fp_rate': bloom.fp_rate,
+                'estimated_fp_rate': bloom.estimated_fp_rate(),
+            })
+        counts['negative_rate'] = round(counts['negatives'] / counts['lookups'], 4) if counts['lookups'] else None
+        return counts
+
+
+_negative_cache = None
+_negative_cache_lock = threading.Lock()
+
+
+def get_negative_cache():
+    """The process-wide NegativeCache (loaded lazily on first lookup)."""
+    global _negative_cache
+    with _negative_cache_lock:
+        if _negative_cache is None:
+            _negative_cache = NegativeCache(
+                capacity=settings.VERIFICATION_FILTER_CAPACITY,
+                fp_rate=settings.VERIFICATION_FILTER_FP_RATE,
+                snapshot_every=settings.VERIFICATION_FILTER_SNAPSHOT_EVERY,
+            )
+        return _negative_cache
+
+
+def _might_contain(key):
+    if not settings.VERIFICATION_FILTER_ENABLED:
+        return True
+    try:
+        return get_negative_cache().might_contain(key)
+    except Exception as e:
+        # Never turn a filter failure into a false "not found"
+        print(f"Verification filter lookup failed: {e}")
+        return True
+
+
+def might_be_employee(emp_id):
+    return _might_contain(employee_key(emp_id))
+
+
+def might_be_document(doc_hash):
+    return _might_contain(document_key(doc_hash))
+
+
+def _remember(keys):
+    if not settings.VERIFICATION_FILTER_ENABLED:
+        return
+
+    def publish():
+        negative_cache = get_negative_cache()
+        try:
+            negative_cache.add(keys)
+        except Exception as e:
+            # The keys may be missing here or for other workers: never answer from a stale filter
+            print(f"Verification filter update failed, rebuilding on next lookup: {e}")
+            negative_cache.invalidate()
+
+    transaction.on_commit(publish)
+
+
+def remember_employee(emp_id):
+    """Add a newly registered emp_id once the current transaction commits."""
+    if emp_id:
+        _remember([employee_key(emp_id)])
+
+
+def remember_documents(doc_hashes):
+    """Add newly issued document hashes once the current transaction commits."""
+    _remember([document_key(doc_hash) for doc_hash in doc_hashes])
@@ -0,0 +1,28 @@
+"""
+Signal handlers keeping the verification cache in step with accounts.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from accounts.models import User, UserProfile
+from .cache import invalidate_employee
+from .negative_cache import remember_employee
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    """Covers registration (clears a cached 'not found') and email changes."""
+    invalidate_employee(instance.emp_id)
+
+
+@receiver(post_save, sender=User)
+def remember_user(sender, instance, created, **kwargs):
+    """New emp_ids must reach the negative cache before they can be verified."""
+    if created:
+        remember_employee(instance.emp_id)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile(sender, instance, **kwargs):
+    invalidate_employee(instance.user.emp_id)
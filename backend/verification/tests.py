@@ -1,3 +1,566 @@
-from django.test import TestCase
+"""
+Tests for the verification app.
+"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User, UserProfile
+from accounts.authentication import generate_tokens
+from accounts.throttling import _local_buckets
+from documents.models import DocumentRecord
+from .audit import AuditBuffer, get_buffer, make_record, replay_spool, write_records
+from .cache import clear_local_cache, get_employee, load_employee
+from .negative_cache import (
+    SEQUENCE_KEY, BloomFilter, NegativeCache, document_key, employee_key, get_negative_cache, might_be_document,
+    might_be_employee, remember_documents
+)
+from .models import VerificationLog, VerificationRequest, VerificationResult
 
-# Create your tests here.
+ORIGINAL_HASH = 'a' * 64
+OTHER_HASH = 'b' * 64
+
+
+def make_employee(email='employee@example.com', doc_hash=ORIGINAL_HASH, emp_id='EMP100001'):
+    # emp_id is passed explicitly: generated ids collide within the same second
+    user = User.objects.create_user(email=email, username=email, password='test-password-123', emp_id=emp_id)
+    UserProfile.objects.create(user=user, first_name='Ada', doc_hash=doc_hash)
+    return user
+
+
+def make_client(user=None):
+    client = APIClient()
+    if user is not None:
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {generate_tokens(user)['access']}")
+    return client
+
+
+def ndjson(response):
+    return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, RATE_LIMIT_ENABLE=False, VERIFICATION_FILTER_ENABLED=False)
+class VerificationTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        clear_local_cache()
+        self.addCleanup(clear_local_cache)
+        # The shared tier outlives each test's rolled-back rows
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+
+class VerificationCacheTests(VerificationTestCase):
+    """Verification decisions come from the cached employee data."""
+
+    def setUp(self):
+        super().setUp()
+        self.employee = make_employee()
+        self.client = make_client()
+
+    def verify(self, doc_hash=ORIGINAL_HASH, emp_id=None):
+        return self.client.post(
+            '/api/verify/', {'emp_id': emp_id or self.employee.emp_id, 'doc_hash': doc_hash}, format='json'
+        )
+
+    def test_warm_lookup_runs_no_query(self):
+        self.assertTrue(self.verify().json()['data']['isValid'])
+        with self.assertNumQueries(0):
+            response = self.verify()
+        data = response.json()['data']
+        self.assertTrue(data['isValid'])
+        self.assertEqual(data['employeeDetails']['first_name'], 'Ada')
+        self.assertEqual(data['inclusionProof'], f'/api/ledger/proof/{ORIGINAL_HASH}/')
+
+    def test_shared_tier_survives_a_cold_local_tier(self):
+        get_employee(self.employee.emp_id)
+        clear_local_cache()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_employee(self.employee.emp_id)['doc_hash'], ORIGINAL_HASH)
+
+    def test_absent_employee_is_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_employee('EMP999999')['status'], 'no_employee')
+            self.assertEqual(get_employee('EMP999999')['status'], 'no_employee')
+        self.assertEqual(self.verify(emp_id='EMP999999').status_code, 404)
+
+    def test_profile_change_invalidates_after_commit(self):
+        self.assertTrue(self.verify().json()['data']['isValid'])
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = self.employee.profile
+            profile.doc_hash = OTHER_HASH
+            profile.save()
+        self.assertFalse(self.verify().json()['data']['isValid'])
+        self.assertTrue(self.verify(OTHER_HASH).json()['data']['isValid'])
+
+    def test_profile_delete_invalidates(self):
+        self.verify()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.employee.profile.delete()
+        response = self.verify()
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['message'], 'Employee profile not found')
+
+    def test_fill_that_raced_an_invalidation_is_not_kept(self):
+        stale = load_employee(self.employee.emp_id)
+
+        def load_then_commit_a_change(emp_id):
+            # The row was read before another request committed its change
+            with self.captureOnCommitCallbacks(execute=True):
+                profile = self.employee.profile
+                profile.doc_hash = OTHER_HASH
+                profile.save()
+            return stale
+
+        with patch('verification.cache.load_employee', side_effect=load_then_commit_a_change):
+            self.assertEqual(get_employee(self.employee.emp_id)['doc_hash'], ORIGINAL_HASH)
+        self.assertEqual(get_employee(self.employee.emp_id)['doc_hash'], OTHER_HASH)
+        clear_local_cache()
+        self.assertEqual(get_employee(self.employee.emp_id)['doc_hash'], OTHER_HASH)
+
+
+class VerifyByFileTests(VerificationTestCase):
+    """POST /api/verify/file/: the presented bytes are matched by content digest."""
+
+    ORIGINAL = b'%PDF-1.4 original offer letter'
+    LATER = b'%PDF-1.4 later payslip'
+
+    def setUp(self):
+        super().setUp()
+        self.employee = make_employee()
+        for doc_hash, content, is_original in ((ORIGINAL_HASH, self.ORIGINAL, True), (OTHER_HASH, self.LATER, False)):
+            DocumentRecord.objects.create(
+                user=self.employee, doc_hash=doc_hash, content_digest=hashlib.sha256(content).hexdigest(),
+                file_name='document.pdf', file_size=len(content), is_original=is_original,
+                storage_path=f'blobs/{doc_hash}.pdf'
+            )
+        self.client = make_client()
+
+    def verify(self, content):
+        upload = SimpleUploadedFile('presented.pdf', content, content_type='application/pdf')
+        return self.client.post('/api/verify/file/', {'file': upload}, format='multipart')
+
+    def test_original_file_is_valid(self):
+        response = self.verify(self.ORIGINAL)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertTrue(data['isValid'])
+        self.assertEqual((data['empId'], data['docHash']), (self.employee.emp_id, ORIGINAL_HASH))
+        self.assertEqual(data['contentDigest'], hashlib.sha256(self.ORIGINAL).hexdigest())
+
+    def test_other_upload_by_the_employee_is_not_original(self):
+        data = self.verify(self.LATER).json()['data']
+        self.assertFalse(data['isValid'])
+        self.assertFalse(data['isOriginal'])
+        self.assertEqual(data['empId'], self.employee.emp_id)
+
+    def test_unknown_file(self):
+        response = self.verify(b'%PDF-1.4 forged')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['error'], 'Document not found')
+
+    def test_missing_file(self):
+        self.assertEqual(self.client.post('/api/verify/file/', {}, format='multipart').status_code, 400)
+
+    @override_settings(MAX_FILE_SIZE=16)
+    def test_oversized_file_rejected(self):
+        self.assertEqual(self.verify(self.ORIGINAL).status_code, 413)
+
+
+class BloomFilterTests(SimpleTestCase):
+    """No false negatives, and false positives near the configured rate."""
+
+    def test_added_keys_are_always_found(self):
+        bloom = BloomFilter(2000, 0.01)
+        keys = [employee_key(f'EMP{i:06d}') for i in range(2000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(document_key(f'{i:064x}') in bloom for i in range(20000))
+        self.assertLess(false_positives / 20000, 0.03)
+        self.assertLess(bloom.estimated_fp_rate(), 0.03)
+
+    def test_serialization_round_trip(self):
+        bloom = BloomFilter(100, 0.001)
+        bloom.add('e:EMP100001')
+        copy = BloomFilter.from_bytes(bloom.to_bytes())
+        self.assertIn('e:EMP100001', copy)
+        self.assertEqual((copy.num_bits, copy.num_hashes, copy.count), (bloom.num_bits, bloom.num_hashes, 1))
+        with self.assertRaises(ValueError):
+            BloomFilter.from_bytes(b'XXXX' + bloom.to_bytes()[4:])
+
+
+@override_settings(VERIFICATION_FILTER_ENABLED=True, VERIFICATION_FILTER_CAPACITY=1000)
+class NegativeCacheTests(VerificationTestCase):
+    """Unknown emp_ids and hashes are answered without a query."""
+
+    def setUp(self):
+        super().setUp()
+        self.employee = make_employee()
+        self.client = make_client()
+        # A fresh process-wide filter for each test
+        patcher = patch('verification.negative_cache._negative_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def verify(self, emp_id, doc_hash=ORIGINAL_HASH):
+        return self.client.post('/api/verify/', {'emp_id': emp_id, 'doc_hash': doc_hash}, format='json')
+
+    def test_unknown_employee_needs_no_query(self):
+        self.assertTrue(might_be_employee(self.employee.emp_id))
+        with self.assertNumQueries(0):
+            response = self.verify('EMP999999')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['message'], 'Employee not found')
+
+    def test_unknown_hash_keeps_the_employee_checks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = self.employee.profile
+            profile.doc_hash = ''
+            profile.save()
+        response = self.verify(self.employee.emp_id, OTHER_HASH)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['error'], 'No original document found for employee')
+
+    def test_unissued_hash_has_no_proof_without_a_query(self):
+        self.assertFalse(might_be_document(OTHER_HASH))
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/ledger/proof/{OTHER_HASH}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_failed_publish_rebuilds_from_the_database(self):
+        self.assertFalse(might_be_document(OTHER_HASH))
+        with patch('verification.negative_cache.NegativeCache.add', side_effect=RuntimeError('cache down')), \
+                self.captureOnCommitCallbacks(execute=True):
+            DocumentRecord.objects.create(
+                user=self.employee, doc_hash=OTHER_HASH, file_name='document.pdf', file_size=1,
+                storage_path='blobs/other.pdf'
+            )
+            remember_documents([OTHER_HASH])
+        self.assertTrue(might_be_document(OTHER_HASH))
+        self.assertEqual(get_negative_cache().stats()['rebuilds'], 2)
+
+    def test_missing_delta_is_treated_as_known(self):
+        worker = NegativeCache(capacity=1000, fp_rate=0.01, snapshot_every=100)
+        self.assertFalse(worker.might_contain(document_key(OTHER_HASH)))
+        # Another worker took a sequence number but its delta has not landed
+        cache.add(SEQUENCE_KEY, 0, None)
+        cache.incr(SEQUENCE_KEY)
+        self.assertTrue(worker.might_contain(document_key(OTHER_HASH)))
+        self.assertEqual(worker.stats()['negatives'], 1)
+
+    def test_registration_is_published_after_commit(self):
+        self.assertFalse(might_be_employee('EMP100002'))
+        with self.captureOnCommitCallbacks(execute=True):
+            make_employee('second@example.com', emp_id='EMP100002')
+        self.assertTrue(might_be_employee('EMP100002'))
+        self.assertEqual(get_negative_cache().stats()['rebuilds'], 1)
+
+    def test_other_workers_apply_deltas(self):
+        first = NegativeCache(capacity=1000, fp_rate=0.01, snapshot_every=100)
+        second = NegativeCache(capacity=1000, fp_rate=0.01, snapshot_every=100)
+        self.assertTrue(first.might_contain(employee_key(self.employee.emp_id)))
+        self.assertFalse(second.might_contain(employee_key('EMP100002')))
+        first.add([employee_key('EMP100002')])
+        self.assertTrue(second.might_contain(employee_key('EMP100002')))
+        stats = second.stats()
+        self.assertEqual((stats['rebuilds'], stats['snapshot_loads'], stats['deltas_applied']), (0, 1, 1))
+
+    def test_filter_failure_never_reports_missing(self):
+        with patch('verification.negative_cache.NegativeCache.might_contain', side_effect=RuntimeError('cache down')):
+            self.assertTrue(might_be_employee('EMP999999'))
+
+    def test_stats_for_admins(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin@example.com', password='test-password-123', emp_id='EMP100009'
+        )
+        might_be_employee('EMP999999')
+        data = make_client(admin).get('/api/verify/filter-stats/').json()['data']
+        self.assertTrue(data['enabled'])
+        self.assertEqual((data['lookups'], data['negatives']), (1, 1))
+        self.assertEqual(make_client().get('/api/verify/filter-stats/').status_code, 403)
+
+
+class BulkVerificationTests(VerificationTestCase):
+    """POST /api/verify/bulk/: streamed results and the audit rows they leave."""
+
+    def setUp(self):
+        super().setUp()
+        self.employee = make_employee()
+        self.vendor = make_client(make_employee('vendor@example.com', doc_hash='', emp_id='EMP100002'))
+
+    def bulk(self, items):
+        return self.vendor.post('/api/verify/bulk/', {'items': items}, format='json')
+
+    def test_results_stream_in_input_order_with_summary(self):
+        emp_id = self.employee.emp_id
+        response = self.bulk([
+            {'emp_id': emp_id, 'doc_hash': ORIGINAL_HASH},
+            {'emp_id': emp_id, 'doc_hash': OTHER_HASH},
+            {'emp_id': 'EMP000000', 'doc_hash': ORIGINAL_HASH},
+            {'emp_id': 'nope', 'doc_hash': ORIGINAL_HASH},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = ndjson(response)
+        self.assertEqual([line.get('isValid') for line in lines[:3]], [True, False, False])
+        self.assertEqual(lines[2]['message'], 'Employee not found')
+        self.assertIn('error', lines[3])
+        self.assertEqual(lines[-1], {'summary': {'total': 4, 'valid': 1, 'invalid': 2, 'errors': 1}})
+
+    def test_audit_rows_match_single_verification(self):
+        ndjson(self.bulk([
+            {'emp_id': self.employee.emp_id, 'doc_hash': ORIGINAL_HASH},
+            {'emp_id': self.employee.emp_id, 'doc_hash': OTHER_HASH},
+        ]))
+        self.assertEqual(
+            sorted(VerificationRequest.objects.values_list('status', flat=True)), ['failed', 'verified']
+        )
+        self.assertEqual(VerificationLog.objects.filter(action='verification_attempt').count(), 2)
+        self.assertEqual(VerificationLog.objects.filter(action='verification_success').count(), 1)
+        result = VerificationResult.objects.get()
+        self.assertEqual(result.employee_details['emp_id'], self.employee.emp_id)
+
+
+class BulkThrottleTests(VerificationTestCase):
+    """Bulk verification charges one token per pair from its own bucket."""
+
+    def setUp(self):
+        super().setUp()
+        _local_buckets.clear()
+        self.addCleanup(_local_buckets.clear)
+        self.employee = make_employee()
+        self.vendor = make_client(make_employee('vendor@example.com', doc_hash='', emp_id='EMP100002'))
+        self.pair = {'emp_id': self.employee.emp_id, 'doc_hash': ORIGINAL_HASH}
+
+    def bulk(self, count):
+        return self.vendor.post('/api/verify/bulk/', {'items': [self.pair] * count}, format='json')
+
+    @override_settings(RATE_LIMIT_ENABLE=True)
+    def test_default_limits_allow_large_batches(self):
+        lines = ndjson(self.bulk(500))
+        self.assertEqual(lines[-1]['summary']['total'], 500)
+        self.assertEqual(len(lines), 501)
+        # The single-verification bucket is untouched
+        self.assertEqual(self.vendor.post('/api/verify/', self.pair, format='json').status_code, 200)
+
+    @override_settings(RATE_LIMIT_ENABLE=True, RATE_LIMIT_BULK_PAIRS_PER_MINUTE=5)
+    def test_stops_when_bucket_runs_dry(self):
+        lines = ndjson(self.bulk(8))
+        # Chunks are capped at the bucket size; the second one cannot be paid for
+        self.assertEqual(lines[-1]['summary']['total'], 5)
+        self.assertIn('Rate limit exceeded', lines[-2]['error'])
+        self.assertEqual(self.bulk(1).status_code, 429)
+
+    @override_settings(RATE_LIMIT_ENABLE=True, RATE_LIMIT_BULK_PAIRS_PER_MINUTE=5, VERIFICATION_BULK_CHUNK_SIZE=2)
+    def test_charged_per_chunk(self):
+        self.assertEqual(ndjson(self.bulk(2))[-1]['summary']['total'], 2)
+        lines = ndjson(self.bulk(4))
+        # Three tokens left: the request plus the first chunk of two
+        self.assertEqual(lines[-1]['summary']['total'], 2)
+        self.assertIn('Rate limit exceeded', lines[-2]['error'])
+        self.assertEqual(VerificationRequest.objects.count(), 4)
+
+
+def audit_record(emp_id, requested_by_id):
+    audit = {'emp_id': emp_id, 'doc_hash': ORIGINAL_HASH, 'requested_by_id': requested_by_id,
+             'request_ip': '127.0.0.1', 'user_agent': 'tests', 'verification_date': timezone.now()}
+    return make_record(audit, 'failed', 'Employee not found')
+
+
+class AuditBufferTests(TransactionTestCase):
+    """
+    Batching, back-pressure, shutdown and spool replay of the audit buffer
+    (a TransactionTestCase: the flusher thread writes through its own connection).
+    """
+
+    def setUp(self):
+        self.vendor = make_employee('vendor@example.com', doc_hash='', emp_id='EMP100002')
+        self.spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_dir, ignore_errors=True)
+
+    def make_buffer(self, **kwargs):
+        options = dict(batch_size=100, flush_interval=60, max_pending=100, block_timeout=0)
+        options.update(kwargs)
+        buffer = AuditBuffer(**options)
+        self.addCleanup(buffer.close)
+        return buffer
+
+    def submit(self, buffer, count, start=0):
+        for index in range(start, start + count):
+            buffer.submit(audit_record(f'EMP3{index:05d}', self.vendor.pk))
+
+    def wait_for_flush(self, buffer, timeout=5):
+        # Wait on the buffer, not the table: SQLite locks it for readers while the flusher writes
+        deadline = time.monotonic() + timeout
+        while buffer._pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with buffer._flush_lock:
+            # flush() holds this from before it empties the queue until the write is done
+            pass
+        return VerificationRequest.objects.count()
+
+    def test_full_batch_is_flushed_without_waiting_for_the_interval(self):
+        buffer = self.make_buffer(batch_size=3)
+        self.submit(buffer, 2)
+        time.sleep(0.1)
+        self.assertEqual(len(buffer._pending), 2)
+        self.submit(buffer, 1, start=2)
+        self.assertEqual(self.wait_for_flush(buffer), 3)
+        self.assertEqual(VerificationLog.objects.count(), 3)
+
+    def test_partial_batch_is_flushed_after_the_interval(self):
+        buffer = self.make_buffer(flush_interval=0.05)
+        self.submit(buffer, 2)
+        self.assertEqual(self.wait_for_flush(buffer), 2)
+
+    def test_full_queue_writes_inline(self):
+        buffer = self.make_buffer(max_pending=2)
+        self.submit(buffer, 3)
+        # The third caller found no room and wrote its own record
+        self.assertEqual(list(VerificationRequest.objects.values_list('emp_id', flat=True)), ['EMP300002'])
+        self.assertEqual(len(buffer._pending), 2)
+
+    def test_full_queue_waits_for_room(self):
+        buffer = self.make_buffer(max_pending=1, block_timeout=5, flush_interval=0.05)
+        writers = []
+
+        def write(records):
+            writers.append(threading.current_thread().name)
+            write_records(records)
+
+        with patch('verification.audit.write_records', side_effect=write):
+            self.submit(buffer, 2)
+            self.assertEqual(self.wait_for_flush(buffer), 2)
+        # The second submit waited for the flusher instead of writing inline
+        self.assertEqual(set(writers), {'verification-audit'})
+
+    def test_close_flushes_what_is_queued(self):
+        buffer = AuditBuffer(batch_size=100, flush_interval=60, max_pending=100, block_timeout=0)
+        self.submit(buffer, 4)
+        buffer.close()
+        self.assertEqual(VerificationRequest.objects.count(), 4)
+        self.assertEqual(buffer._pending, [])
+
+    def test_spool_is_removed_once_written(self):
+        buffer = self.make_buffer(spool_dir=self.spool_dir)
+        self.submit(buffer, 2)
+        spools = glob.glob(os.path.join(self.spool_dir, 'audit-*.ndjson'))
+        self.assertEqual(len(spools), 1)
+        with open(spools[0]) as fh:
+            self.assertEqual(len(fh.readlines()), 2)
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def write_dead_spool(self, count):
+        # A pid no live process has, as left behind by a crashed worker
+        path = os.path.join(self.spool_dir, 'audit-4194999-0.ndjson')
+        with open(path, 'w') as fh:
+            for index in range(count):
+                fh.write(json.dumps(audit_record(f'EMP4{index:05d}', self.vendor.pk)) + '\n')
+            fh.write('{"audit": {"emp_id"')  # torn by the crash
+        return path
+
+    def test_replay_writes_spools_of_dead_workers(self):
+        path = self.write_dead_spool(3)
+        live = os.path.join(self.spool_dir, f'audit-{os.getpid()}-0.ndjson')
+        with open(live, 'w') as fh:
+            fh.write(json.dumps(audit_record('EMP500000', self.vendor.pk)) + '\n')
+        self.assertEqual(replay_spool(self.spool_dir), 3)
+        self.assertFalse(os.path.exists(path))
+        # This process's own spool is still in use
+        self.assertTrue(os.path.exists(live))
+        self.assertEqual(VerificationRequest.objects.count(), 3)
+
+    def test_spools_are_replayed_when_the_buffer_starts(self):
+        self.write_dead_spool(2)
+        with self.settings(VERIFICATION_AUDIT_SPOOL_DIR=self.spool_dir), \
+                patch('verification.audit._buffer', None), patch('verification.audit.atexit.register'):
+            buffer = get_buffer()
+            self.addCleanup(buffer.close)
+        self.assertEqual(VerificationRequest.objects.count(), 2)
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AuditBufferFailureTests(TransactionTestCase):
+    """
+    Failed flushes keep their records (a TransactionTestCase: the flusher
+    thread writes through its own connection).
+    """
+
+    def setUp(self):
+        self.vendor = make_employee('vendor@example.com', doc_hash='', emp_id='EMP100002')
+        self.buffer = AuditBuffer(batch_size=100, flush_interval=60, max_pending=100, block_timeout=0)
+        self.addCleanup(self.buffer.close)
+
+    def submit(self, emp_id):
+        audit = {'emp_id': emp_id, 'doc_hash': ORIGINAL_HASH, 'requested_by_id': self.vendor.pk,
+                 'request_ip': '127.0.0.1', 'user_agent': 'tests', 'verification_date': timezone.now()}
+        self.buffer.submit(make_record(audit, 'failed', 'Employee not found'))
+
+    def test_records_survive_a_failed_write(self):
+        for index in range(3):
+            self.submit(f'EMP20000{index}')
+        with patch('verification.audit.write_records', side_effect=DatabaseError('database is down')):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(
+            sorted(VerificationRequest.objects.values_list('emp_id', flat=True)),
+            ['EMP200000', 'EMP200001', 'EMP200002']
+        )
+
+    def test_bad_record_does_not_sink_the_batch(self):
+        for emp_id in ('EMP200000', 'EMPBAD', 'EMP200002'):
+            self.submit(emp_id)
+
+        def write(records):
+            if any(record['audit']['emp_id'] == 'EMPBAD' for record in records):
+                raise DatabaseError('value too long')
+            write_records(records)
+
+        with patch('verification.audit.write_records', side_effect=write):
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(VerificationRequest.objects.count(), 2)
+        self.assertEqual([record['audit']['emp_id'] for record in self.buffer._pending], ['EMPBAD'])
+
+    def test_poison_record_is_dead_lettered(self):
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_dir, ignore_errors=True)
+        buffer = AuditBuffer(batch_size=100, flush_interval=60, max_pending=100, block_timeout=0,
+                             spool_dir=spool_dir, max_attempts=2)
+        self.addCleanup(buffer.close)
+        self.buffer = buffer
+        for emp_id in ('EMP200000', 'EMPBAD'):
+            self.submit(emp_id)
+
+        def write(records):
+            if any(record['audit']['emp_id'] == 'EMPBAD' for record in records):
+                raise DatabaseError('value too long')
+            write_records(records)
+
+        with patch('verification.audit.write_records', side_effect=write):
+            self.assertEqual(buffer.flush(), 1)
+            self.assertEqual(buffer.flush(), 0)
+            # Given up on after two attempts: nothing left to retry
+            self.assertEqual(buffer._pending, [])
+            self.assertEqual(buffer.flush(), 0)
+        dead_letters = glob.glob(os.path.join(spool_dir, 'dead-letter-*.ndjson'))
+        self.assertEqual(len(dead_letters), 1)
+        with open(dead_letters[0]) as fh:
+            lines = [json.loads(line) for line in fh]
+        self.assertEqual([(line['audit']['emp_id'], line['attempts']) for line in lines], [('EMPBAD', 2)])
+        self.assertIn('value too long', lines[0]['error'])
+        # Only the dead-letter file remains: replay must not pick it up
+        self.assertEqual(os.listdir(spool_dir), [os.path.basename(dead_letters[0])])
@@ -6,6 +6,9 @@ from . import views
 
 urlpatterns = [
     path('', views.verify_document, name='verify_document'),
+    path('file/', views.verify_document_file, name='verify_document_file'),
+    path('bulk/', views.BulkVerificationView.as_view(), name='bulk_verification'),
+    path('filter-stats/', views.verification_filter_stats, name='verification_filter_stats'),
     path('status/<str:emp_id>/', views.verification_status, name='verification_status'),
     path('logs/<int:verification_id>/', views.verification_logs, name='verification_logs'),
     path('my-verifications/', views.my_verifications, name='my_verifications'),
@@ -1,14 +1,25 @@
 """
 Verification-related API views.
 """
+import os
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import api_view, parser_classes, permission_classes, throttle_classes
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from accounts.models import User, UserProfile
+from rest_framework.views import APIView
+from accounts.models import User
+from accounts.throttling import BulkVerificationThrottle, VerificationThrottle
 from documents.models import DocumentRecord
-from .models import VerificationRequest, VerificationResult, VerificationLog
+from documents.upload_handlers import HashingUploadHandler
+from .audit import record_verification
+from .bulk import BulkInputError, iter_file_pairs, iter_list_pairs, verify_pairs
+from .cache import get_employee
+from .models import VerificationRequest, VerificationLog
+from .negative_cache import get_negative_cache, might_be_employee
 from .serializers import (
     DocumentVerificationSerializer, VerificationResponseSerializer,
     VerificationRequestSerializer, VerificationResultSerializer,
@@ -18,9 +29,15 @@ from .serializers import (
 
 @api_view(['POST'])
 @permission_classes([AllowAny])  # Allow public verification
+@throttle_classes([VerificationThrottle])
 def verify_document(request):
     """
     Verify document authenticity.
+
+    The decision comes from the cached employee data (see ``cache``) and the
+    audit trail is written in the background after the response is built.
+    An emp_id the negative cache has never seen is answered without a query
+    or an audit record.
     """
     serializer = DocumentVerificationSerializer(data=request.data)
     
@@ -33,144 +50,279 @@ def verify_document(request):
     
     emp_id = serializer.validated_data['emp_id']
     doc_hash = serializer.validated_data['doc_hash']
+    verification_date = timezone.now()
+    audit = {
+        'emp_id': emp_id,
+        'doc_hash': doc_hash,
+        'requested_by_id': request.user.pk if request.user.is_authenticated else None,
+        'request_ip': request.META.get('REMOTE_ADDR'),
+        'user_agent': request.META.get('HTTP_USER_AGENT'),
+        'verification_date': verification_date,
+    }
     
-    # Create verification request
-    verification_request = VerificationRequest.objects.create(
-        emp_id=emp_id,
-        doc_hash=doc_hash,
-        requested_by=request.user if request.user.is_authenticated else None,
-        request_ip=request.META.get('REMOTE_ADDR'),
-        user_agent=request.META.get('HTTP_USER_AGENT')
-    )
-    
-    # Log verification attempt
-    VerificationLog.objects.create(
-        verification_request=verification_request,
-        action='verification_attempt',
-        details=f"Verification requested for emp_id: {emp_id}, doc_hash: {doc_hash}",
-        performed_by=request.user if request.user.is_authenticated else None,
-        ip_address=request.META.get('REMOTE_ADDR')
-    )
-    
+    if not might_be_employee(emp_id):
+        return Response({
+            'is_valid': False,
+            'message': 'Employee not found',
+            'verification_date': verification_date
+        }, status=status.HTTP_404_NOT_FOUND)
+
     try:
+        employee = get_employee(emp_id)
+        
         # Find user by employee ID
-        try:
-            user = User.objects.get(emp_id=emp_id)
-        except User.DoesNotExist:
-            verification_request.mark_failed("Employee not found")
+        if employee['status'] == 'no_employee':
+            record_verification(audit, 'failed', "Employee not found")
             return Response({
                 'is_valid': False,
                 'message': 'Employee not found',
-                'verification_date': verification_request.verification_date
+                'verification_date': verification_date
             }, status=status.HTTP_404_NOT_FOUND)
         
         # Check if user has a profile
-        try:
-            profile = user.profile
-        except UserProfile.DoesNotExist:
-            verification_request.mark_failed("Employee profile not found")
+        if employee['status'] == 'no_profile':
+            record_verification(audit, 'failed', "Employee profile not found")
             return Response({
                 'is_valid': False,
                 'message': 'Employee profile not found',
-                'verification_date': verification_request.verification_date
+                'verification_date': verification_date
             }, status=status.HTTP_404_NOT_FOUND)
         
         # Check if profile has original document hash
-        if not profile.doc_hash:
-            verification_request.mark_failed("No original document found for employee")
+        if not employee['doc_hash']:
+            record_verification(audit, 'failed', "No original document found for employee")
             return Response({
                 'success': False,
                 'error': 'No original document found for employee',
                 'data': {
                     'isValid': False,
                     'message': 'No original document found for employee',
-                    'verificationDate': verification_request.verification_date
+                    'verificationDate': verification_date
                 }
             }, status=status.HTTP_404_NOT_FOUND)
         
         # Compare document hashes
-        if profile.doc_hash != doc_hash:
-            verification_request.mark_failed("Document hash does not match original")
+        if employee['doc_hash'] != doc_hash:
+            record_verification(audit, 'failed', "Document hash does not match original")
             return Response({
                 'success': True,
                 'data': {
                     'isValid': False,
                     'message': 'Document is tampered or not the original',
-                    'verificationDate': verification_request.verification_date
+                    'verificationDate': verification_date
                 },
                 'message': 'Document verification completed'
             }, status=status.HTTP_200_OK)
         
         # Document is valid
-        verification_request.mark_verified("Document verified successfully")
+        record_verification(audit, 'verified', "Document verified successfully", employee)
         
-        # Create verification result
-        result = VerificationResult.objects.create(
-            verification_request=verification_request,
-            employee_details={
-                'emp_id': user.emp_id,
-                'user_hash': user.user_hash,
-                'email': user.email,
-                'first_name': profile.first_name,
-                'last_name': profile.last_name,
-                'job_designation': profile.job_designation,
-                'department': profile.department,
-                'is_profile_complete': profile.is_profile_complete
+        return Response({
+            'success': True,
+            'data': {
+                'isValid': True,
+                'message': 'Document verified successfully',
+                'employeeDetails': dict(employee['employee_details']),
+                'documentPreview': f"/api/documents/preview/{doc_hash}/",
+                'downloadLink': f"/api/documents/download/{doc_hash}/",
+                'inclusionProof': f"/api/ledger/proof/{doc_hash}/",
+                'verificationDate': verification_date
             },
-            document_preview_url=f"/api/documents/preview/{doc_hash}/",
-            download_url=f"/api/documents/download/{doc_hash}/",
-            verification_metadata={
-                'verified_at': timezone.now().isoformat(),
-                'verification_method': 'hash_comparison',
-                'original_doc_hash': profile.doc_hash
-            }
-        )
+            'message': 'Document verification completed successfully'
+        }, status=status.HTTP_200_OK)
         
-        # Log successful verification
-        VerificationLog.objects.create(
-            verification_request=verification_request,
-            action='verification_success',
-            details=f"Document verified successfully for {user.emp_id}",
-            performed_by=request.user if request.user.is_authenticated else None,
-            ip_address=request.META.get('REMOTE_ADDR')
-        )
+    except Exception as e:
+        record_verification(audit, 'error', f"Verification failed: {str(e)}")
         
+        return Response({
+            'success': False,
+            'error': 'Verification failed due to server error',
+            'data': {
+                'isValid': False,
+                'message': 'Verification failed due to server error',
+                'verificationDate': verification_date
+            }
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # Allow public verification
+@throttle_classes([VerificationThrottle])
+@parser_classes([MultiPartParser])
+def verify_document_file(request):
+    """
+    Verify a presented document file rather than its hash.
+
+    The upload is hashed as it is received (nothing is buffered) and its
+    unsalted content digest is looked up in the ``content_digest`` index.
+    The match resolves the owning employee; it is valid only if it is that
+    employee's original document.
+    """
+    request._request.upload_handlers = [HashingUploadHandler(request._request)]
+    presented = request.FILES.get('file')
+    if presented is None:
+        return Response({
+            'success': False,
+            'error': 'No file provided'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    verification_date = timezone.now()
+    audit = {
+        'emp_id': '',
+        'doc_hash': presented.content_digest,
+        'requested_by_id': request.user.pk if request.user.is_authenticated else None,
+        'request_ip': request.META.get('REMOTE_ADDR'),
+        'user_agent': request.META.get('HTTP_USER_AGENT'),
+        'verification_date': verification_date,
+    }
+
+    try:
+        # Originals first, then the earliest upload of the same bytes
+        match = DocumentRecord.objects.filter(
+            content_digest=presented.content_digest
+        ).order_by('-is_original', 'upload_date').values('doc_hash', 'user__emp_id').first()
+
+        if match is None:
+            record_verification(audit, 'failed', "No document matches the presented file")
+            return Response({
+                'success': False,
+                'error': 'Document not found',
+                'data': {
+                    'isValid': False,
+                    'message': 'No issued document matches this file',
+                    'contentDigest': presented.content_digest,
+                    'verificationDate': verification_date
+                }
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        doc_hash = match['doc_hash']
+        audit.update(emp_id=match['user__emp_id'], doc_hash=doc_hash)
+        employee = get_employee(match['user__emp_id'])
+        if employee['status'] != 'ok' or employee['doc_hash'] != doc_hash:
+            record_verification(audit, 'failed', "Presented file is not the employee's original document")
+            return Response({
+                'success': True,
+                'data': {
+                    'isValid': False,
+                    'isOriginal': False,
+                    'empId': match['user__emp_id'],
+                    'message': 'Document was uploaded by this employee but is not their original',
+                    'contentDigest': presented.content_digest,
+                    'verificationDate': verification_date
+                },
+                'message': 'Document verification completed'
+            }, status=status.HTTP_200_OK)
+
+        record_verification(audit, 'verified', "Document verified successfully", employee)
         return Response({
             'success': True,
             'data': {
                 'isValid': True,
+                'isOriginal': True,
+                'empId': match['user__emp_id'],
                 'message': 'Document verified successfully',
-                'employeeDetails': result.employee_details,
-                'documentPreview': result.document_preview_url,
-                'downloadLink': result.download_url,
-                'verificationDate': verification_request.verification_date
+                'employeeDetails': dict(employee['employee_details']),
+                'docHash': doc_hash,
+                'contentDigest': presented.content_digest,
+                'documentPreview': f"/api/documents/preview/{doc_hash}/",
+                'downloadLink': f"/api/documents/download/{doc_hash}/",
+                'inclusionProof': f"/api/ledger/proof/{doc_hash}/",
+                'verificationDate': verification_date
             },
             'message': 'Document verification completed successfully'
         }, status=status.HTTP_200_OK)
-        
+
     except Exception as e:
-        verification_request.mark_failed(f"Verification failed: {str(e)}")
-        
-        # Log error
-        VerificationLog.objects.create(
-            verification_request=verification_request,
-            action='verification_error',
-            details=f"Verification failed: {str(e)}",
-            performed_by=request.user if request.user.is_authenticated else None,
-            ip_address=request.META.get('REMOTE_ADDR')
-        )
-        
+        record_verification(audit, 'error', f"Verification failed: {str(e)}")
         return Response({
             'success': False,
             'error': 'Verification failed due to server error',
             'data': {
                 'isValid': False,
                 'message': 'Verification failed due to server error',
-                'verificationDate': verification_request.verification_date
+                'verificationDate': verification_date
             }
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class BulkVerificationView(APIView):
+    """
+    Verify many (emp_id, doc_hash) pairs in one request.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, MultiPartParser]
+    throttle_classes = [BulkVerificationThrottle]
+
+    def _charge(self, request, throttle):
+        """Per-pair rate limiting for ``verify_pairs``; the request's own token paid for one pair."""
+        credit = [1]
+
+        def charge(count):
+            cost = count - credit.pop() if credit else count
+            return None if throttle.take(request, self, cost) else throttle.wait()
+        return charge
+
+    def post(self, request):
+        """
+        Verify ``items`` (a JSON list) or an uploaded ``file`` (.ndjson/.csv).
+
+        Results stream back as NDJSON, one line per pair in input order,
+        followed by a summary line. Each pair costs one verification
+        bulk rate-limit token (``RATE_LIMIT_BULK_PAIRS_PER_MINUTE``).
+        """
+        try:
+            uploaded_file = request.FILES.get('file')
+            if uploaded_file is not None:
+                pairs = iter_file_pairs(uploaded_file)
+            else:
+                pairs = iter_list_pairs(request.data.get('items'))
+        except BulkInputError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        audit_base = {
+            'requested_by_id': request.user.pk,
+            'request_ip': request.META.get('REMOTE_ADDR'),
+            'user_agent': request.META.get('HTTP_USER_AGENT'),
+        }
+        charge = chunk_size = None
+        throttle = BulkVerificationThrottle()
+        if throttle.get_rate() > 0:
+            # A chunk is charged at once, so it must fit in a full bucket
+            chunk_size = throttle.get_rate()
+            charge = self._charge(request, throttle)
+        response = StreamingHttpResponse(
+            verify_pairs(pairs, audit_base, charge=charge, chunk_size=chunk_size),
+            content_type='application/x-ndjson'
+        )
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def verification_filter_stats(request):
+    """
+    Size, false-positive rate and hit counts of the verification negative cache in this worker.
+    """
+    if not settings.VERIFICATION_FILTER_ENABLED:
+        return Response({
+            'success': True,
+            'data': {'enabled': False}
+        })
+
+    return Response({
+        'success': True,
+        'data': {
+            'enabled': True,
+            'pid': os.getpid(),
+            **get_negative_cache().stats()
+        }
+    })
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def verification_status(request, emp_id):
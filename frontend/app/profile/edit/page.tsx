@@ -55,6 +55,7 @@ export default function ProfileEditPage() {
   const [isSubmitting, setIsSubmitting] = useState(false)
   const [message, setMessage] = useState<{ type: "success" | "error"; text: string } | null>(null)
   const [documentHistory, setDocumentHistory] = useState<DocumentRecord[]>([])
+  const [historyCursor, setHistoryCursor] = useState<string | null>(null)
 
   const form = useForm<ProfileFormData>({
     resolver: zodResolver(profileSchema),
@@ -90,6 +91,7 @@ export default function ProfileEditPage() {
         if (response.success && response.data) {
           console.log("Loading documents from API:", response.data)
           setDocumentHistory(response.data)
+          setHistoryCursor(response.next ?? null)
         } else {
           console.log("No documents found or API error:", response.error)
           setDocumentHistory([])
@@ -106,6 +108,19 @@ export default function ProfileEditPage() {
     }
   }, [setValue, userProfile, user])
 
+  const loadMoreDocuments = async () => {
+    if (!historyCursor) return
+    try {
+      const response = await apiService.getDocumentHistory(historyCursor)
+      if (response.success && response.data) {
+        setDocumentHistory(previous => [...previous, ...response.data!])
+        setHistoryCursor(response.next ?? null)
+      }
+    } catch (error) {
+      console.error("Error loading more documents:", error)
+    }
+  }
+
   const onNext = () => {
     if (step === "personal") {
       // Validate personal fields before proceeding
@@ -557,6 +572,11 @@ export default function ProfileEditPage() {
                               </div>
                             </div>
                           ))}
+                          {historyCursor && (
+                            <Button type="button" variant="outline" className="w-full" onClick={loadMoreDocuments}>
+                              Load more documents
+                            </Button>
+                          )}
                         </div>
                       ) : (
                         <div className="p-4 bg-gray-50 border border-gray-200 rounded-lg text-center">
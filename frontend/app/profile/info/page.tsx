@@ -36,6 +36,7 @@ export default function ProfileInfoPage() {
   const { user, userProfile, credentials, loading } = useAuth()
   const [profile, setProfile] = useState<UserProfile | null>(null)
   const [documents, setDocuments] = useState<DocumentRecord[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   const [copied, setCopied] = useState(false)
 
   // Debug logging
@@ -67,6 +68,7 @@ export default function ProfileInfoPage() {
         if (response.success && response.data) {
           console.log("Loading documents from API:", response.data)
           setDocuments(response.data)
+          setNextCursor(response.next ?? null)
         } else {
           console.log("No documents found or API error:", response.error)
           setDocuments([])
@@ -86,6 +88,19 @@ export default function ProfileInfoPage() {
     }
   }, [userProfile, loading, user])
 
+  const loadMoreDocuments = async () => {
+    if (!nextCursor) return
+    try {
+      const response = await apiService.getDocumentHistory(nextCursor)
+      if (response.success && response.data) {
+        setDocuments(previous => [...previous, ...response.data!])
+        setNextCursor(response.next ?? null)
+      }
+    } catch (error) {
+      console.error("Error loading more documents:", error)
+    }
+  }
+
   const copyHash = async () => {
     const documentHash = userProfile?.docHash
     if (documentHash) {
@@ -225,6 +240,8 @@ export default function ProfileInfoPage() {
               {/* Document History Section */}
               <DocumentHistory
                 documents={documents}
+                hasMore={nextCursor !== null}
+                onLoadMore={loadMoreDocuments}
                 onDownload={async (docHash) => {
                   try {
                     console.log("Download document:", docHash)
@@ -24,13 +24,17 @@ interface DocumentHistoryProps {
   onDownload: (docHash: string) => void
   onView: (docHash: string) => void
   isLoading?: boolean
+  hasMore?: boolean
+  onLoadMore?: () => void
 }
 
 export default function DocumentHistory({ 
   documents, 
   onDownload, 
   onView, 
-  isLoading = false 
+  isLoading = false,
+  hasMore = false,
+  onLoadMore
 }: DocumentHistoryProps) {
   const [downloading, setDownloading] = useState<string | null>(null)
   const [copiedHash, setCopiedHash] = useState<string | null>(null)
@@ -132,7 +136,7 @@ export default function DocumentHistory({
           Document History
         </CardTitle>
         <CardDescription>
-          {documents.length} document{documents.length !== 1 ? 's' : ''} uploaded
+          {documents.length}{hasMore ? '+' : ''} document{documents.length !== 1 ? 's' : ''} uploaded
         </CardDescription>
       </CardHeader>
       <CardContent>
@@ -280,6 +284,12 @@ export default function DocumentHistory({
             </div>
           ))}
         </div>
+
+        {hasMore && onLoadMore && (
+          <Button variant="outline" className="w-full mt-4" onClick={onLoadMore}>
+            Load more documents
+          </Button>
+        )}
         
         {documents.length > 1 && (
           <Alert className="mt-4 border-amber-200 bg-amber-50">
@@ -5,6 +5,7 @@ import {
   VerificationResult, 
   IssuerAuthorization,
   APIResponse,
+  PaginatedAPIResponse,
   RegistrationData,
   ProfileFormData,
   VerificationRequest,
@@ -237,15 +238,17 @@ class APIService {
     })
   }
 
-  async getDocumentHistory(): Promise<APIResponse<DocumentRecord[]>> {
-    const response = await this.request<any[]>('/documents/history/')
+  async getDocumentHistory(cursor?: string | null): Promise<PaginatedAPIResponse<DocumentRecord>> {
+    // One page per call; `next` is the cursor for the following page (null on the last)
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''
+    const response: any = await this.request<any>(`/documents/history/${query}`)
     
     if (response.success === false) {
-      return response as APIResponse<DocumentRecord[]>
+      return response as PaginatedAPIResponse<DocumentRecord>
     }
     
     // Transform snake_case to camelCase for frontend compatibility
-    const transformedData = response.map((doc: any) => ({
+    const transformedData = response.results.map((doc: any) => ({
       docHash: doc.doc_hash,
       uploadDate: doc.upload_date,
       fileName: doc.file_name,
@@ -256,7 +259,8 @@ class APIService {
     
     return {
       success: true,
-      data: transformedData
+      data: transformedData,
+      next: response.next ? new URL(response.next).searchParams.get('cursor') : null
     }
   }
 
@@ -61,6 +61,11 @@ export interface APIResponse<T> {
   error?: string
 }
 
+// One page of a cursor-paginated list; pass `next` back to fetch the following page
+export interface PaginatedAPIResponse<T> extends APIResponse<T[]> {
+  next?: string | null
+}
+
 // Form data types
 export interface RegistrationData {
   email: string